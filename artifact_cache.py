@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Cache des conversions, adressé par contenu
+Les archives d'import produites par une conversion sont conservées sous une clé
+(empreinte de l'upload, équipe, version du convertisseur, options). Un même
+export soumis à nouveau (par exemple après un échec de mmctl) passe directement
+à l'import. Taille totale bornée, les entrées les moins récemment utilisées
+sont supprimées en premier.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from import_archive import file_digest
+
+# Description d'une entrée (fichiers, stats); sa date de modification marque le dernier usage
+META_FILE = 'meta.json'
+
+
+def cache_key(content_hash, team, converter_version, options):
+    """Clé d'une conversion: empreinte du contenu, équipe, version du convertisseur et options"""
+    data = json.dumps([content_hash, team, converter_version, options], sort_keys=True, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+def link_or_copy(source, target):
+    """Lien physique (instantané, sans espace disque) ou copie si les dossiers sont sur deux volumes"""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+class ArtifactCache:
+    """Archives d'import converties, une entrée par dossier <root>/<clé>/"""
+
+    def __init__(self, root, max_bytes):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key):
+        """Entrée {files, stats} de la clé (dernier usage mis à jour), None si absente"""
+        meta_path = self.root / key / META_FILE
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def restore(self, key, entry, target_dir):
+        """Placer les fichiers d'une entrée dans target_dir, retourne leurs chemins (None si évincée entre-temps)"""
+        paths = []
+        try:
+            for item in entry['files']:
+                target = Path(target_dir) / item['name']
+                if target.exists():
+                    target.unlink()
+                link_or_copy(self.root / key / item['name'], target)
+                paths.append(target)
+        except OSError:
+            for path in paths:
+                path.unlink()
+            return None
+        return paths
+
+    def put(self, key, files, stats):
+        """Enregistrer les fichiers d'une conversion (liste de dicts avec 'path') et ses stats"""
+        size = sum(Path(item['path']).stat().st_size for item in files)
+        if not self.max_bytes or size > self.max_bytes or (self.root / key).exists():
+            return False
+
+        # Écriture dans un dossier temporaire puis renommage: une entrée est complète ou absente
+        staging = self.root / f'.tmp-{uuid.uuid4().hex}'
+        staging.mkdir()
+        try:
+            entry = {'files': [], 'stats': stats, 'bytes': size, 'created_at': time.time()}
+            for item in files:
+                name = Path(item['path']).name
+                link_or_copy(item['path'], staging / name)
+                entry['files'].append({**{k: v for k, v in item.items() if k != 'path'}, 'name': name})
+            with open(staging / META_FILE, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            staging.rename(self.root / key)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            return False
+
+        self.evict()
+        return True
+
+    def entries(self):
+        """Entrées du cache (clé, taille, dernier usage), les moins récemment utilisées d'abord"""
+        entries = []
+        for meta_path in self.root.glob(f'*/{META_FILE}'):
+            try:
+                with open(meta_path, encoding='utf-8') as f:
+                    size = json.load(f)['bytes']
+                entries.append({'key': meta_path.parent.name, 'bytes': size,
+                                'last_used': meta_path.stat().st_mtime})
+            except (OSError, ValueError, KeyError):
+                continue
+        entries.sort(key=lambda entry: entry['last_used'])
+        return entries
+
+    def evict(self):
+        """Supprimer les entrées les moins récemment utilisées au-delà de max_bytes"""
+        with self._lock:
+            entries = self.entries()
+            total = sum(entry['bytes'] for entry in entries)
+            for entry in entries:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(self.root / entry['key'], ignore_errors=True)
+                total -= entry['bytes']
+
+    def shrink(self, nbytes):
+        """Supprimer les entrées les moins récemment utilisées jusqu'à libérer nbytes, retourne les octets libérés"""
+        freed = 0
+        with self._lock:
+            for entry in self.entries():
+                if freed >= nbytes:
+                    break
+                shutil.rmtree(self.root / entry['key'], ignore_errors=True)
+                freed += entry['bytes']
+        return freed
+
+    def stats(self):
+        """Occupation du cache et taux de succès de ce processus"""
+        entries = self.entries()
+        return {
+            'entries': len(entries),
+            'bytes': sum(entry['bytes'] for entry in entries),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses
+        }
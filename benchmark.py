@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de bout en bout de l'import Element → Mattermost
+Pour chaque scénario, un export synthétique est généré (generate_export.py) puis
+mesuré: conversion JSONL (événements/s, mémoire maximale), construction de
+l'archive, conversion directe en .zip et latence totale de l'interface web
+(upload → job terminé) avec un mmctl simulé (mmctl_stub.py): aucun serveur
+Mattermost n'est nécessaire.
+
+Usage:
+    python3 benchmark.py                                # scénarios 1K, 10K et 50K messages
+    python3 benchmark.py --messages 1000 10000 --rooms 4 --output bench.json
+    python3 benchmark.py --baseline bench-1.0.json --tolerance 0.2   # code 1 si régression
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import mmctl_stub
+from element_stream import CONVERTER_VERSION
+from generate_export import generate_exports
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# Scénarios par défaut: tailles du tableau des performances du readme
+DEFAULT_MESSAGES = (1000, 10000, 50000)
+
+# Métriques comparées à la référence: (étape, mesure, True si plus grand est meilleur)
+TRACKED_METRICS = (
+    ('convert', 'events_per_second', True),
+    ('convert_zip', 'events_per_second', True),
+    ('archive', 'seconds', False),
+    ('web', 'seconds', False)
+)
+
+# Attente maximale d'un job de l'interface web (secondes)
+WEB_JOB_TIMEOUT = 3600
+
+
+def measure(cmd, env=None):
+    """Exécuter une commande: durée, code retour, mémoire maximale (MB) et sortie standard"""
+    with tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        process = subprocess.Popen(cmd, stdout=stdout, stderr=stderr, env=env)
+        # wait4: ressources de ce processus seul (ru_maxrss en Ko sous Linux)
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - start
+        returncode = os.waitstatus_to_exitcode(status) if hasattr(os, 'waitstatus_to_exitcode') else status >> 8
+        stdout.seek(0)
+        stderr.seek(0)
+        output = stdout.read().decode(errors='replace')
+        if returncode != 0:
+            error = stderr.read().decode(errors='replace').strip()[-500:]
+            raise RuntimeError(f'{" ".join(map(str, cmd))} a échoué: {error}')
+    return {'seconds': round(seconds, 3), 'peak_rss_mb': round(usage.ru_maxrss / 1024, 1)}, output
+
+def run_scenario(work_dir, messages, rooms, users, attachments, stub_seconds):
+    """Mesurer toutes les étapes sur un export synthétique"""
+    name = f'{rooms}x{messages}'
+    scenario_dir = work_dir / name
+    output = scenario_dir / ('export.json' if rooms == 1 else 'export')
+    summary = generate_exports(output, rooms=rooms, users=users, messages=messages,
+                               attachments=attachments, attachment_size=16 * 1024)
+    inputs = summary['paths']
+    events = summary['events']
+    data_dir = ['--data-dir', summary['media_dir']] if summary['media_dir'] else []
+    result = {
+        'name': name,
+        'rooms': rooms,
+        'messages': summary['messages'],
+        'events': events,
+        'export_bytes': summary['bytes'],
+        'attachments': summary['attachments']
+    }
+
+    converter = [sys.executable, str(SCRIPT_DIR / 'element_stream.py')]
+    # JSONL puis archive séparée: un seul salon (plusieurs salons sortent directement en .zip)
+    if rooms == 1:
+        jsonl = scenario_dir / 'import.jsonl'
+        convert, _ = measure(converter + inputs + ['--team', 'bench', '--output', str(jsonl)] + data_dir)
+        result['convert'] = {**convert, 'events_per_second': round(events / convert['seconds'])}
+
+        archive_path = scenario_dir / 'archive.zip'
+        archive, _ = measure([sys.executable, str(SCRIPT_DIR / 'import_archive.py'), str(archive_path), str(jsonl)])
+        result['archive'] = {**archive, 'bytes': archive_path.stat().st_size}
+
+    zip_path = scenario_dir / 'import.zip'
+    convert_zip, _ = measure(converter + inputs + ['--team', 'bench', '--output', str(zip_path)] + data_dir)
+    # Archive unique ou shards import-001.zip, import-002.zip...
+    archives = list(scenario_dir.glob('import*.zip'))
+    result['convert_zip'] = {**convert_zip, 'events_per_second': round(events / convert_zip['seconds']),
+                             'bytes': sum(path.stat().st_size for path in archives), 'archives': len(archives)}
+
+    web, stdout = measure([sys.executable, str(Path(__file__).resolve()), '--web-pipeline'] + inputs,
+                          env=stub_env(work_dir, scenario_dir / 'web', stub_seconds))
+    result['web'] = {**web, **json.loads(stdout.strip().splitlines()[-1])}
+    return result
+
+def stub_env(work_dir, upload_dir, stub_seconds):
+    """Environnement de l'interface web: mmctl simulé en tête du PATH, dossier de travail dédié"""
+    bin_dir = work_dir / 'bin'
+    mmctl_stub.install(bin_dir)
+    return {
+        **os.environ,
+        'PATH': f'{bin_dir}{os.pathsep}{os.environ.get("PATH", "")}',
+        'MMCTL_STUB_DIR': str(work_dir / 'mmctl'),
+        'MMCTL_STUB_SECONDS': str(stub_seconds),
+        'MMCTL_POLL_MAX_INTERVAL': '0.5',
+        'UPLOAD_FOLDER': str(upload_dir),
+        'ARTIFACT_CACHE_MAX_BYTES': '0'
+    }
+
+def web_pipeline(inputs):
+    """Upload via le client de test Flask puis attente du job; affiche la latence en JSON.
+
+    Exécuté dans un processus enfant (--web-pipeline) pour que la configuration de
+    l'application soit lue depuis l'environnement préparé par stub_env().
+    """
+    from web_interface_flask import app
+
+    client = app.test_client()
+    start = time.perf_counter()
+    files = [(open(path, 'rb'), Path(path).name) for path in inputs]
+    try:
+        response = client.post('/api/upload', content_type='multipart/form-data', data={
+            'file': files, 'team': 'bench', 'incremental': 'false'
+        })
+    finally:
+        for f, _ in files:
+            f.close()
+    data = response.get_json()
+    if not data.get('success'):
+        raise RuntimeError(data.get('error'))
+    upload_seconds = time.perf_counter() - start
+
+    deadline = time.monotonic() + WEB_JOB_TIMEOUT
+    while True:
+        job = client.get(f'/api/job/{data["job_id"]}').get_json()
+        if job['status'] in ('completed', 'error', 'canceled'):
+            break
+        if time.monotonic() > deadline:
+            raise RuntimeError(f'Job toujours {job["status"]} après {WEB_JOB_TIMEOUT} s')
+        time.sleep(0.05)
+    if job['status'] != 'completed':
+        errors = [log['message'] for log in job.get('logs', []) if log.get('level') == 'error']
+        message = errors[-1] if errors else 'aucun message d\'erreur'
+        raise RuntimeError(f'Job {job["status"]}: {message}')
+
+    print(json.dumps({
+        'upload_seconds': round(upload_seconds, 3),
+        'total_seconds': round(time.perf_counter() - start, 3),
+        'shards': len(job.get('shards') or []) or 1
+    }))
+    sys.stdout.flush()
+    # Threads de l'ordonnanceur et du suivi mmctl: pas d'attente de leur arrêt
+    os._exit(0)
+
+def environment():
+    """Machine et version mesurées"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'converter_version': CONVERTER_VERSION,
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+def compare(results, baseline, tolerance):
+    """Régressions par rapport à une exécution de référence (liste de messages)"""
+    previous = {scenario['name']: scenario for scenario in baseline.get('scenarios', [])}
+    regressions = []
+    for scenario in results['scenarios']:
+        reference = previous.get(scenario['name'])
+        if not reference:
+            continue
+        for stage, metric, higher_is_better in TRACKED_METRICS:
+            old = reference.get(stage, {}).get(metric)
+            new = scenario.get(stage, {}).get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (change < -tolerance) if higher_is_better else (change > tolerance):
+                regressions.append(f'{scenario["name"]} {stage}.{metric}: {old} → {new} ({change:+.0%})')
+    return regressions
+
+def main():
+    """Point d'entrée CLI: résultats JSON sur stdout ou dans --output"""
+    parser = argparse.ArgumentParser(description='Benchmarks de l\'import Element → Mattermost')
+    parser.add_argument('--messages', type=int, nargs='+', default=list(DEFAULT_MESSAGES),
+                        help='Messages par salon, un scénario par valeur')
+    parser.add_argument('--rooms', type=int, default=1, help='Salons par export')
+    parser.add_argument('--users', type=int, default=50, help='Nombre d\'utilisateurs')
+    parser.add_argument('--attachments', type=int, default=0, help='Fichiers média par export')
+    parser.add_argument('--stub-seconds', type=float, default=0.5, help='Durée d\'un import mmctl simulé')
+    parser.add_argument('--work-dir', help='Dossier de travail conservé (défaut: temporaire, supprimé)')
+    parser.add_argument('--output', help='Fichier JSON des résultats')
+    parser.add_argument('--baseline', help='Résultats de référence à comparer')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Écart toléré avant régression (0.2 = 20%%)')
+    parser.add_argument('--web-pipeline', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.web_pipeline:
+        web_pipeline(args.web_pipeline)
+        return
+
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix='element-bench-'))
+    work_dir.mkdir(parents=True, exist_ok=True)
+    results = {'environment': environment(), 'scenarios': []}
+    try:
+        for messages in args.messages:
+            print(f'Scénario {args.rooms}x{messages}...', file=sys.stderr)
+            results['scenarios'].append(run_scenario(work_dir, messages, args.rooms, args.users,
+                                                     args.attachments, args.stub_seconds))
+    except (RuntimeError, OSError) as e:
+        print(f'Erreur: {e}', file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'Régression: {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Pool de workers de conversion Element.io → Mattermost
+Processus persistants: le convertisseur est chargé une seule fois par worker,
+puis chaque job lui est transmis par un pipe et renvoie un résultat structuré.
+Les convertisseurs qui le permettent (element_stream.py) envoient aussi leur
+progression sur ce pipe pendant la conversion: une conversion dont la
+progression s'arrête est interrompue sans attendre son délai maximal. Chaque
+worker est chef de son groupe de processus: un timeout ou une annulation tue
+aussi ses sous-processus.
+"""
+
+import importlib.util
+import inspect
+import io
+import multiprocessing
+import os
+import runpy
+import signal
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+
+from job_profiler import profile_call
+from job_scheduler import CANCEL_POLL_INTERVAL, JobCanceled
+
+
+class ConversionStalled(subprocess.TimeoutExpired):
+    """Plus aucune progression reçue du worker pendant stall_timeout secondes"""
+
+    def __str__(self):
+        return f'Conversion bloquée: aucune progression depuis {self.timeout:.0f}s'
+
+
+def parse_conversion_output(output):
+    """Parser la sortie d'un script de conversion sans sortie structurée pour extraire les stats"""
+    stats = {
+        'users': 0,
+        'messages': 0,
+        'threads': 0,
+        'files': 0
+    }
+
+    for line in output.split('\n'):
+        if 'utilisateurs' in line.lower():
+            try:
+                stats['users'] = int(line.split()[0])
+            except (ValueError, IndexError):
+                pass
+        elif 'messages' in line.lower():
+            try:
+                stats['messages'] = int(line.split()[0])
+            except (ValueError, IndexError):
+                pass
+        elif 'threads' in line.lower():
+            try:
+                stats['threads'] = int(line.split()[0])
+            except (ValueError, IndexError):
+                pass
+        elif 'fichiers' in line.lower():
+            try:
+                stats['files'] = int(line.split()[0])
+            except (ValueError, IndexError):
+                pass
+
+    return stats
+
+def load_converter(converter_script):
+    """Charger le script de conversion comme module (sans exécuter son main)"""
+    spec = importlib.util.spec_from_file_location('element_to_mattermost', converter_script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def supports_progress(module):
+    """Le convertisseur expose-t-il convert_export(..., progress=callback) ?"""
+    convert = getattr(module, 'convert_export', None)
+    if convert is None:
+        return False
+    try:
+        return 'progress' in inspect.signature(convert).parameters
+    except (TypeError, ValueError):
+        return False
+
+def run_convert_export(module, task, progress):
+    """Conversion par appel direct de convert_export (stats structurées, progression)"""
+    errors = []
+    stats = {}
+    convert = module.convert_export
+    options = {'progress': progress}
+    # Découpage en shards, signalés au fil de la conversion par des événements 'shard'
+    if (task.get('shard_posts') or task.get('shard_bytes')) and hasattr(module, 'convert_export_shards'):
+        convert = module.convert_export_shards
+        options.update(shard_posts=task.get('shard_posts'), shard_bytes=task.get('shard_bytes'))
+    # Import incrémental: état déjà importé de l'équipe (voir import_index.py)
+    if task.get('delta') is not None:
+        options['delta'] = task['delta']
+    try:
+        stats = convert(
+            task['input'],
+            task['output'],
+            task['team'],
+            task['password'],
+            task.get('data_dir'),
+            task.get('compression') or 'deflated',
+            task.get('compresslevel'),
+            **options
+        )
+    except (OSError, ValueError) as e:
+        errors.append(f'Erreur: {e}')
+    except Exception:
+        errors.extend(traceback.format_exc().splitlines())
+    return {
+        'success': not errors,
+        'returncode': 1 if errors else 0,
+        'stats': stats,
+        'output_path': task['output'],
+        'stdout': '',
+        'errors': errors
+    }
+
+def run_converter(module, converter_script, task, progress=None):
+    """Exécuter une conversion dans le processus courant et retourner le résultat"""
+    if supports_progress(module):
+        return run_convert_export(module, task, progress)
+
+    argv = [
+        converter_script,
+        task['input'],
+        '--team', task['team'],
+        '--password', task['password'],
+        '--output', task['output']
+    ]
+    if task.get('data_dir'):
+        argv += ['--data-dir', task['data_dir']]
+    if task.get('compression'):
+        argv += ['--compression', task['compression']]
+    if task.get('compresslevel') is not None:
+        argv += ['--compress-level', str(task['compresslevel'])]
+
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    returncode = 0
+    returned = None
+    saved_argv = sys.argv
+    sys.argv = argv
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            if hasattr(module, 'main'):
+                returned = module.main()
+            else:
+                runpy.run_path(converter_script, run_name='__main__')
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            returncode = e.code or 0
+        else:
+            stderr.write(str(e.code))
+            returncode = 1
+    except Exception:
+        stderr.write(traceback.format_exc())
+        returncode = 1
+    finally:
+        sys.argv = saved_argv
+
+    if isinstance(returned, int):
+        returncode = returned
+
+    output = stdout.getvalue()
+    errors = [line for line in stderr.getvalue().splitlines() if line.strip()]
+    return {
+        'success': returncode == 0,
+        'returncode': returncode,
+        'stats': returned if isinstance(returned, dict) else parse_conversion_output(output),
+        'output_path': task['output'],
+        'stdout': output,
+        'errors': errors
+    }
+
+def run_call(module, task):
+    """Appeler une fonction exposée par le convertisseur (passes d'une conversion multi-salons)"""
+    try:
+        if task['call'] not in getattr(module, 'ROOM_FUNCTIONS', ()):
+            raise ValueError(f'Fonction non disponible dans le convertisseur: {task["call"]}')
+        return {'success': True, 'value': module.call_room_function((task['call'], task['args'])),
+                'errors': []}
+    except Exception:
+        return {'success': False, 'value': None, 'errors': traceback.format_exc().splitlines()}
+
+def run_task(module, load_error, converter_script, task, progress):
+    """Traiter une tâche reçue par un worker: appel de fonction ou conversion complète"""
+    if module is not None and task.get('call'):
+        return run_call(module, task)
+    if module is None:
+        return {
+            'success': False,
+            'returncode': 1,
+            'stats': {},
+            'output_path': task['output'],
+            'stdout': '',
+            'errors': [f'Chargement du convertisseur impossible: {load_error}']
+        }
+    return run_converter(module, converter_script, task, progress if task.get('progress') else None)
+
+def worker_main(conn, converter_script):
+    """Boucle d'un worker: charger le convertisseur puis traiter les jobs reçus"""
+    # Groupe de processus propre: tué en entier (convertisseur et sous-processus) par _stop
+    os.setpgrp()
+    try:
+        module = load_converter(converter_script)
+        load_error = None
+    except Exception:
+        module = None
+        load_error = traceback.format_exc()
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if task is None:
+            break
+
+        def progress(event):
+            conn.send(('progress', event))
+
+        started = time.time()
+        # Profilage demandé: cProfile et tracemalloc autour de la tâche (voir job_profiler.py)
+        run = lambda: run_task(module, load_error, converter_script, task, progress)
+        result = profile_call(run, task['profile']) if task.get('profile') else run()
+        result['duration'] = time.time() - started
+        try:
+            conn.send(('result', result))
+        except OSError:
+            # Processus web arrêté pendant la tâche (hors de son groupe, le worker lui survit)
+            break
+
+
+class ConverterPool:
+    """Pool de processus de conversion persistants, de taille fixe"""
+
+    def __init__(self, converter_script, workers=2, max_tasks_per_worker=100):
+        self.converter_script = converter_script
+        self.workers = workers
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self._context = multiprocessing.get_context('spawn')
+        self._slots = threading.Semaphore(workers)
+        self._idle = []
+        self._lock = threading.Lock()
+
+        # Démarrage immédiat: le chargement du convertisseur se fait avant le premier job
+        for _ in range(workers):
+            self._idle.append(self._spawn())
+
+    def _spawn(self):
+        """Démarrer un nouveau worker"""
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=worker_main,
+            args=(child_conn, self.converter_script),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return {'process': process, 'conn': parent_conn, 'tasks': 0}
+
+    def _stop(self, worker, kill=False):
+        """Arrêter un worker (proprement, ou immédiatement si kill)"""
+        try:
+            if kill:
+                try:
+                    os.killpg(worker['process'].pid, signal.SIGKILL)
+                except (ProcessLookupError, PermissionError):
+                    worker['process'].kill()
+            else:
+                worker['conn'].send(None)
+        except (OSError, ValueError):
+            pass
+        worker['conn'].close()
+        worker['process'].join(timeout=5)
+
+    def run(self, task, timeout=None, on_progress=None, cancel=None, stall_timeout=None):
+        """Convertir un fichier sur un worker libre (bloquant) et retourner le résultat.
+
+        on_progress, s'il est fourni, est appelé dans le thread appelant avec chaque
+        événement de progression envoyé par le worker. Dès le premier événement, un
+        silence de plus de stall_timeout secondes tue le worker (ConversionStalled).
+        Si cancel (CancelToken) est annulé, le worker est tué et JobCanceled levée.
+        """
+        task = {**task, 'progress': on_progress is not None}
+        deadline = time.time() + timeout if timeout is not None else None
+        # Armée au premier événement: les convertisseurs sans progression n'ont que le délai maximal
+        stall_deadline = None
+        with self._slots:
+            with self._lock:
+                worker = self._idle.pop() if self._idle else None
+            if worker is not None and not worker['process'].is_alive():
+                worker['conn'].close()
+                worker = None
+            if worker is None:
+                worker = self._spawn()
+
+            try:
+                worker['conn'].send(task)
+                while True:
+                    if cancel is not None and cancel.is_set():
+                        self._stop(worker, kill=True)
+                        raise JobCanceled('Conversion annulée')
+                    remaining = None if deadline is None else max(0, deadline - time.time())
+                    if stall_deadline is not None:
+                        stalled_in = max(0, stall_deadline - time.time())
+                        remaining = stalled_in if remaining is None else min(remaining, stalled_in)
+                    if cancel is not None:
+                        remaining = CANCEL_POLL_INTERVAL if remaining is None else min(remaining, CANCEL_POLL_INTERVAL)
+                    if not worker['conn'].poll(remaining):
+                        if stall_deadline is not None and time.time() >= stall_deadline:
+                            self._stop(worker, kill=True)
+                            raise ConversionStalled(['converter', task['input']], stall_timeout)
+                        if deadline is None or time.time() < deadline:
+                            continue
+                        self._stop(worker, kill=True)
+                        raise subprocess.TimeoutExpired(['converter', task['input']], timeout)
+                    kind, payload = worker['conn'].recv()
+                    if kind == 'result':
+                        result = payload
+                        break
+                    if stall_timeout:
+                        stall_deadline = time.time() + stall_timeout
+                    if on_progress:
+                        try:
+                            on_progress(payload)
+                        except Exception:
+                            traceback.print_exc()
+            except (EOFError, OSError):
+                self._stop(worker, kill=True)
+                return {
+                    'success': False,
+                    'returncode': worker['process'].exitcode,
+                    'stats': {},
+                    'output_path': task['output'],
+                    'stdout': '',
+                    'errors': ['Worker de conversion arrêté de façon inattendue'],
+                    'duration': 0
+                }
+
+            worker['tasks'] += 1
+            result['worker_pid'] = worker['process'].pid
+            if worker['tasks'] >= self.max_tasks_per_worker:
+                self._stop(worker)
+            else:
+                with self._lock:
+                    self._idle.append(worker)
+            return result
+
+    def call(self, name, kwargs, timeout=None, profile=None, cancel=None):
+        """Exécuter une fonction du convertisseur sur un worker libre, retourne sa valeur"""
+        result = self.run({
+            'call': name,
+            'args': kwargs,
+            'input': kwargs.get('path', ''),
+            'output': kwargs.get('output_path', ''),
+            'profile': profile
+        }, timeout, cancel=cancel)
+        if not result['success']:
+            raise RuntimeError(f'{name} a échoué: {" ".join(result["errors"][-3:])}')
+        return result['value']
+
+    def shutdown(self):
+        """Arrêter tous les workers inactifs"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            self._stop(worker)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Convertisseur simulé pour les tests de charge (CONVERSION_MODE=script)
+Expose convert_export comme element_stream.py: le pool de workers l'appelle
+directement et reçoit sa progression. La conversion dure
+CONVERTER_STUB_SECONDS secondes plus CONVERTER_STUB_SECONDS_PER_MB par MB
+d'export, puis écrit un JSONL minimal (version et équipe).
+
+Usage (interface web):
+    CONVERSION_MODE=script CONVERTER_SCRIPT=/opt/mattermost/scripts/converter_stub.py \\
+        CONVERTER_STUB_SECONDS=2 python3 element_import_web.py
+"""
+
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from import_archive import build_archive
+
+# Intervalle entre deux événements de progression
+PROGRESS_INTERVAL = 0.2
+
+# Bloc lu pour compter les messages de l'export
+READ_SIZE = 1024 * 1024
+
+
+def count_messages(path):
+    """Nombre approximatif de messages (occurrences du type m.room.message)"""
+    marker = b'"m.room.message"'
+    count = 0
+    tail = b''
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_SIZE), b''):
+            data = tail + block
+            count += data.count(marker)
+            tail = data[-(len(marker) - 1):]
+    return count
+
+def convert_export(input_path, output_path, team, password=None, data_dir=None, compression='deflated',
+                   compresslevel=None, progress=None):
+    """Simuler une conversion: attente proportionnelle à la taille puis JSONL minimal"""
+    size = Path(input_path).stat().st_size
+    duration = float(os.environ.get('CONVERTER_STUB_SECONDS', 1)) \
+        + float(os.environ.get('CONVERTER_STUB_SECONDS_PER_MB', 0)) * size / 1048576
+    messages = count_messages(input_path)
+
+    start = time.time()
+    while True:
+        elapsed = time.time() - start
+        if elapsed >= duration:
+            break
+        if progress:
+            events = int(messages * elapsed / duration)
+            progress({'stage': 'convert', 'events': events, 'events_total': messages,
+                      'bytes_read': size, 'bytes_total': size})
+        time.sleep(min(PROGRESS_INTERVAL, duration - elapsed))
+
+    lines = [
+        {'type': 'version', 'version': 1},
+        {'type': 'team', 'team': {'name': team, 'display_name': team, 'type': 'O'}}
+    ]
+    if str(output_path).endswith('.zip'):
+        with tempfile.TemporaryDirectory() as tmp:
+            jsonl = Path(tmp) / 'import.jsonl'
+            jsonl.write_text(''.join(json.dumps(line) + '\n' for line in lines), encoding='utf-8')
+            build_archive(output_path, [jsonl], compression, compresslevel)
+    else:
+        with open(output_path, 'w', encoding='utf-8') as out:
+            for line in lines:
+                out.write(json.dumps(line) + '\n')
+
+    stats = {'users': 0, 'channels': 0, 'messages': messages, 'threads': 0, 'files': 0,
+             'events': messages, 'bytes': size}
+    if progress:
+        progress({'stage': 'done', 'events': messages, 'events_total': messages,
+                  'bytes_read': size, 'bytes_total': size, 'stats': stats})
+    return stats
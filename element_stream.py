@@ -0,0 +1,901 @@
+#!/usr/bin/env python3
+"""
+Conversion en flux Element.io → Mattermost JSONL
+Les événements de l'export sont lus un par un (jamais le document entier en mémoire)
+et traversent une chaîne de générateurs jusqu'aux lignes JSONL Mattermost.
+
+Usage:
+    python3 element_stream.py export.json --team myteam --output import.jsonl
+    python3 element_stream.py export.json --team myteam --output import.zip --compression stored
+    python3 element_stream.py export.json --team myteam --output import.zip --progress  # JSON sur stderr
+    python3 element_stream.py export.json --team myteam --output import.zip --shard-posts 50000
+    python3 element_stream.py salon1.json salon2.json --team myteam --output import.zip --workers 8
+"""
+
+import argparse
+import codecs
+import json
+import os
+import re
+import sys
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+
+from import_archive import COMPRESSION_METHODS, add_media, open_archive, open_jsonl_entry, stage_media
+
+CONVERTER_VERSION = '1.0'
+
+DEFAULT_PASSWORD = 'ChangeMe123!'
+
+# Taille des blocs lus dans l'export
+READ_SIZE = 256 * 1024
+
+# Fréquence des événements de progression (en événements de l'export lus)
+PROGRESS_EVERY = 10000
+
+# Fonctions exécutables par les workers pour une conversion multi-salons
+ROOM_FUNCTIONS = ('scan_room', 'convert_room')
+
+# Clés de premier niveau contenant la liste des événements
+EVENT_KEYS = ('events', 'messages')
+
+# Limites Mattermost
+MAX_MESSAGE_LENGTH = 16383
+MAX_USERNAME_LENGTH = 22
+MAX_CHANNEL_NAME_LENGTH = 64
+
+MEDIA_MSGTYPES = ('m.image', 'm.file', 'm.video', 'm.audio')
+
+# Taille maximale (caractères) d'une valeur JSON encore incomplète: au-delà, un export
+# tronqué ou invalide est signalé au lieu d'être lu en mémoire jusqu'à la fin
+MAX_TOKEN_SIZE = 64 * 1024 * 1024
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+class ExportReader:
+    """Lecteur JSON incrémental d'un export Element"""
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+
+    def fill(self):
+        """Lire le bloc suivant à la suite du buffer"""
+        raw = self.fp.read(READ_SIZE)
+        self.bytes_read += len(raw)
+        if not raw:
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(raw, final=not raw)
+        self.pos = 0
+
+    def peek(self):
+        """Prochain caractère significatif (sans le consommer), '' en fin de fichier"""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                return ''
+            self.fill()
+
+    def expect(self, chars):
+        """Consommer le prochain caractère significatif, qui doit être dans chars"""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f'JSON invalide: attendu {chars!r}, trouvé {char!r} (octet ~{self.bytes_read})')
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Décoder la valeur JSON suivante.
+
+        Si l'erreur de décodage reste à la même position alors que plus de MAX_TOKEN_SIZE
+        caractères ont été lus au-delà, les données suivantes n'y changeront rien: ValueError.
+        """
+        self.peek()
+        stuck_at = None
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise
+                # Position relative au début de la valeur (fill() décale le buffer)
+                if e.pos - self.pos != stuck_at:
+                    stuck_at = e.pos - self.pos
+                elif len(self.buffer) - e.pos > MAX_TOKEN_SIZE:
+                    raise ValueError(f'JSON invalide: {e.msg} (octet ~{self.bytes_read})') from e
+                self.fill()
+                continue
+            # Un nombre en fin de buffer peut être tronqué: relire avant de conclure
+            if end == len(self.buffer) and not self.eof:
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_export(path, meta=None):
+    """Parcourir un export Element en flux: yield chaque événement.
+
+    Les autres clés de premier niveau (room_name, topic...) sont stockées dans meta,
+    et meta['_reader'] donne la position de lecture (octets lus) pendant le parcours.
+    Un export réduit à une simple liste d'événements est aussi accepté.
+    """
+    with open(path, 'rb') as fp:
+        yield from iter_export_stream(fp, meta)
+
+def iter_export_stream(fp, meta=None):
+    """Parcourir un export Element lu depuis un fichier binaire ouvert (ex. membre d'une archive)"""
+    if meta is None:
+        meta = {}
+
+    reader = ExportReader(fp)
+    meta['_reader'] = reader
+
+    if reader.peek() == '[':
+        yield from _iter_events(reader)
+        return
+
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key in EVENT_KEYS and reader.peek() == '[':
+            yield from _iter_events(reader)
+        else:
+            meta[key] = reader.value()
+        if reader.expect(',}') == '}':
+            break
+
+def _iter_array(reader):
+    """Yield les éléments d'un tableau JSON un par un"""
+    reader.expect('[')
+    if reader.peek() == ']':
+        reader.pos += 1
+        return
+    while True:
+        yield reader.value()
+        if reader.expect(',]') == ']':
+            break
+
+def _iter_events(reader):
+    """Yield les événements d'un tableau, normalisés (voir normalize_event); les autres valeurs sont ignorées"""
+    for value in _iter_array(reader):
+        event = normalize_event(value)
+        if event is not None:
+            yield event
+
+def normalize_event(event):
+    """Événement aux champs du type attendu par les passes de conversion, None si ce n'est pas un objet.
+
+    Un export modifié à la main peut contenir un content chaîne, un sender
+    numérique...: ces champs sont convertis en chaîne, ou retirés s'ils devaient
+    être des objets. Les champs absents le restent.
+    """
+    if not isinstance(event, dict):
+        return None
+    for key in ('type', 'sender', 'event_id', 'state_key', 'redacts', 'room_id'):
+        if event.get(key) is not None and not isinstance(event[key], str):
+            event[key] = str(event[key])
+    if 'origin_server_ts' in event:
+        try:
+            event['origin_server_ts'] = int(event['origin_server_ts'] or 0)
+        except (TypeError, ValueError, OverflowError):
+            event['origin_server_ts'] = 0
+    for key in ('content', 'unsigned'):
+        if key in event and not isinstance(event[key], dict):
+            del event[key]
+    content = event.get('content') or {}
+    for key in ('m.relates_to', 'm.new_content'):
+        if key in content and not isinstance(content[key], dict):
+            del content[key]
+    for fields in (content, content.get('m.relates_to') or {}, content.get('m.new_content') or {}):
+        for key in ('body', 'msgtype', 'url', 'filename', 'displayname', 'topic', 'join_rule', 'redacts',
+                    'rel_type', 'event_id'):
+            if fields.get(key) is not None and not isinstance(fields[key], str):
+                fields[key] = str(fields[key])
+    return event
+
+def relation(event):
+    """Type et cible de la relation m.relates_to d'un événement"""
+    relates_to = (event.get('content') or {}).get('m.relates_to') or {}
+    return relates_to.get('rel_type'), relates_to.get('event_id')
+
+def is_message(event):
+    """L'événement devient-il un post Mattermost ?"""
+    if event.get('type') != 'm.room.message':
+        return False
+    if (event.get('unsigned') or {}).get('redacted_because'):
+        return False
+    content = event.get('content') or {}
+    if relation(event)[0] == 'm.replace':
+        return False
+    return bool(content.get('body'))
+
+def matrix_username(sender, taken):
+    """Nom d'utilisateur Mattermost unique dérivé d'un identifiant Matrix"""
+    localpart = sender.lstrip('@').split(':', 1)[0].lower()
+    username = re.sub(r'[^a-z0-9._-]', '-', localpart).strip('.-_')
+    if not username or not username[0].isalpha():
+        username = 'u' + username
+    username = username[:MAX_USERNAME_LENGTH].ljust(3, '0')
+
+    candidate = username
+    suffix = 1
+    while candidate in taken:
+        tail = str(suffix)
+        candidate = username[:MAX_USERNAME_LENGTH - len(tail)] + tail
+        suffix += 1
+    return candidate
+
+def channel_name(room_name):
+    """Nom de canal Mattermost dérivé du nom du salon"""
+    ascii_name = unicodedata.normalize('NFKD', str(room_name or '')).encode('ascii', 'ignore').decode()
+    name = re.sub(r'[^a-z0-9_-]+', '-', ascii_name.lower()).strip('-_')
+    return name[:MAX_CHANNEL_NAME_LENGTH].rstrip('-_') or 'element-import'
+
+def report_progress(progress, stage, events, events_total, meta, bytes_total):
+    """Transmettre un événement de progression au callback progress"""
+    reader = meta.get('_reader')
+    progress({
+        'stage': stage,
+        'events': events,
+        'events_total': events_total,
+        'bytes_read': reader.bytes_read if reader else 0,
+        'bytes_total': bytes_total
+    })
+
+def scan_export(path, progress=None, data_dir=None):
+    """Première passe: utilisateurs, threads, éditions et suppressions du salon.
+
+    La mémoire utilisée dépend du nombre d'utilisateurs, de threads, de pièces jointes
+    (noms des fichiers de data_dir référencés), de messages édités (dernier texte de
+    chacun) et d'événements supprimés (identifiants), pas du nombre total d'événements.
+    """
+    bytes_total = os.path.getsize(path)
+    meta = {}
+    users = {}
+    usernames = set()
+    displaynames = {}
+    reply_counts = {}
+    thread_last_ts = {}
+    edits = {}
+    redacted = set()
+    join_rule = None
+    topic = None
+    room_id = None
+    last_ts = 0
+    last_ids = []
+    media = set()
+    events = 0
+
+    for event in iter_export(path, meta):
+        events += 1
+        if progress and events % PROGRESS_EVERY == 0:
+            report_progress(progress, 'scan', events, None, meta, bytes_total)
+        event_type = event.get('type')
+        content = event.get('content') or {}
+        room_id = room_id or event.get('room_id')
+
+        if event_type == 'm.room.redaction':
+            target = event.get('redacts') or content.get('redacts')
+            if target:
+                redacted.add(target)
+        elif event_type == 'm.room.member' and content.get('displayname'):
+            displaynames[event.get('state_key') or event.get('sender')] = content['displayname']
+        elif event_type == 'm.room.join_rules':
+            join_rule = content.get('join_rule')
+        elif event_type == 'm.room.topic':
+            topic = content.get('topic')
+        elif event_type == 'm.room.message':
+            rel_type, target = relation(event)
+            if rel_type == 'm.replace' and target:
+                new_body = (content.get('m.new_content') or {}).get('body')
+                if new_body and event.get('origin_server_ts', 0) >= edits.get(target, (0, ''))[0]:
+                    edits[target] = (event.get('origin_server_ts', 0), new_body)
+
+        if not is_message(event):
+            continue
+
+        sender = event.get('sender', '')
+        if sender not in users:
+            users[sender] = matrix_username(sender, usernames)
+            usernames.add(users[sender])
+
+        timestamp = int(event.get('origin_server_ts', 0))
+        # Messages du dernier horodatage: le watermark les distingue des suivants de la même milliseconde
+        if timestamp > last_ts:
+            last_ts = timestamp
+            last_ids = []
+        if timestamp == last_ts:
+            last_ids.append(event.get('event_id'))
+        attachment = attachment_path(event, data_dir)
+        if attachment:
+            media.add(attachment)
+        rel_type, target = relation(event)
+        if rel_type == 'm.thread' and target:
+            reply_counts[target] = reply_counts.get(target, 0) + 1
+            thread_last_ts[target] = max(thread_last_ts.get(target, 0), timestamp)
+
+    room_name = meta.get('room_name') or meta.get('name') or Path(path).stem
+    return {
+        'room_name': room_name,
+        'room_key': str(meta.get('room_id') or room_id or room_name),
+        'channel': channel_name(room_name),
+        'channel_type': 'O' if join_rule in (None, 'public') else 'P',
+        'topic': meta.get('topic') or topic or '',
+        'users': users,
+        'displaynames': displaynames,
+        'reply_counts': reply_counts,
+        'thread_last_ts': thread_last_ts,
+        'last_ts': last_ts,
+        'last_ids': last_ids,
+        'media': media,
+        'edits': edits,
+        'redacted': redacted,
+        'events': events,
+        'bytes': meta['_reader'].bytes_read if '_reader' in meta else 0
+    }
+
+def message_text(event, username, edits):
+    """Texte Mattermost d'un événement message (édition appliquée, citation retirée)"""
+    content = event.get('content') or {}
+    body = edits.get(event.get('event_id'), (0, content.get('body', '')))[1]
+
+    # Les réponses Matrix embarquent la citation du message d'origine ("> <@x> ...")
+    if ((content.get('m.relates_to') or {}).get('m.in_reply_to')
+            and body.startswith('> ') and '\n\n' in body):
+        body = body.split('\n\n', 1)[1]
+
+    if content.get('msgtype') == 'm.emote':
+        body = f'*{username} {body}*'
+    return body[:MAX_MESSAGE_LENGTH]
+
+def attachment_path(event, data_dir):
+    """Fichier média référencé par l'événement, relatif à data_dir s'il existe"""
+    content = event.get('content') or {}
+    if not data_dir or content.get('msgtype') not in MEDIA_MSGTYPES:
+        return None
+    data_dir = Path(data_dir)
+    media_id = str(content.get('url', '')).rsplit('/', 1)[-1]
+    for name in (media_id, content.get('filename'), content.get('body')):
+        if name and (data_dir / name).is_file():
+            return name
+    return None
+
+def iter_posts(path, scan, team, data_dir=None, stats=None, progress=None):
+    """Deuxième passe: yield les posts Mattermost au fil des événements.
+
+    Un message racine de thread est retenu jusqu'à sa dernière réponse: seuls les
+    threads ouverts restent en mémoire. Si scan['since'] est défini (import
+    incrémental), seuls les messages postérieurs sont convertis; la racine d'un
+    thread déjà importé est réémise avec ses nouvelles réponses.
+    """
+    if stats is None:
+        stats = {}
+    users = scan['users']
+    reply_counts = scan['reply_counts']
+    thread_last_ts = scan.get('thread_last_ts', {})
+    since = scan.get('since')
+    since_ids = scan.get('since_ids')
+    media_paths = scan.get('media_paths', {})
+    open_threads = {}
+    pending_replies = {}
+    meta = {}
+    events = 0
+
+    for event in iter_export(path, meta):
+        events += 1
+        if progress and events % PROGRESS_EVERY == 0:
+            report_progress(progress, 'convert', events, scan['events'], meta, scan['bytes'])
+        if not is_message(event):
+            continue
+
+        event_id = event.get('event_id')
+        create_at = int(event.get('origin_server_ts', 0))
+        rel_type, root_id = relation(event)
+        in_thread = rel_type == 'm.thread' and root_id in open_threads
+
+        post = None
+        if event_id in scan['redacted']:
+            # Réponse supprimée après coup: comptée par scan_export, elle ferme quand même son thread
+            pass
+        elif since is not None and imported_before(create_at, event_id, since, since_ids) and (
+                in_thread or thread_last_ts.get(event_id, 0) <= since):
+            stats['skipped'] = stats.get('skipped', 0) + 1
+        else:
+            username = users[event.get('sender', '')]
+            post = {
+                'user': username,
+                'message': message_text(event, username, scan['edits']),
+                'create_at': create_at
+            }
+            attachment = attachment_path(event, data_dir)
+            if attachment:
+                post['attachments'] = [{'path': media_paths.get(attachment, attachment)}]
+                stats['files'] = stats.get('files', 0) + 1
+            stats['messages'] = stats.get('messages', 0) + 1
+
+        if in_thread:
+            if post is not None:
+                open_threads[root_id]['replies'].append(post)
+            pending_replies[root_id] -= 1
+            if not pending_replies[root_id]:
+                del pending_replies[root_id]
+                yield open_threads.pop(root_id)
+            continue
+        if post is None:
+            continue
+
+        post['team'] = team
+        post['channel'] = scan['channel']
+        if event_id in reply_counts:
+            post['replies'] = []
+            stats['threads'] = stats.get('threads', 0) + 1
+            open_threads[event_id] = post
+            pending_replies[event_id] = reply_counts[event_id]
+        else:
+            yield post
+
+    # Threads incomplets (réponses supprimées ou hors de l'export)
+    yield from open_threads.values()
+
+def imported_before(create_at, event_id, since, since_ids):
+    """Message couvert par le watermark: antérieur, ou de la même milliseconde et déjà importé.
+
+    since_ids (messages importés à since) est None pour un index antérieur à leur suivi:
+    toute la milliseconde est alors considérée comme importée.
+    """
+    if create_at != since:
+        return create_at < since
+    return since_ids is None or event_id in since_ids
+
+def header_lines(team, scans, password=DEFAULT_PASSWORD, delta=None):
+    """Yield les lignes d'en-tête: version, équipe, canaux puis utilisateurs.
+
+    Un utilisateur présent dans plusieurs salons n'apparaît qu'une fois, membre de
+    tous leurs canaux. Avec delta (import incrémental), l'équipe, les canaux et les
+    appartenances déjà importés sont omis, ainsi que le mot de passe des
+    utilisateurs existants (il n'est pas réinitialisé).
+    """
+    delta = delta or {}
+    known_members = {tuple(member) for member in delta.get('members', [])}
+    known_users = set(delta.get('usernames', {}).values())
+
+    yield {'type': 'version', 'version': 1}
+    if not delta.get('team_known'):
+        yield {'type': 'team', 'team': {
+            'name': team,
+            'display_name': team,
+            'type': 'O',
+            'allow_open_invite': False
+        }}
+    for scan in scans:
+        if 'since' in scan:
+            continue
+        yield {'type': 'channel', 'channel': {
+            'team': team,
+            'name': scan['channel'],
+            'display_name': str(scan['room_name'])[:MAX_CHANNEL_NAME_LENGTH],
+            'type': scan['channel_type'],
+            'header': str(scan['topic'])[:1024]
+        }}
+
+    channels = {}
+    nicknames = {}
+    for scan in scans:
+        for sender, username in scan['users'].items():
+            if (scan['channel'], username) in known_members:
+                continue
+            channels.setdefault(username, []).append(scan['channel'])
+            if sender in scan['displaynames'] and username not in nicknames:
+                nicknames[username] = scan['displaynames'][sender][:64]
+
+    for username, user_channels in channels.items():
+        user = {
+            'username': username,
+            'email': f'{username}@imported.local',
+            'teams': [{
+                'name': team,
+                'roles': 'team_user',
+                'channels': [{'name': channel, 'roles': 'channel_user'} for channel in user_channels]
+            }]
+        }
+        if username not in known_users:
+            user['password'] = password
+        if username in nicknames:
+            user['nickname'] = nicknames[username]
+        yield {'type': 'user', 'user': user}
+
+def iter_import_lines(path, team, password=DEFAULT_PASSWORD, data_dir=None, stats=None,
+                      progress=None, delta=None, media_sources=None):
+    """Chaîne complète: yield les objets JSONL Mattermost d'un export Element.
+
+    stats['index'] reçoit, une fois les lignes épuisées, les données à enregistrer
+    dans l'index d'import (voir import_index.py) si l'import réussit. Si
+    media_sources est un dict, les pièces jointes sont préparées pour une archive
+    (voir stage_media) et il reçoit {chemin dans l'archive: fichier source}.
+    """
+    if stats is None:
+        stats = {}
+    scan = scan_export(path, progress, data_dir)
+    usernames = unify_rooms([scan], delta)
+    stats.update({'users': len(scan['users']), 'messages': 0, 'threads': 0, 'files': 0,
+                  'skipped': 0, 'events': scan['events'], 'bytes': scan['bytes']})
+    if media_sources is not None and scan['media']:
+        scan['media_paths'], sources, media_stats = stage_media(data_dir, scan['media'])
+        media_sources.update(sources)
+        stats.update(media_stats)
+
+    yield from header_lines(team, [scan], password, delta)
+    for post in iter_posts(path, scan, team, data_dir, stats, progress):
+        yield {'type': 'post', 'post': post}
+    stats['index'] = index_entries([scan], usernames)
+
+def write_lines(out, lines):
+    """Écrire des objets JSONL dans un flux texte"""
+    for line in lines:
+        out.write(ENCODER.encode(line))
+        out.write('\n')
+
+def post_media(post, media_sources):
+    """Pièces jointes (chemin dans l'archive, fichier source) d'un post et de ses réponses"""
+    return [
+        (attachment['path'], media_sources[attachment['path']])
+        for item in (post, *post.get('replies', ()))
+        for attachment in item.get('attachments', ())
+        if attachment['path'] in media_sources
+    ]
+
+def archive_lines(lines, media_sources):
+    """Objets JSONL → (texte, est_un_post, pièces jointes) pour write_shards"""
+    for line in lines:
+        if line['type'] == 'post':
+            yield ENCODER.encode(line), True, post_media(line['post'], media_sources)
+        else:
+            yield ENCODER.encode(line), False, ()
+
+def convert_export(input_path, output_path, team, password=DEFAULT_PASSWORD, data_dir=None,
+                   compression='deflated', compresslevel=None, progress=None, delta=None):
+    """Convertir un export Element en JSONL Mattermost, retourne les stats.
+
+    Si output_path se termine par .zip, le JSONL est écrit directement dans l'archive
+    d'import, sans fichier intermédiaire. progress, s'il est fourni, reçoit des dicts
+    {stage, events, events_total, bytes_read, bytes_total} pendant la conversion.
+    delta (ImportIndex.snapshot) limite la conversion aux nouveaux événements.
+    Dans une archive, les pièces jointes de data_dir sont ajoutées sous data/, une
+    seule fois par contenu.
+    """
+    stats = {}
+    if str(output_path).endswith('.zip'):
+        media_sources = {}
+        media = {}
+        lines = iter_import_lines(input_path, team, password, data_dir, stats, progress, delta,
+                                  media_sources)
+        with open_archive(output_path, compression, compresslevel) as archive:
+            with open_jsonl_entry(archive) as out:
+                for text, _, post_files in archive_lines(lines, media_sources):
+                    out.write(text)
+                    out.write('\n')
+                    media.update(post_files)
+            add_media(archive, media.items())
+    else:
+        lines = iter_import_lines(input_path, team, password, data_dir, stats, progress, delta)
+        with open(output_path, 'w', encoding='utf-8') as out:
+            write_lines(out, lines)
+    if progress:
+        progress({'stage': 'done', 'events': stats['events'], 'events_total': stats['events'],
+                  'bytes_read': stats['bytes'], 'bytes_total': stats['bytes'], 'stats': stats})
+    return stats
+
+def shard_path(output_path, index):
+    """Chemin du shard index (import.zip → import-001.zip)"""
+    output_path = Path(output_path)
+    return output_path.with_name(f'{output_path.stem}-{index:03d}{output_path.suffix}')
+
+def write_shards(output_path, lines, compression='deflated', compresslevel=None, progress=None,
+                 shard_posts=None, shard_bytes=None):
+    """Écrire des lignes JSONL (texte, est_un_post, pièces jointes) dans des archives successives.
+
+    Un shard est fermé dès qu'il atteint shard_posts posts ou shard_bytes octets de
+    JSONL; progress reçoit alors {stage: 'shard', shard: {index, path, posts, bytes}}
+    et le shard peut être importé pendant l'écriture des suivants. Chaque shard
+    contient les pièces jointes (chemin dans l'archive, fichier source) de ses
+    posts. Retourne les chemins.
+    """
+    shards = []
+    stack = None
+    entry = None
+    archive = None
+    out = None
+    media = {}
+    posts = 0
+    size = 0
+
+    def close_shard():
+        entry.close()
+        add_media(archive, media.items())
+        stack.close()
+        index = len(shards) + 1
+        shard = {'index': index, 'path': str(shard_path(output_path, index)),
+                 'posts': posts, 'bytes': size}
+        shards.append(shard['path'])
+        if progress:
+            progress({'stage': 'shard', 'shard': shard})
+
+    try:
+        for text, is_post, post_files in lines:
+            if out is None:
+                stack = ExitStack()
+                archive = stack.enter_context(open_archive(
+                    shard_path(output_path, len(shards) + 1), compression, compresslevel))
+                entry = ExitStack()
+                out = entry.enter_context(open_jsonl_entry(archive))
+                media = {}
+                posts = 0
+                size = 0
+                if shards:
+                    write_lines(out, [{'type': 'version', 'version': 1}])
+
+            out.write(text)
+            out.write('\n')
+            size += len(text) + 1
+            media.update(post_files)
+            if is_post:
+                posts += 1
+                if (shard_posts and posts >= shard_posts) or (shard_bytes and size >= shard_bytes):
+                    close_shard()
+                    out = None
+        if out is not None:
+            close_shard()
+            out = None
+    finally:
+        if out is not None:
+            entry.close()
+            stack.close()
+    return shards
+
+def convert_export_shards(input_path, output_path, team, password=DEFAULT_PASSWORD, data_dir=None,
+                          compression='deflated', compresslevel=None, progress=None,
+                          shard_posts=None, shard_bytes=None, delta=None):
+    """Convertir un export en plusieurs archives d'import (voir write_shards), retourne les stats.
+
+    Le premier shard contient l'équipe, le canal et les utilisateurs: les shards
+    doivent être importés dans l'ordre.
+    """
+    stats = {}
+    media_sources = {}
+    lines = iter_import_lines(input_path, team, password, data_dir, stats, progress, delta,
+                              media_sources)
+    stats['shards'] = write_shards(output_path, archive_lines(lines, media_sources), compression,
+                                   compresslevel, progress, shard_posts, shard_bytes)
+    if progress:
+        progress({'stage': 'done', 'events': stats['events'], 'events_total': stats['events'],
+                  'bytes_read': stats['bytes'], 'bytes_total': stats['bytes'], 'stats': stats})
+    return stats
+
+def scan_room(path, data_dir=None):
+    """Première passe d'un salon (exécutable dans un worker)"""
+    return scan_export(path, data_dir=data_dir)
+
+def convert_room(path, scan, team, data_dir, output_path):
+    """Deuxième passe d'un salon: ses posts en JSONL dans output_path, retourne les stats"""
+    stats = {'messages': 0, 'threads': 0, 'files': 0, 'skipped': 0}
+    posts = ({'type': 'post', 'post': post} for post in iter_posts(path, scan, team, data_dir, stats))
+    with open(output_path, 'w', encoding='utf-8') as out:
+        write_lines(out, posts)
+    return stats
+
+def unify_rooms(scans, delta=None):
+    """Noms d'utilisateur et de canaux uniques sur l'ensemble des salons (scans modifiés).
+
+    Avec delta, les noms déjà importés sont conservés et réservés, et les salons
+    connus reçoivent leur watermark dans scan['since']. Retourne les noms
+    d'utilisateur des salons (identifiant Matrix → nom Mattermost).
+    """
+    delta = delta or {}
+    known_rooms = delta.get('rooms', {})
+    usernames = dict(delta.get('usernames', {}))
+    taken = set(usernames.values())
+    channels = {room['channel'] for room in known_rooms.values()}
+    found = {}
+    for scan in scans:
+        for sender in scan['users']:
+            if sender not in usernames:
+                usernames[sender] = matrix_username(sender, taken)
+                taken.add(usernames[sender])
+            found[sender] = usernames[sender]
+        scan['users'] = {sender: usernames[sender] for sender in scan['users']}
+
+        known = known_rooms.get(scan['room_key'])
+        if known:
+            scan['channel'] = known['channel']
+            scan['since'] = known['last_ts']
+            scan['since_ids'] = known.get('last_ids')
+            continue
+
+        base = name = scan['channel']
+        suffix = 2
+        while name in channels:
+            tail = f'-{suffix}'
+            name = base[:MAX_CHANNEL_NAME_LENGTH - len(tail)] + tail
+            suffix += 1
+        channels.add(name)
+        scan['channel'] = name
+    return found
+
+def index_entries(scans, usernames):
+    """Salons (watermark), utilisateurs et appartenances d'un import, pour import_index.py"""
+    return {
+        'rooms': {scan['room_key']: {'room_name': str(scan['room_name']), 'channel': scan['channel'],
+                                     **watermark(scan)}
+                  for scan in scans},
+        'usernames': usernames,
+        'members': sorted({(scan['channel'], username)
+                           for scan in scans for username in scan['users'].values()})
+    }
+
+def watermark(scan):
+    """Watermark d'un salon après import: dernier horodatage et messages importés à cet horodatage"""
+    since = scan.get('since')
+    if since is None or scan['last_ts'] > since:
+        return {'last_ts': scan['last_ts'], 'last_ids': scan.get('last_ids', [])}
+    if scan['last_ts'] < since:
+        return {'last_ts': since, 'last_ids': scan.get('since_ids')}
+    return {'last_ts': since, 'last_ids': sorted(set(scan.get('since_ids') or []) | set(scan.get('last_ids', [])))}
+
+def call_room_function(call):
+    """Appeler scan_room ou convert_room à partir d'un tuple (nom, kwargs)"""
+    name, kwargs = call
+    if name not in ROOM_FUNCTIONS:
+        raise ValueError(f'Fonction inconnue: {name}')
+    return globals()[name](**kwargs)
+
+def convert_rooms(input_paths, output_path, team, password=DEFAULT_PASSWORD, data_dir=None,
+                  compression='deflated', compresslevel=None, progress=None,
+                  shard_posts=None, shard_bytes=None, run_calls=None, delta=None):
+    """Convertir plusieurs salons en une seule importation, retourne les stats.
+
+    Les deux passes de chaque salon sont réparties par run_calls(calls), qui
+    exécute une liste de (nom, kwargs) en parallèle et retourne les résultats dans
+    l'ordre (par défaut: séquentiellement). Les posts de chaque salon sont écrits
+    dans un fichier temporaire, puis fusionnés derrière les en-têtes communs.
+    """
+    if run_calls is None:
+        run_calls = lambda calls: [call_room_function(call) for call in calls]
+    bytes_total = sum(os.path.getsize(path) for path in input_paths)
+
+    def report(stage, done_paths, events, events_total):
+        if progress:
+            progress({'stage': stage, 'events': events, 'events_total': events_total,
+                      'bytes_read': sum(os.path.getsize(path) for path in done_paths),
+                      'bytes_total': bytes_total})
+
+    scans = run_calls([('scan_room', {'path': str(path), 'data_dir': data_dir}) for path in input_paths])
+    events_total = sum(scan['events'] for scan in scans)
+    report('scan', input_paths, events_total, None)
+    usernames = unify_rooms(scans, delta)
+
+    # Pièces jointes de tous les salons: un fichier identique n'est ajouté qu'une fois
+    media_sources = {}
+    media_stats = {}
+    media_names = set().union(*(scan['media'] for scan in scans))
+    if media_names:
+        media_paths, media_sources, media_stats = stage_media(data_dir, media_names)
+        for scan in scans:
+            scan['media_paths'] = {name: media_paths[name] for name in scan['media']}
+
+    posts_paths = [shard_path(Path(output_path).with_suffix('.posts'), index)
+                   for index in range(1, len(input_paths) + 1)]
+    try:
+        room_stats = run_calls([
+            ('convert_room', {'path': str(path), 'scan': scan, 'team': team,
+                              'data_dir': data_dir, 'output_path': str(posts_path)})
+            for path, scan, posts_path in zip(input_paths, scans, posts_paths)
+        ])
+        report('convert', input_paths, events_total, events_total)
+
+        stats = {'users': len(usernames), 'rooms': len(input_paths), 'events': events_total,
+                 'bytes': bytes_total}
+        for key in ('messages', 'threads', 'files', 'skipped'):
+            stats[key] = sum(room.get(key, 0) for room in room_stats)
+        stats.update(media_stats)
+
+        def lines():
+            for line in header_lines(team, scans, password, delta):
+                yield ENCODER.encode(line), False, ()
+            for posts_path in posts_paths:
+                with open(posts_path, encoding='utf-8') as f:
+                    for text in f:
+                        text = text.rstrip('\n')
+                        post_files = post_media(json.loads(text)['post'], media_sources) if media_sources else ()
+                        yield text, True, post_files
+
+        stats['shards'] = write_shards(output_path, lines(), compression, compresslevel, progress,
+                                       shard_posts, shard_bytes)
+        stats['index'] = index_entries(scans, usernames)
+    finally:
+        for posts_path in posts_paths:
+            if posts_path.exists():
+                posts_path.unlink()
+
+    if progress:
+        progress({'stage': 'done', 'events': events_total, 'events_total': events_total,
+                  'bytes_read': bytes_total, 'bytes_total': bytes_total, 'stats': stats})
+    return stats
+
+def print_progress(event):
+    """Progression au format JSON (une ligne par événement) sur stderr"""
+    print(json.dumps({'progress': event}), file=sys.stderr, flush=True)
+
+def main():
+    """Point d'entrée CLI (mêmes options que element_to_mattermost.py)"""
+    parser = argparse.ArgumentParser(description='Conversion en flux Element.io → Mattermost JSONL')
+    parser.add_argument('input', nargs='+', help='Export(s) JSON Element (un fichier par salon)')
+    parser.add_argument('--team', required=True, help='Nom de l\'équipe Mattermost')
+    parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Mot de passe par défaut')
+    parser.add_argument('--output', required=True, help='Fichier JSONL de sortie (ou archive .zip)')
+    parser.add_argument('--data-dir', help='Dossier contenant les médias Element')
+    parser.add_argument('--compression', choices=sorted(COMPRESSION_METHODS), default='deflated',
+                        help='Compression de l\'archive .zip')
+    parser.add_argument('--compress-level', type=int, default=None, help='Niveau de compression (0-9)')
+    parser.add_argument('--progress', action='store_true',
+                        help='Écrire la progression en JSON sur stderr')
+    parser.add_argument('--shard-posts', type=int, default=None,
+                        help='Découper l\'archive .zip en shards de N posts au plus')
+    parser.add_argument('--shard-bytes', type=int, default=None,
+                        help='Découper l\'archive .zip en shards de N octets de JSONL environ')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Processus de conversion en parallèle (plusieurs salons)')
+    args = parser.parse_args()
+
+    if len(args.input) > 1 and not args.output.endswith('.zip'):
+        parser.error('plusieurs salons: la sortie doit être une archive .zip')
+
+    try:
+        if len(args.input) > 1:
+            with ProcessPoolExecutor(max_workers=args.workers) as executor:
+                stats = convert_rooms(args.input, args.output, args.team, args.password,
+                                      args.data_dir, args.compression, args.compress_level,
+                                      print_progress if args.progress else None,
+                                      args.shard_posts, args.shard_bytes,
+                                      lambda calls: list(executor.map(call_room_function, calls)))
+        elif (args.shard_posts or args.shard_bytes) and args.output.endswith('.zip'):
+            stats = convert_export_shards(args.input[0], args.output, args.team, args.password,
+                                          args.data_dir, args.compression, args.compress_level,
+                                          print_progress if args.progress else None,
+                                          args.shard_posts, args.shard_bytes)
+        else:
+            stats = convert_export(args.input[0], args.output, args.team, args.password, args.data_dir,
+                                   args.compression, args.compress_level,
+                                   print_progress if args.progress else None)
+    except (OSError, ValueError) as e:
+        print(f'Erreur: {e}', file=sys.stderr)
+        sys.exit(1)
+
+    print(f"{stats['users']} utilisateurs")
+    print(f"{stats['messages']} messages")
+    print(f"{stats['threads']} threads")
+    print(f"{stats['files']} fichiers")
+    if stats.get('media_files'):
+        print(f"{stats['media_files']} pièces jointes distinctes ({stats['media_duplicates']} doublons)")
+    for path in stats.get('shards', []):
+        print(path)
+    return stats
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Génération d'exports Element synthétiques (benchmarks, tests de charge)
+Chaque salon est écrit en flux, événement par événement: la taille de l'export
+n'est pas limitée par la mémoire.
+
+Usage:
+    python3 generate_export.py export.json --messages 10000
+    python3 generate_export.py exports/ --rooms 8 --users 200 --messages 50000 --thread-depth 5
+    python3 generate_export.py exports/ --rooms 4 --attachments 500 --media-dir media/ --zip
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import zipfile
+from pathlib import Path
+
+# Horodatage du premier événement (ms) et intervalle entre deux événements
+START_TS = 1600000000000
+EVENT_INTERVAL = 1000
+
+WORDS = ('bonjour', 'import', 'mattermost', 'element', 'réunion', 'demain', 'fichier', 'version',
+         'serveur', 'merci', 'question', 'projet', 'équipe', 'salon', 'message', 'test', 'ok')
+
+# Pièces jointes: type Matrix et extension
+MEDIA_TYPES = (('m.image', '.jpg'), ('m.file', '.pdf'), ('m.file', '.txt'), ('m.video', '.mp4'))
+
+
+def random_text(rng, words=12):
+    """Phrase aléatoire de quelques mots"""
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, words))).capitalize()
+
+def generate_media(media_dir, count, size, duplicate_ratio, rng):
+    """Créer count fichiers média (une part de doublons), retourne [(media_id, msgtype, nom)]"""
+    media_dir = Path(media_dir)
+    media_dir.mkdir(parents=True, exist_ok=True)
+    media = []
+    contents = []
+    for index in range(count):
+        msgtype, suffix = MEDIA_TYPES[index % len(MEDIA_TYPES)]
+        media_id = f'media{index:06d}'
+        if contents and rng.random() < duplicate_ratio:
+            content = rng.choice(contents)
+        else:
+            content = os.urandom(size)
+            contents.append(content)
+        (media_dir / media_id).write_bytes(content)
+        media.append((media_id, msgtype, f'fichier-{index}{suffix}'))
+    return media
+
+def iter_room_events(room_index, users, messages, thread_ratio, thread_depth, edit_ratio,
+                     redaction_ratio, media, rng):
+    """Yield les événements d'un salon: état initial puis messages, threads, éditions et suppressions"""
+    room_id = f'!room{room_index}:bench.local'
+    ts = START_TS
+    counter = 0
+
+    def event(event_type, sender, content, **extra):
+        nonlocal ts, counter
+        ts += EVENT_INTERVAL
+        counter += 1
+        return {'type': event_type, 'event_id': f'$r{room_index}e{counter}', 'room_id': room_id,
+                'sender': sender, 'origin_server_ts': ts, 'content': content, **extra}
+
+    yield event('m.room.join_rules', users[0], {'join_rule': 'public' if room_index % 2 == 0 else 'invite'})
+    yield event('m.room.topic', users[0], {'topic': f'Salon de test {room_index}'})
+    for user in users:
+        yield event('m.room.member', user, {'membership': 'join', 'displayname': user[1:].split(':')[0].title()},
+                    state_key=user)
+
+    open_threads = {}
+    recent = []
+    attachment_ratio = len(media) / messages if messages else 0
+    for _ in range(messages):
+        sender = rng.choice(users)
+        content = {'msgtype': 'm.text', 'body': random_text(rng)}
+
+        if open_threads and rng.random() < 0.5:
+            root_id = rng.choice(list(open_threads))
+            content['m.relates_to'] = {'rel_type': 'm.thread', 'event_id': root_id}
+            open_threads[root_id] -= 1
+            if not open_threads[root_id]:
+                del open_threads[root_id]
+        elif media and rng.random() < attachment_ratio:
+            media_id, msgtype, name = rng.choice(media)
+            content = {'msgtype': msgtype, 'body': name, 'filename': name,
+                       'url': f'mxc://bench.local/{media_id}'}
+
+        message = event('m.room.message', sender, content)
+        yield message
+        if 'm.relates_to' not in content and thread_depth and rng.random() < thread_ratio:
+            open_threads[message['event_id']] = rng.randint(1, thread_depth)
+        recent = (recent + [message])[-100:]
+
+        if rng.random() < edit_ratio:
+            target = rng.choice(recent)
+            yield event('m.room.message', target['sender'], {
+                'msgtype': 'm.text',
+                'body': '* ' + random_text(rng),
+                'm.new_content': {'msgtype': 'm.text', 'body': random_text(rng)},
+                'm.relates_to': {'rel_type': 'm.replace', 'event_id': target['event_id']}
+            })
+        if rng.random() < redaction_ratio:
+            target = rng.choice(recent)
+            yield event('m.room.redaction', target['sender'], {}, redacts=target['event_id'])
+
+def write_room(path, room_index, users, messages, thread_ratio=0.1, thread_depth=3, edit_ratio=0.01,
+               redaction_ratio=0.005, media=(), seed=0):
+    """Écrire l'export d'un salon, retourne le nombre d'événements"""
+    rng = random.Random(seed * 1000 + room_index)
+    events = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        meta = {'room_name': f'Salon {room_index}', 'room_id': f'!room{room_index}:bench.local',
+                'export_date': '2020-09-13'}
+        # Métadonnées puis tableau des événements, écrit au fil de la génération
+        f.write(json.dumps(meta, ensure_ascii=False)[:-1] + ', "events": [\n')
+        for event in iter_room_events(room_index, users, messages, thread_ratio, thread_depth,
+                                      edit_ratio, redaction_ratio, media, rng):
+            if events:
+                f.write(',\n')
+            f.write(json.dumps(event, ensure_ascii=False))
+            events += 1
+        f.write('\n]}\n')
+    return events
+
+def generate_exports(output, rooms=1, users=50, messages=10000, thread_ratio=0.1, thread_depth=3,
+                     edit_ratio=0.01, redaction_ratio=0.005, attachments=0, attachment_size=64 * 1024,
+                     duplicate_ratio=0.2, media_dir=None, archive=False, seed=0):
+    """Générer un export (un salon) ou un dossier d'exports, retourne un résumé.
+
+    messages est le nombre de messages par salon (réponses de threads comprises);
+    les utilisateurs sont communs à tous les salons.
+    """
+    output = Path(output)
+    rng = random.Random(seed)
+    user_ids = [f'@user{index}:bench.local' for index in range(users)]
+    media = []
+    if attachments:
+        media_dir = Path(media_dir or output.parent / 'media')
+        media = generate_media(media_dir, attachments, attachment_size, duplicate_ratio, rng)
+
+    if rooms == 1 and output.suffix == '.json':
+        output.parent.mkdir(parents=True, exist_ok=True)
+        paths = [output]
+    else:
+        output.mkdir(parents=True, exist_ok=True)
+        paths = [output / f'salon-{index:03d}.json' for index in range(1, rooms + 1)]
+
+    events = 0
+    for index, path in enumerate(paths, 1):
+        room_users = user_ids if rooms == 1 else rng.sample(user_ids, max(1, min(users, users // 2 + 1)))
+        events += write_room(path, index, room_users, messages, thread_ratio, thread_depth, edit_ratio,
+                             redaction_ratio, media, seed)
+
+    summary = {
+        'paths': [str(path) for path in paths],
+        'rooms': len(paths),
+        'messages': messages * len(paths),
+        'events': events,
+        'bytes': sum(path.stat().st_size for path in paths),
+        'media_dir': str(media_dir) if media else None,
+        'attachments': len(media)
+    }
+    if archive:
+        archive_path = output.with_suffix('.zip')
+        with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for path in paths:
+                zf.write(path, path.name)
+        summary['archive'] = str(archive_path)
+    return summary
+
+def main():
+    """Point d'entrée CLI: résumé JSON de l'export généré sur stdout"""
+    parser = argparse.ArgumentParser(description='Génération d\'exports Element synthétiques')
+    parser.add_argument('output', help='Fichier .json (un salon) ou dossier (plusieurs salons)')
+    parser.add_argument('--rooms', type=int, default=1, help='Nombre de salons')
+    parser.add_argument('--users', type=int, default=50, help='Nombre d\'utilisateurs')
+    parser.add_argument('--messages', type=int, default=10000, help='Messages par salon')
+    parser.add_argument('--thread-ratio', type=float, default=0.1,
+                        help='Part des messages qui ouvrent un thread')
+    parser.add_argument('--thread-depth', type=int, default=3, help='Réponses maximales par thread')
+    parser.add_argument('--edit-ratio', type=float, default=0.01, help='Part des messages édités')
+    parser.add_argument('--redaction-ratio', type=float, default=0.005, help='Part des messages supprimés')
+    parser.add_argument('--attachments', type=int, default=0, help='Nombre de fichiers média distincts')
+    parser.add_argument('--attachment-size', type=int, default=64 * 1024, help='Taille d\'un média (octets)')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.2,
+                        help='Part des médias au contenu identique à un autre')
+    parser.add_argument('--media-dir', help='Dossier des médias (défaut: media/ à côté de la sortie)')
+    parser.add_argument('--zip', action='store_true', help='Regrouper les salons dans une archive .zip')
+    parser.add_argument('--seed', type=int, default=0, help='Graine aléatoire (exports reproductibles)')
+    args = parser.parse_args()
+
+    try:
+        summary = generate_exports(
+            args.output, args.rooms, args.users, args.messages, args.thread_ratio, args.thread_depth,
+            args.edit_ratio, args.redaction_ratio, args.attachments, args.attachment_size,
+            args.duplicate_ratio, args.media_dir, args.zip, args.seed
+        )
+    except OSError as e:
+        print(f'Erreur: {e}', file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    main()
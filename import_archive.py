@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Archives ZIP d'import Mattermost, sans dépendance à la commande `zip`
+Le JSONL est écrit directement dans une entrée de l'archive, en flux. Les médias
+déjà compressés (images, vidéos, archives...) sont stockés tels quels.
+
+Usage:
+    python3 import_archive.py [--compression stored|deflated] [--level N] import.zip import.jsonl [mattermost_data/]
+    python3 import_archive.py --media-dir media/ [--stage-dir staged/] import.zip import.jsonl
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+# 'stored' (aucune compression) est le plus rapide à ingérer pour mmctl
+COMPRESSION_METHODS = {
+    'stored': zipfile.ZIP_STORED,
+    'deflated': zipfile.ZIP_DEFLATED
+}
+
+JSONL_ENTRY = 'import.jsonl'
+
+# Dossier des pièces jointes dans l'archive (chemins des attachments relatifs à ce dossier)
+MEDIA_DIR = 'data'
+
+# Formats déjà compressés: les recompresser coûte du CPU sans réduire leur taille
+COMPRESSED_SUFFIXES = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.avif',
+    '.mp4', '.m4v', '.mov', '.webm', '.mkv', '.avi',
+    '.mp3', '.m4a', '.aac', '.ogg', '.oga', '.opus', '.flac',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.zst',
+    '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.pdf'
+}
+
+
+def open_archive(path, compression='deflated', compresslevel=None):
+    """Ouvrir une archive ZIP d'import en écriture"""
+    if compression not in COMPRESSION_METHODS:
+        raise ValueError(f'Compression inconnue: {compression} (stored ou deflated)')
+    return zipfile.ZipFile(
+        path, 'w',
+        compression=COMPRESSION_METHODS[compression],
+        compresslevel=compresslevel,
+        allowZip64=True
+    )
+
+@contextmanager
+def open_jsonl_entry(archive, name=JSONL_ENTRY):
+    """Entrée JSONL de l'archive, ouverte en écriture texte et compressée au fil de l'eau"""
+    with archive.open(name, 'w', force_zip64=True) as raw:
+        with io.TextIOWrapper(raw, encoding='utf-8', newline='\n') as out:
+            yield out
+
+def entry_compression(name, default):
+    """Méthode de compression d'une entrée: stockée telle quelle si le format est déjà compressé"""
+    if Path(name).suffix.lower() in COMPRESSED_SUFFIXES:
+        return zipfile.ZIP_STORED
+    return default
+
+def add_file(archive, source, arcname):
+    """Ajouter un fichier sous arcname (lu directement depuis source, sans copie intermédiaire)"""
+    archive.write(source, arcname, compress_type=entry_compression(arcname, archive.compression))
+
+def add_path(archive, path):
+    """Ajouter un fichier (à la racine) ou un dossier (récursivement, sous son nom)"""
+    path = Path(path)
+    if path.is_dir():
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                src = Path(root) / name
+                add_file(archive, src, str(src.relative_to(path.parent)))
+    else:
+        add_file(archive, path, path.name)
+
+def add_media(archive, media):
+    """Ajouter des pièces jointes ((chemin relatif à data/, fichier source)) sous MEDIA_DIR/"""
+    for path, source in media:
+        add_file(archive, source, f'{MEDIA_DIR}/{path}')
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Empreinte SHA-256 d'un fichier"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def link_or_copy(source, target):
+    """Lien physique target → source, copie si les deux ne sont pas sur le même système de fichiers"""
+    target = Path(target)
+    if target.exists():
+        return
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+def stage_media(data_dir, names, workers=None, stage_dir=None):
+    """Préparer les pièces jointes d'un import: empreintes en parallèle, doublons fusionnés.
+
+    Retourne ({nom dans data_dir: chemin dans l'archive}, {chemin dans l'archive:
+    fichier source}, stats). Des fichiers identiques (même contenu, même sous
+    plusieurs noms ou dans plusieurs salons) partagent un seul chemin, sous un
+    dossier nommé d'après leur empreinte: le nom affiché dans Mattermost est conservé.
+    Avec stage_dir, chaque fichier retenu y est lié (copié entre systèmes de fichiers
+    différents) sous son chemin dans l'archive, et les sources pointent vers ces liens.
+    """
+    data_dir = Path(data_dir)
+    names = sorted(names)
+    # hashlib libère le GIL: les fichiers sont lus et hachés en parallèle
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        digests = list(executor.map(lambda name: file_digest(data_dir / name), names))
+
+        paths = {}
+        sources = {}
+        by_digest = {}
+        for name, digest in zip(names, digests):
+            path = by_digest.get(digest)
+            if path is None:
+                path = by_digest[digest] = f'{digest[:16]}/{Path(name).name}'
+                sources[path] = str(data_dir / name)
+            paths[name] = path
+        if stage_dir is not None:
+            staged = {path: str(Path(stage_dir) / path) for path in sources}
+            list(executor.map(lambda path: link_or_copy(sources[path], staged[path]), sources))
+            sources = staged
+    stats = {
+        'media_files': len(sources),
+        'media_duplicates': len(names) - len(sources),
+        'media_bytes': sum(os.path.getsize(source) for source in sources.values())
+    }
+    return paths, sources, stats
+
+def line_attachments(line):
+    """Pièces jointes d'une ligne JSONL d'import (post ou message direct, et leurs réponses)"""
+    post = line.get('post') or line.get('direct_post') or {}
+    attachments = list(post.get('attachments') or [])
+    for reply in post.get('replies') or []:
+        attachments.extend(reply.get('attachments') or [])
+    return attachments
+
+def media_name(path, media_dir):
+    """Fichier de media_dir désigné par le chemin d'une pièce jointe (tel quel ou par son nom), sinon None"""
+    path = Path(path)
+    if path.is_absolute() or '..' in path.parts:
+        return None
+    for name in (path.as_posix(), path.name):
+        if name and (media_dir / name).is_file():
+            return name
+    return None
+
+def build_import_archive(output, jsonl, media_dir, compression='deflated', compresslevel=None,
+                         stage_dir=None, workers=None):
+    """Archive d'import d'un JSONL dont les pièces jointes sont dans media_dir, retourne les stats.
+
+    Les pièces jointes sont dédupliquées (voir stage_media) et ajoutées une fois sous
+    MEDIA_DIR/; leurs chemins sont réécrits dans l'entrée JSONL. Les chemins qui ne
+    désignent aucun fichier de media_dir sont conservés tels quels.
+    """
+    media_dir = Path(media_dir)
+    names = set()
+    unresolved = 0
+    with open(jsonl, encoding='utf-8') as f:
+        for text in f:
+            if '"attachments"' not in text:
+                continue
+            for attachment in line_attachments(json.loads(text)):
+                name = media_name(attachment.get('path', ''), media_dir)
+                if name:
+                    names.add(name)
+                else:
+                    unresolved += 1
+    paths, sources, stats = stage_media(media_dir, names, workers, stage_dir)
+    stats['media_unresolved'] = unresolved
+
+    with open_archive(output, compression, compresslevel) as archive:
+        with open(jsonl, encoding='utf-8') as f, open_jsonl_entry(archive) as out:
+            for text in f:
+                if '"attachments"' in text:
+                    line = json.loads(text)
+                    for attachment in line_attachments(line):
+                        name = media_name(attachment.get('path', ''), media_dir)
+                        if name:
+                            attachment['path'] = paths[name]
+                    text = json.dumps(line, ensure_ascii=False) + '\n'
+                out.write(text)
+        add_media(archive, sorted(sources.items()))
+    return stats
+
+def build_archive(output, paths, compression='deflated', compresslevel=None):
+    """Construire une archive d'import à partir de fichiers et dossiers existants"""
+    with open_archive(output, compression, compresslevel) as archive:
+        for path in paths:
+            add_path(archive, path)
+
+def main():
+    """Point d'entrée CLI (remplace `zip -q -r` dans element-import.sh)"""
+    parser = argparse.ArgumentParser(description='Création d\'une archive d\'import Mattermost')
+    parser.add_argument('output', help='Archive ZIP à créer')
+    parser.add_argument('paths', nargs='+', help='Fichiers JSONL et dossiers de médias')
+    parser.add_argument('--compression', choices=sorted(COMPRESSION_METHODS), default='deflated')
+    parser.add_argument('--level', type=int, default=None, help='Niveau de compression (0-9)')
+    parser.add_argument('--media-dir', help='Dossier des pièces jointes du JSONL (dédupliquées sous data/)')
+    parser.add_argument('--stage-dir', help='Dossier où lier les pièces jointes retenues (avec --media-dir)')
+    args = parser.parse_args()
+
+    try:
+        if args.media_dir:
+            if len(args.paths) != 1:
+                parser.error('--media-dir attend un seul fichier JSONL')
+            stats = build_import_archive(args.output, args.paths[0], args.media_dir, args.compression,
+                                         args.level, args.stage_dir)
+            print(f'Pièces jointes: {stats["media_files"]} fichier(s), {stats["media_duplicates"]} doublon(s), '
+                  f'{stats["media_unresolved"]} introuvable(s)')
+        else:
+            build_archive(args.output, args.paths, args.compression, args.level)
+    except (OSError, ValueError) as e:
+        print(f'Erreur: {e}', file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
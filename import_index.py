@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Index des imports déjà effectués, par équipe
+Pour chaque salon importé: son canal Mattermost et l'horodatage du dernier
+événement importé (watermark), ainsi que les utilisateurs et leurs canaux.
+Un nouvel import du même salon ne convertit alors que les nouveaux événements
+(les messages déjà importés à l'horodatage du watermark sont reconnus à leur identifiant).
+
+Usage:
+    python3 import_index.py show import_index.db --team myteam
+    python3 import_index.py reset import_index.db --team myteam
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+
+class ImportIndex:
+    """Index SQLite (mode WAL) des salons, utilisateurs et canaux importés"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        self._connection().executescript('''
+                CREATE TABLE IF NOT EXISTS teams (
+                    team TEXT PRIMARY KEY,
+                    imported_at TEXT
+                );
+                CREATE TABLE IF NOT EXISTS rooms (
+                    team TEXT NOT NULL,
+                    room_key TEXT NOT NULL,
+                    room_name TEXT,
+                    channel TEXT NOT NULL,
+                    last_ts INTEGER NOT NULL DEFAULT 0,
+                    last_ids TEXT,
+                    imported_at TEXT,
+                    PRIMARY KEY (team, room_key)
+                );
+                CREATE TABLE IF NOT EXISTS users (
+                    team TEXT NOT NULL,
+                    sender TEXT NOT NULL,
+                    username TEXT NOT NULL,
+                    PRIMARY KEY (team, sender)
+                );
+                CREATE TABLE IF NOT EXISTS members (
+                    team TEXT NOT NULL,
+                    channel TEXT NOT NULL,
+                    username TEXT NOT NULL,
+                    PRIMARY KEY (team, channel, username)
+                );
+        ''')
+        # Index créé avant le suivi des messages du watermark
+        columns = {row['name'] for row in self._connection().execute('PRAGMA table_info(rooms)')}
+        if 'last_ids' not in columns:
+            self._connection().execute('ALTER TABLE rooms ADD COLUMN last_ids TEXT')
+
+    def _connection(self):
+        """Connexion SQLite du thread courant"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def snapshot(self, team):
+        """État déjà importé d'une équipe, au format attendu par le convertisseur (delta)"""
+        conn = self._connection()
+        conn.execute('BEGIN DEFERRED')
+        try:
+            team_known = conn.execute('SELECT 1 FROM teams WHERE team = ?', (team,)).fetchone() is not None
+            rooms = {
+                row['room_key']: {'channel': row['channel'], 'last_ts': row['last_ts'],
+                                  'last_ids': json.loads(row['last_ids']) if row['last_ids'] else None}
+                for row in conn.execute('SELECT room_key, channel, last_ts, last_ids FROM rooms WHERE team = ?',
+                                        (team,))
+            }
+            usernames = {
+                row['sender']: row['username']
+                for row in conn.execute('SELECT sender, username FROM users WHERE team = ?', (team,))
+            }
+            members = [
+                [row['channel'], row['username']]
+                for row in conn.execute('SELECT channel, username FROM members WHERE team = ?', (team,))
+            ]
+        finally:
+            conn.execute('COMMIT')
+        return {'team_known': team_known, 'rooms': rooms, 'usernames': usernames, 'members': members}
+
+    def record(self, team, index):
+        """Enregistrer un import réussi (index produit par le convertisseur dans ses stats)"""
+        now = datetime.now().isoformat()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('INSERT OR REPLACE INTO teams (team, imported_at) VALUES (?, ?)', (team, now))
+            # Le watermark d'un salon ne recule jamais; à horodatage égal, les messages importés s'ajoutent
+            for key, room in index.get('rooms', {}).items():
+                last_ts, last_ids = room['last_ts'], room.get('last_ids')
+                known = conn.execute('SELECT last_ts, last_ids FROM rooms WHERE team = ? AND room_key = ?',
+                                     (team, key)).fetchone()
+                if known is not None and known['last_ts'] > last_ts:
+                    last_ts, last_ids = known['last_ts'], json.loads(known['last_ids'] or 'null')
+                elif known is not None and known['last_ts'] == last_ts and known['last_ids'] and last_ids is not None:
+                    last_ids = sorted(set(json.loads(known['last_ids'])) | set(last_ids))
+                conn.execute(
+                    'INSERT OR REPLACE INTO rooms (team, room_key, room_name, channel, last_ts, last_ids, imported_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (team, key, room.get('room_name'), room['channel'], last_ts,
+                     json.dumps(last_ids) if last_ids is not None else None, now)
+                )
+            conn.executemany(
+                'INSERT OR REPLACE INTO users (team, sender, username) VALUES (?, ?, ?)',
+                [(team, sender, username) for sender, username in index.get('usernames', {}).items()]
+            )
+            conn.executemany(
+                'INSERT OR IGNORE INTO members (team, channel, username) VALUES (?, ?, ?)',
+                [(team, channel, username) for channel, username in index.get('members', [])]
+            )
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def rooms(self, team):
+        """Salons importés d'une équipe"""
+        return [
+            dict(row) for row in self._connection().execute(
+                'SELECT room_key, room_name, channel, last_ts, imported_at FROM rooms '
+                'WHERE team = ? ORDER BY room_name', (team,)
+            )
+        ]
+
+    def reset(self, team):
+        """Oublier les imports d'une équipe (le prochain import sera complet)"""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for table in ('teams', 'rooms', 'users', 'members'):
+                conn.execute(f'DELETE FROM {table} WHERE team = ?', (team,))
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+
+def main():
+    """Point d'entrée CLI: consulter ou réinitialiser l'index d'une équipe"""
+    parser = argparse.ArgumentParser(description='Index des imports Element → Mattermost')
+    parser.add_argument('command', choices=('show', 'reset'), help='Action')
+    parser.add_argument('path', help='Base SQLite de l\'index')
+    parser.add_argument('--team', required=True, help='Nom de l\'équipe Mattermost')
+    args = parser.parse_args()
+
+    try:
+        index = ImportIndex(args.path)
+        if args.command == 'reset':
+            index.reset(args.team)
+            print(f'Index de l\'équipe {args.team} réinitialisé')
+        else:
+            print(json.dumps(index.rooms(args.team), ensure_ascii=False, indent=2))
+    except sqlite3.Error as e:
+        print(f'Erreur: {e}', file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Import en pipeline des shards d'un job
+Pendant que le convertisseur écrit le shard k+1, un thread importe le shard k:
+la durée totale tend vers max(conversion, import) au lieu de leur somme.
+"""
+
+import queue
+import threading
+import traceback
+
+
+class ShardPipeline:
+    """Import séquentiel, dans l'ordre, des shards ajoutés au fil de la conversion"""
+
+    def __init__(self, import_shard, on_change=None):
+        self.import_shard = import_shard
+        self.on_change = on_change
+        self.error = None
+        self._shards = []
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='shard-importer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def add(self, shard):
+        """Ajouter un shard converti ({index, path, posts, bytes}) à la file d'import"""
+        shard = {**shard, 'status': 'converted'}
+        with self._lock:
+            self._shards.append(shard)
+        self._changed()
+        self._queue.put(shard)
+
+    def abort(self, error):
+        """Ne plus importer les shards suivants (erreur de conversion)"""
+        if self.error is None:
+            self.error = error
+
+    def close(self):
+        """Attendre l'import des shards; lève la première erreur (conversion ou import)"""
+        self._queue.put(None)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def shards(self):
+        """État des shards (copie)"""
+        with self._lock:
+            return [dict(shard) for shard in self._shards]
+
+    def _set(self, shard, **fields):
+        """Modifier l'état d'un shard et prévenir l'abonné"""
+        with self._lock:
+            shard.update(fields)
+        self._changed()
+
+    def _changed(self):
+        """Appeler on_change avec l'état courant des shards"""
+        if self.on_change:
+            try:
+                self.on_change(self.shards())
+            except Exception:
+                traceback.print_exc()
+
+    def _run(self):
+        """Boucle d'import: un shard après l'autre, arrêt au premier échec"""
+        while True:
+            shard = self._queue.get()
+            if shard is None:
+                break
+            if self.error is not None:
+                self._set(shard, status='skipped')
+                continue
+
+            self._set(shard, status='importing')
+            try:
+                result = self.import_shard(shard) or {}
+            except Exception as e:
+                self.error = e
+                self._set(shard, status='error', error=str(e))
+            else:
+                self._set(shard, status='imported', **result)
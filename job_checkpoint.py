@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Points de reprise des jobs d'import (checkpoint.json, à côté des artefacts du job)
+Chaque étape terminée est enregistrée de façon durable: uploaded (export reçu),
+converted (statistiques de la conversion), archived (archives ZIP à importer),
+submitted (job mmctl créé, par shard) et imported (shard importé). Un job en
+échec ou interrompu reprend à la première étape incomplète.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+CHECKPOINT_FILE = 'checkpoint.json'
+
+
+class JobCheckpoint:
+    """Points de reprise d'un job, réécrits de façon atomique à chaque étape"""
+
+    def __init__(self, job_dir):
+        self.job_dir = Path(job_dir)
+        self.path = self.job_dir / CHECKPOINT_FILE
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self._state = json.load(f)
+        except (OSError, ValueError):
+            self._state = {}
+
+    def get(self, stage):
+        """Données enregistrées pour une étape, None si elle n'est pas terminée"""
+        with self._lock:
+            return self._state.get(stage)
+
+    def mark(self, stage, **data):
+        """Enregistrer une étape terminée (uploaded, converted, archived)"""
+        with self._lock:
+            self._state[stage] = {**data, 'at': time.time()}
+            self._save()
+
+    def clear(self, *stages):
+        """Oublier des étapes (artefacts supprimés, étape à refaire)"""
+        with self._lock:
+            for stage in stages:
+                self._state.pop(stage, None)
+            self._save()
+
+    def archive(self, shards):
+        """Enregistrer les archives à importer ({index, path, posts, bytes}), chemins relatifs au job"""
+        self.mark('archived', shards=[
+            {'index': shard['index'], 'name': Path(shard['path']).name, 'posts': shard['posts'],
+             'bytes': shard['bytes']}
+            for shard in shards
+        ])
+
+    def archives(self):
+        """Archives enregistrées et encore présentes sur disque, None si l'archivage est à refaire"""
+        archived = self.get('archived')
+        if not archived:
+            return None
+        shards = [{**{k: v for k, v in shard.items() if k != 'name'}, 'path': str(self.job_dir / shard['name'])}
+                  for shard in archived['shards']]
+        if not all(Path(shard['path']).is_file() for shard in shards):
+            return None
+        return shards
+
+    def submitted(self, index):
+        """ID du job mmctl créé pour un shard, None s'il reste à soumettre"""
+        with self._lock:
+            return self._state.get('submitted', {}).get(str(index))
+
+    def submit(self, index, mmctl_job_id):
+        """Enregistrer (ou oublier, si mmctl_job_id est None) le job mmctl d'un shard"""
+        with self._lock:
+            submitted = self._state.setdefault('submitted', {})
+            if mmctl_job_id is None:
+                submitted.pop(str(index), None)
+            else:
+                submitted[str(index)] = mmctl_job_id
+            self._save()
+
+    def imported(self, index):
+        """Le shard a-t-il déjà été importé ?"""
+        with self._lock:
+            return str(index) in self._state.get('imported', {})
+
+    def done(self, index):
+        """Enregistrer l'import réussi d'un shard"""
+        with self._lock:
+            self._state.setdefault('imported', {})[str(index)] = time.time()
+            self._save()
+
+    def resume_stage(self):
+        """Première étape incomplète (None si tous les shards sont importés)"""
+        if not self.get('uploaded'):
+            return 'uploaded'
+        if not self.get('converted'):
+            return 'converted'
+        shards = self.archives()
+        if shards is None:
+            # Mode script: le JSONL converti est archivé à la reprise, sinon la conversion est refaite
+            output = self.get('converted').get('output')
+            return 'archived' if output and (self.job_dir / output).is_file() else 'converted'
+        pending = [shard['index'] for shard in shards if not self.imported(shard['index'])]
+        if not pending:
+            return None
+        return 'imported' if all(self.submitted(index) for index in pending) else 'submitted'
+
+    def _save(self):
+        """Écriture atomique (fichier temporaire puis renommage), synchronisée sur disque"""
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Profilage des conversions (optionnel, par job)
+La conversion est exécutée sous cProfile et tracemalloc; les statistiques
+(fichiers .prof lisibles par pstats, snakeviz...), les allocations maximales et
+la durée de chaque étape du job sont regroupées dans une archive téléchargeable.
+
+Usage:
+    python3 job_profiler.py convert.prof            # fonctions les plus coûteuses
+    python3 job_profiler.py convert.prof --sort tottime --limit 50
+"""
+
+import argparse
+import cProfile
+import io
+import json
+import pstats
+import sys
+import tracemalloc
+import zipfile
+from pathlib import Path
+
+# Allocations conservées dans le rapport mémoire
+TOP_ALLOCATIONS = 25
+
+# Fonctions listées dans le résumé texte d'un profil
+SUMMARY_LIMIT = 40
+
+
+def profile_call(fn, path, memory=True):
+    """Exécuter fn() sous cProfile, écrit <path>.prof et, si memory, <path>.memory.json.
+
+    cProfile ne suit que le thread courant; tracemalloc suit tout le processus et
+    n'est donc utilisé que dans les workers de conversion (un job à la fois).
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    profiler = cProfile.Profile()
+    if memory:
+        tracemalloc.start()
+    profiler.enable()
+    try:
+        return fn()
+    finally:
+        profiler.disable()
+        profiler.dump_stats(str(path.with_suffix('.prof')))
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            write_memory_report(path.with_suffix('.memory.json'), snapshot, current, peak)
+
+def write_memory_report(path, snapshot, current, peak):
+    """Allocations encore présentes en fin de conversion et pic mémoire (tracemalloc)"""
+    statistics = snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'peak_bytes': peak,
+            'current_bytes': current,
+            'top_allocations': [
+                {'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+                 'bytes': stat.size, 'count': stat.count}
+                for stat in statistics
+            ]
+        }, f, indent=2)
+
+def summarize(prof_path, sort='cumulative', limit=SUMMARY_LIMIT):
+    """Résumé texte d'un profil (fonctions triées par sort)"""
+    output = io.StringIO()
+    stats = pstats.Stats(str(prof_path), stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+def build_bundle(profile_dir, output):
+    """Archive ZIP des artefacts de profilage d'un job, avec un résumé texte par profil"""
+    profile_dir = Path(profile_dir)
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for path in sorted(profile_dir.iterdir()):
+            if not path.is_file():
+                continue
+            archive.write(path, path.name)
+            if path.suffix == '.prof':
+                archive.writestr(f'{path.stem}.txt', summarize(path))
+    return output
+
+def main():
+    """Point d'entrée CLI: afficher le résumé d'un profil"""
+    parser = argparse.ArgumentParser(description='Résumé d\'un profil de conversion')
+    parser.add_argument('path', help='Fichier .prof')
+    parser.add_argument('--sort', default='cumulative', help='Tri pstats (cumulative, tottime, calls...)')
+    parser.add_argument('--limit', type=int, default=SUMMARY_LIMIT, help='Nombre de fonctions')
+    args = parser.parse_args()
+
+    try:
+        print(summarize(args.path, args.sort, args.limit))
+    except (OSError, TypeError, KeyError) as e:
+        print(f'Erreur: {e}', file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Ordonnanceur des jobs d'import
+File d'attente à priorité (FIFO à priorité égale), nombre de workers borné et
+limites de concurrence séparées par étape (conversion CPU, import mmctl en base).
+Un job peut être retiré de la file ou annulé en cours d'exécution (CancelToken).
+Avec des créneaux partagés (SharedSlots), les limites par étape valent pour tous
+les processus qui partagent le stockage des jobs (workers gunicorn d'un hôte).
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+
+# Durée supposée d'un job tant qu'aucun n'a été mesuré (secondes)
+DEFAULT_JOB_DURATION = 120
+
+# Intervalle de vérification de l'annulation pendant les attentes bloquantes (secondes)
+CANCEL_POLL_INTERVAL = 0.5
+
+PRIORITIES = {
+    'high': 0,
+    'normal': 1,
+    'low': 2
+}
+
+
+class QueueFull(Exception):
+    """La file d'attente a atteint sa taille maximale"""
+
+
+class JobCanceled(Exception):
+    """Le job a été annulé"""
+
+
+class CancelToken:
+    """Demande d'annulation d'un job, vérifiée par chaque étape bloquante.
+
+    check(), s'il est fourni, est appelé au plus toutes les check_interval secondes:
+    annulation demandée par un autre processus (ex. statut enregistré dans la base des jobs).
+    """
+
+    def __init__(self, check=None, check_interval=1.0):
+        self._event = threading.Event()
+        self._check = check
+        self._check_interval = check_interval
+        self._checked = 0
+
+    def cancel(self):
+        """Demander l'annulation"""
+        self._event.set()
+
+    def is_set(self):
+        """L'annulation a-t-elle été demandée ?"""
+        if not self._event.is_set() and self._check and time.time() - self._checked >= self._check_interval:
+            self._checked = time.time()
+            if self._check():
+                self._event.set()
+        return self._event.is_set()
+
+    def raise_if_set(self):
+        """Lever JobCanceled si l'annulation a été demandée"""
+        if self.is_set():
+            raise JobCanceled('Job annulé')
+
+
+class SharedSlots:
+    """Créneaux d'étape loués dans le stockage des jobs, communs à plusieurs processus.
+
+    owner identifie le processus; alive(owner) permet de reprendre les créneaux
+    d'un processus arrêté sans les avoir rendus.
+    """
+
+    def __init__(self, store, owner, alive=None):
+        self.store = store
+        self.owner = owner
+        self.alive = alive
+
+    def acquire(self, stage, limit):
+        """Louer un créneau libre, retourne son numéro (None si tous loués)"""
+        return self.store.acquire_slot(stage, limit, self.owner, self.alive)
+
+    def release(self, stage, slot):
+        """Rendre un créneau loué"""
+        self.store.release_slot(stage, slot, self.owner)
+
+
+class JobScheduler:
+    """File d'attente des jobs, exécutés par un nombre fixe de threads workers"""
+
+    def __init__(self, workers=2, stage_limits=None, max_queue=50, shared_slots=None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.shared_slots = shared_slots
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = {}
+        self._durations = deque(maxlen=20)
+        self._stage_limits = dict(stage_limits or {})
+        self._stages = {}
+        self._stage_active = {}
+        self._stage_waiting = {}
+        for name, limit in self._stage_limits.items():
+            self._stages[name] = threading.BoundedSemaphore(limit)
+            self._stage_active[name] = 0
+            self._stage_waiting[name] = 0
+
+        for index in range(workers):
+            thread = threading.Thread(target=self._worker, name=f'job-worker-{index}')
+            thread.daemon = True
+            thread.start()
+
+    def submit(self, job_id, fn, priority=PRIORITIES['normal']):
+        """Mettre un job en file d'attente, retourne sa position (1 = prochain)"""
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                raise QueueFull(f'File d\'attente pleine ({self.max_queue} jobs)')
+            heapq.heappush(self._queue, (priority, next(self._seq), job_id, fn))
+            self._cond.notify()
+            return self._position(job_id)
+
+    def cancel(self, job_id):
+        """Retirer un job de la file d'attente, True s'il y était"""
+        with self._cond:
+            for index, entry in enumerate(self._queue):
+                if entry[2] == job_id:
+                    self._queue.pop(index)
+                    heapq.heapify(self._queue)
+                    return True
+        return False
+
+    def _position(self, job_id):
+        """Position dans la file (1 = prochain), None si le job n'y est pas"""
+        for index, entry in enumerate(sorted(self._queue)):
+            if entry[2] == job_id:
+                return index + 1
+        return None
+
+    def position(self, job_id):
+        """Position d'un job dans la file d'attente"""
+        with self._cond:
+            return self._position(job_id)
+
+    def estimated_wait(self, job_id):
+        """Délai estimé (secondes) avant le démarrage d'un job en attente"""
+        with self._cond:
+            position = self._position(job_id)
+            if position is None:
+                return None
+            average = (sum(self._durations) / len(self._durations)
+                       if self._durations else DEFAULT_JOB_DURATION)
+            now = time.time()
+
+            # Simulation: chaque worker libéré prend le job suivant de la file
+            free_at = [max(0, average - (now - started)) for started in self._running.values()]
+            free_at += [0] * (self.workers - len(free_at))
+            heapq.heapify(free_at)
+            for _ in range(position - 1):
+                heapq.heappush(free_at, heapq.heappop(free_at) + average)
+            return free_at[0]
+
+    @contextmanager
+    def stage(self, name, on_wait=None, cancel=None):
+        """Occuper un créneau de l'étape name (bloquant tant que la limite est atteinte).
+
+        Le créneau local (threads de ce processus) est pris d'abord, puis le créneau
+        partagé (shared_slots) s'il y en a. Si cancel (CancelToken) est annulé
+        pendant l'attente, lève JobCanceled.
+        """
+        semaphore = self._stages.get(name)
+        if semaphore is None:
+            yield
+            return
+
+        waiting = False
+        slot = None
+        try:
+            if not semaphore.acquire(blocking=False):
+                waiting = self._start_waiting(name, on_wait)
+                while not semaphore.acquire(timeout=CANCEL_POLL_INTERVAL if cancel else None):
+                    cancel.raise_if_set()
+            if self.shared_slots:
+                try:
+                    slot = self.shared_slots.acquire(name, self._stage_limits[name])
+                    while slot is None:
+                        if not waiting:
+                            waiting = self._start_waiting(name, on_wait)
+                        if cancel:
+                            cancel.raise_if_set()
+                        time.sleep(CANCEL_POLL_INTERVAL)
+                        slot = self.shared_slots.acquire(name, self._stage_limits[name])
+                except BaseException:
+                    semaphore.release()
+                    raise
+        finally:
+            if waiting:
+                with self._cond:
+                    self._stage_waiting[name] -= 1
+        with self._cond:
+            self._stage_active[name] += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._stage_active[name] -= 1
+            if slot is not None:
+                try:
+                    self.shared_slots.release(name, slot)
+                except Exception:
+                    traceback.print_exc()
+            semaphore.release()
+
+    def _start_waiting(self, name, on_wait):
+        """Compter un job en attente d'un créneau de l'étape name"""
+        if on_wait:
+            on_wait()
+        with self._cond:
+            self._stage_waiting[name] += 1
+        return True
+
+    def stats(self):
+        """Occupation de l'ordonnanceur (file, jobs actifs, créneaux par étape)"""
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'queued': len(self._queue),
+                'running': len(self._running),
+                'max_queue': self.max_queue,
+                'stages': {
+                    name: {'active': self._stage_active[name], 'waiting': self._stage_waiting[name],
+                           'limit': limit}
+                    for name, limit in self._stage_limits.items()
+                }
+            }
+
+    def _worker(self):
+        """Boucle d'un worker: exécuter les jobs dans l'ordre de la file"""
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                _, _, job_id, fn = heapq.heappop(self._queue)
+                self._running[job_id] = time.time()
+
+            try:
+                fn()
+            except Exception:
+                traceback.print_exc()
+            finally:
+                with self._cond:
+                    started = self._running.pop(job_id)
+                    self._durations.append(time.time() - started)
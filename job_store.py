@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Stockage des jobs d'import
+- MemoryJobStore: dictionnaire en mémoire (un seul processus, tests)
+- SQLiteJobStore: base SQLite en mode WAL, partagée entre les workers gunicorn
+  d'un même hôte et conservée après un redémarrage
+Les deux stockages louent aussi les créneaux des étapes limitées (conversion,
+import mmctl): avec SQLite, la limite vaut pour tous les workers de l'hôte.
+Ils cumulent enfin les compteurs des métriques (metrics.py) de tous les workers.
+"""
+
+import json
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+
+# Champs stockés en colonnes; les autres champs du job sont stockés en JSON
+INDEXED_FIELDS = ('team', 'status', 'progress', 'created_at', 'log_lines')
+
+# Lignes de log conservées par job (les plus anciennes sont supprimées)
+DEFAULT_MAX_LOGS = 500
+
+
+class MemoryJobStore:
+    """Jobs dans un dictionnaire du processus courant"""
+
+    def __init__(self, max_logs=DEFAULT_MAX_LOGS):
+        self.max_logs = max_logs
+        self._jobs = {}
+        self._slots = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id, job):
+        """Enregistrer un nouveau job"""
+        with self._lock:
+            self._jobs[job_id] = {**job, 'log_lines': 0, 'logs': deque(maxlen=self.max_logs)}
+
+    def get(self, job_id, since=0):
+        """Copie d'un job avec ses logs postérieurs à la ligne since, None s'il n'existe pas"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {**job, 'logs': [dict(log) for log in job['logs'] if log['line'] > since]}
+
+    def status(self, job_id):
+        """Statut d'un job (sans le copier), None s'il n'existe pas"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.get('status') if job else None
+
+    def update(self, job_id, **fields):
+        """Modifier des champs d'un job, retourne son statut précédent (None s'il n'existe pas)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            previous = job.get('status')
+            job.update(fields)
+            return previous
+
+    def add_log(self, job_id, level, message):
+        """Ajouter une ligne de log à un job"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job['log_lines'] += 1
+                job['logs'].append({
+                    'line': job['log_lines'],
+                    'level': level,
+                    'message': message,
+                    'timestamp': datetime.now().isoformat()
+                })
+
+    def delete(self, job_id):
+        """Supprimer un job"""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def list(self, team=None, status=None, limit=100):
+        """Jobs (sans logs) filtrés par équipe et/ou statut, plus récents d'abord"""
+        with self._lock:
+            jobs = [
+                {**{k: v for k, v in job.items() if k != 'logs'}, 'id': job_id}
+                for job_id, job in self._jobs.items()
+                if (team is None or job.get('team') == team)
+                and (status is None or job.get('status') == status)
+            ]
+        jobs.sort(key=lambda job: job.get('created_at', ''), reverse=True)
+        return jobs[:limit]
+
+    def acquire_slot(self, stage, limit, owner, alive=None):
+        """Louer un créneau libre de l'étape stage pour owner, retourne son numéro (None si tous loués).
+
+        Les créneaux dont alive(owner) est faux (processus arrêté) sont libérés au passage.
+        """
+        with self._lock:
+            leases = self._slots.setdefault(stage, {})
+            for slot, slot_owner in list(leases.items()):
+                if alive is not None and not alive(slot_owner):
+                    del leases[slot]
+            for slot in range(limit):
+                if slot not in leases:
+                    leases[slot] = owner
+                    return slot
+        return None
+
+    def release_slot(self, stage, slot, owner):
+        """Rendre un créneau loué par owner"""
+        with self._lock:
+            leases = self._slots.get(stage, {})
+            if leases.get(slot) == owner:
+                del leases[slot]
+
+    def slot_counts(self):
+        """Créneaux loués par étape"""
+        with self._lock:
+            return {stage: len(leases) for stage, leases in self._slots.items()}
+
+    def status_counts(self):
+        """Nombre de jobs par statut"""
+        counts = {}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job.get('status')] = counts.get(job.get('status'), 0) + 1
+        return counts
+
+    def add_metrics(self, updates):
+        """Ajouter des incréments ((nom, étiquettes JSON, montant), ...) aux compteurs des métriques"""
+        with self._lock:
+            for name, labels, amount in updates:
+                self._metrics[(name, labels)] = self._metrics.get((name, labels), 0) + amount
+
+    def metric_values(self, names):
+        """Valeurs cumulées des métriques names: {(nom, étiquettes JSON): valeur}"""
+        with self._lock:
+            return {key: value for key, value in self._metrics.items() if key[0] in names}
+
+
+class SQLiteJobStore:
+    """Jobs dans une base SQLite (mode WAL), une connexion par thread"""
+
+    def __init__(self, path, max_logs=DEFAULT_MAX_LOGS):
+        self.path = str(path)
+        self.max_logs = max_logs
+        self._local = threading.local()
+        self._connection().executescript('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    team TEXT,
+                    status TEXT,
+                    progress INTEGER DEFAULT 0,
+                    created_at TEXT,
+                    updated_at TEXT,
+                    log_lines INTEGER DEFAULT 0,
+                    data TEXT NOT NULL DEFAULT '{}'
+                );
+                CREATE INDEX IF NOT EXISTS jobs_team ON jobs (team, created_at);
+                CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+                CREATE TABLE IF NOT EXISTS job_logs (
+                    job_id TEXT NOT NULL,
+                    line INTEGER NOT NULL,
+                    level TEXT,
+                    message TEXT,
+                    timestamp TEXT,
+                    PRIMARY KEY (job_id, line)
+                );
+                CREATE TABLE IF NOT EXISTS stage_slots (
+                    stage TEXT NOT NULL,
+                    slot INTEGER NOT NULL,
+                    owner TEXT NOT NULL,
+                    acquired_at TEXT,
+                    PRIMARY KEY (stage, slot)
+                );
+                CREATE TABLE IF NOT EXISTS metrics (
+                    name TEXT NOT NULL,
+                    labels TEXT NOT NULL,
+                    value REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (name, labels)
+                );
+        ''')
+
+    def _connection(self):
+        """Connexion SQLite du thread courant"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _connect(self, write=True):
+        """Transaction sur la connexion du thread courant"""
+        return _Transaction(self._connection(), 'IMMEDIATE' if write else 'DEFERRED')
+
+    @staticmethod
+    def _row_to_job(row):
+        """Reconstituer un job à partir d'une ligne de la table jobs"""
+        job = json.loads(row['data'])
+        for field in INDEXED_FIELDS:
+            job[field] = row[field]
+        return job
+
+    def create(self, job_id, job):
+        """Enregistrer un nouveau job"""
+        data = {k: v for k, v in job.items() if k not in INDEXED_FIELDS and k != 'logs'}
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, team, status, progress, created_at, updated_at, data) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, job.get('team'), job.get('status'), job.get('progress', 0),
+                 job.get('created_at', now), now, json.dumps(data))
+            )
+
+    def get(self, job_id, since=0):
+        """Job avec ses logs postérieurs à la ligne since, None s'il n'existe pas"""
+        with self._connect(write=False) as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = self._row_to_job(row)
+            job['logs'] = [
+                dict(log) for log in conn.execute(
+                    'SELECT line, level, message, timestamp FROM job_logs '
+                    'WHERE job_id = ? AND line > ? ORDER BY line',
+                    (job_id, since)
+                )
+            ]
+        return job
+
+    def status(self, job_id):
+        """Statut d'un job (sans ses logs), None s'il n'existe pas"""
+        row = self._connection().execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return row['status'] if row else None
+
+    def update(self, job_id, **fields):
+        """Modifier des champs d'un job (transaction atomique), retourne son statut précédent (None s'il n'existe pas)"""
+        columns = {k: v for k, v in fields.items() if k in INDEXED_FIELDS}
+        extra = {k: v for k, v in fields.items() if k not in INDEXED_FIELDS}
+        with self._connect() as conn:
+            row = conn.execute('SELECT status, data FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return None
+            if extra:
+                columns['data'] = json.dumps({**json.loads(row['data']), **extra})
+            columns['updated_at'] = datetime.now().isoformat()
+            assignments = ', '.join(f'{column} = ?' for column in columns)
+            conn.execute(
+                f'UPDATE jobs SET {assignments} WHERE id = ?',
+                (*columns.values(), job_id)
+            )
+            return row['status']
+
+    def add_log(self, job_id, level, message):
+        """Ajouter une ligne de log à un job (seules les max_logs dernières sont gardées)"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT log_lines FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return
+            line = row['log_lines'] + 1
+            conn.execute('UPDATE jobs SET log_lines = ? WHERE id = ?', (line, job_id))
+            conn.execute(
+                'INSERT INTO job_logs (job_id, line, level, message, timestamp) VALUES (?, ?, ?, ?, ?)',
+                (job_id, line, level, message, datetime.now().isoformat())
+            )
+            if self.max_logs and line > self.max_logs:
+                conn.execute(
+                    'DELETE FROM job_logs WHERE job_id = ? AND line <= ?',
+                    (job_id, line - self.max_logs)
+                )
+
+    def delete(self, job_id):
+        """Supprimer un job et ses logs"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM job_logs WHERE job_id = ?', (job_id,))
+            conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+
+    def list(self, team=None, status=None, limit=100):
+        """Jobs (sans logs) filtrés par équipe et/ou statut, plus récents d'abord"""
+        clauses = []
+        params = []
+        if team is not None:
+            clauses.append('team = ?')
+            params.append(team)
+        if status is not None:
+            clauses.append('status = ?')
+            params.append(status)
+        where = f'WHERE {" AND ".join(clauses)}' if clauses else ''
+        with self._connect(write=False) as conn:
+            rows = conn.execute(
+                f'SELECT * FROM jobs {where} ORDER BY created_at DESC LIMIT ?',
+                (*params, limit)
+            ).fetchall()
+        return [{**self._row_to_job(row), 'id': row['id']} for row in rows]
+
+    def acquire_slot(self, stage, limit, owner, alive=None):
+        """Louer un créneau libre de l'étape stage pour owner, retourne son numéro (None si tous loués).
+
+        Une ligne par créneau loué, partagée par tous les processus de l'hôte; les créneaux
+        dont alive(owner) est faux (processus arrêté) sont libérés au passage.
+        """
+        with self._connect() as conn:
+            leases = {row['slot']: row['owner'] for row in conn.execute(
+                'SELECT slot, owner FROM stage_slots WHERE stage = ?', (stage,))}
+            for slot, slot_owner in list(leases.items()):
+                if alive is not None and not alive(slot_owner):
+                    conn.execute('DELETE FROM stage_slots WHERE stage = ? AND slot = ?', (stage, slot))
+                    del leases[slot]
+            for slot in range(limit):
+                if slot not in leases:
+                    conn.execute(
+                        'INSERT INTO stage_slots (stage, slot, owner, acquired_at) VALUES (?, ?, ?, ?)',
+                        (stage, slot, owner, datetime.now().isoformat())
+                    )
+                    return slot
+        return None
+
+    def release_slot(self, stage, slot, owner):
+        """Rendre un créneau loué par owner"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM stage_slots WHERE stage = ? AND slot = ? AND owner = ?',
+                         (stage, slot, owner))
+
+    def slot_counts(self):
+        """Créneaux loués par étape (tous les processus de l'hôte)"""
+        return {row['stage']: row['slots'] for row in self._connection().execute(
+            'SELECT stage, COUNT(*) AS slots FROM stage_slots GROUP BY stage')}
+
+    def status_counts(self):
+        """Nombre de jobs par statut"""
+        return {row['status']: row['jobs'] for row in self._connection().execute(
+            'SELECT status, COUNT(*) AS jobs FROM jobs GROUP BY status')}
+
+    def add_metrics(self, updates):
+        """Ajouter des incréments ((nom, étiquettes JSON, montant), ...) aux compteurs des métriques"""
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT INTO metrics (name, labels, value) VALUES (?, ?, ?) '
+                'ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value',
+                updates
+            )
+
+    def metric_values(self, names):
+        """Valeurs cumulées des métriques names, tous workers confondus: {(nom, étiquettes JSON): valeur}"""
+        names = list(names)
+        return {(row['name'], row['labels']): row['value'] for row in self._connection().execute(
+            f'SELECT name, labels, value FROM metrics WHERE name IN ({", ".join("?" * len(names))})', names)}
+
+
+class _Transaction:
+    """Transaction SQLite (IMMEDIATE pour les écritures: elles sont sérialisées)"""
+
+    def __init__(self, conn, mode):
+        self.conn = conn
+        self.mode = mode
+
+    def __enter__(self):
+        self.conn.execute(f'BEGIN {self.mode}')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+def open_job_store(url, max_logs=DEFAULT_MAX_LOGS):
+    """Ouvrir le stockage décrit par url: 'memory' ou chemin d'une base SQLite"""
+    if url == 'memory':
+        return MemoryJobStore(max_logs)
+    return SQLiteJobStore(url, max_logs)
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Test de charge de l'interface web: uploads simultanés et onglets qui suivent les jobs
+Chaque uploader envoie un export synthétique distinct (generate_export.py, équipe
+distincte: ni cache ni import incrémental), puis des pollers interrogent
+/api/job/<id> comme la page web jusqu'à la fin de tous les jobs.
+
+Avec --start-server, l'interface est lancée localement avec mmctl et le
+convertisseur simulés (mmctl_stub.py, converter_stub.py) et des latences
+configurables; le CPU et la mémoire du serveur (workers compris) sont relevés
+dans /proc.
+
+Usage:
+    python3 load_test.py --start-server --uploaders 20 --pollers 100
+    python3 load_test.py --start-server --convert-seconds 5 --import-seconds 10 --output load.json
+    python3 load_test.py --url http://127.0.0.1:5000 --server-pid 1234 --uploaders 5
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from pathlib import Path
+
+import mmctl_stub
+from generate_export import generate_exports
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# États finaux d'un job
+FINAL_STATES = ('completed', 'error', 'canceled')
+
+# Intervalle des relevés CPU / mémoire du serveur
+SAMPLE_INTERVAL = 0.5
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+def percentile(values, fraction):
+    """Percentile (rang le plus proche) d'une liste de valeurs"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))]
+
+def latency_summary(samples):
+    """Latences (ms) et erreurs d'une route: [(secondes, code HTTP ou None)]"""
+    durations = [seconds for seconds, _ in samples]
+    statuses = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(1 for _, status in samples if status is None or status >= 400)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0,
+        'statuses': statuses,
+        'p50_ms': round(percentile(durations, 0.50) * 1000, 1) if samples else None,
+        'p95_ms': round(percentile(durations, 0.95) * 1000, 1) if samples else None,
+        'p99_ms': round(percentile(durations, 0.99) * 1000, 1) if samples else None,
+        'max_ms': round(max(durations) * 1000, 1) if samples else None
+    }
+
+def multipart_body(fields, files):
+    """Corps multipart/form-data: champs texte et fichiers [(nom, chemin)]"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, path in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{Path(path).name}"\r\n'
+            'Content-Type: application/json\r\n\r\n'.encode()
+        )
+        parts.append(Path(path).read_bytes())
+        parts.append(b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+def request(url, data=None, content_type=None, timeout=60):
+    """Requête HTTP: (secondes, code HTTP ou None si la connexion a échoué, JSON décodé)"""
+    req = urllib.request.Request(url, data=data)
+    if content_type:
+        req.add_header('Content-Type', content_type)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            body = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        body = e.read()
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        return time.perf_counter() - start, None, None
+    seconds = time.perf_counter() - start
+    try:
+        return seconds, status, json.loads(body)
+    except ValueError:
+        return seconds, status, None
+
+
+class ProcessSampler:
+    """Relevés CPU / mémoire d'un processus et de ses descendants (/proc)"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='process-sampler')
+        self._thread.daemon = True
+
+    def start(self):
+        """Démarrer les relevés"""
+        self._thread.start()
+
+    def stop(self):
+        """Arrêter les relevés, retourne leur résumé"""
+        self._stop.set()
+        self._thread.join()
+        if len(self.samples) < 2:
+            return None
+        cpu = [
+            100 * (b['cpu'] - a['cpu']) / (b['time'] - a['time'])
+            for a, b in zip(self.samples, self.samples[1:]) if b['time'] > a['time']
+        ]
+        first, last = self.samples[0], self.samples[-1]
+        return {
+            'cpu_percent_avg': round(100 * (last['cpu'] - first['cpu']) / (last['time'] - first['time']), 1),
+            'cpu_percent_max': round(max(cpu), 1) if cpu else None,
+            'rss_mb_max': round(max(sample['rss'] for sample in self.samples) / 1048576, 1),
+            'processes_max': max(sample['processes'] for sample in self.samples)
+        }
+
+    def tree(self):
+        """PIDs du processus et de ses descendants"""
+        children = {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+            except OSError:
+                continue
+            children.setdefault(int(fields[1]), []).append(int(entry))
+        pids = [self.pid]
+        for pid in pids:
+            pids.extend(children.get(pid, []))
+        return pids
+
+    def sample(self):
+        """CPU cumulé (secondes) et mémoire résidente (octets) de l'arbre de processus"""
+        cpu = 0
+        rss = 0
+        pids = self.tree()
+        for pid in pids:
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+                with open(f'/proc/{pid}/statm') as f:
+                    rss += int(f.read().split()[1]) * PAGE_SIZE
+            except OSError:
+                continue
+            # utime et stime (champs 14 et 15 de /proc/<pid>/stat)
+            cpu += (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+        return {'time': time.time(), 'cpu': cpu, 'rss': rss, 'processes': len(pids)}
+
+    def _run(self):
+        """Boucle de relevés"""
+        while not self._stop.is_set():
+            self.samples.append(self.sample())
+            self._stop.wait(SAMPLE_INTERVAL)
+
+
+def start_server(work_dir, port, args):
+    """Lancer l'interface web avec mmctl et convertisseur simulés, retourne le processus"""
+    bin_dir = work_dir / 'bin'
+    mmctl_stub.install(bin_dir)
+    env = {
+        **os.environ,
+        'PATH': f'{bin_dir}{os.pathsep}{os.environ.get("PATH", "")}',
+        'WEB_PORT': str(port),
+        'UPLOAD_FOLDER': str(work_dir / 'uploads'),
+        'MMCTL_STUB_DIR': str(work_dir / 'mmctl'),
+        'MMCTL_STUB_SECONDS': str(args.import_seconds),
+        'MMCTL_STUB_LATENCY': str(args.mmctl_latency),
+        'MMCTL_STUB_FAIL': str(args.import_fail),
+        'CONVERSION_MODE': 'script',
+        'CONVERTER_SCRIPT': str(SCRIPT_DIR / 'converter_stub.py'),
+        'CONVERTER_STUB_SECONDS': str(args.convert_seconds),
+        'CONVERTER_STUB_SECONDS_PER_MB': str(args.convert_seconds_per_mb),
+        'ARTIFACT_CACHE_MAX_BYTES': '0'
+    }
+    log = open(work_dir / 'server.log', 'wb')
+    process = subprocess.Popen([sys.executable, str(SCRIPT_DIR / 'web_interface_flask.py')],
+                               stdout=log, stderr=subprocess.STDOUT, env=env)
+    log.close()
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Le serveur s\'est arrêté (voir {work_dir / "server.log"})')
+        if request(f'{url}/api/scheduler', timeout=2)[1] == 200:
+            return process, url
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('Le serveur ne répond pas après 30s')
+
+def run_load(url, exports, pollers, poll_interval, timeout):
+    """Uploads simultanés puis suivi des jobs par les pollers, retourne les mesures brutes"""
+    lock = threading.Lock()
+    samples = {'upload': [], 'job': []}
+    jobs = {}
+    done = threading.Event()
+    start = time.time()
+
+    def upload(index, path):
+        body, content_type = multipart_body(
+            {'team': f'load{index}', 'incremental': 'false'}, [('file', path)]
+        )
+        seconds, status, data = request(f'{url}/api/upload', body, content_type, timeout=timeout)
+        with lock:
+            samples['upload'].append((seconds, status))
+            if data and data.get('success'):
+                jobs[data['job_id']] = {'submitted': time.time(), 'status': 'queued'}
+
+    uploaders = [threading.Thread(target=upload, args=(index, path)) for index, path in enumerate(exports)]
+    for thread in uploaders:
+        thread.start()
+
+    def poll(index):
+        cursors = {}
+        while not done.is_set():
+            with lock:
+                pending = [job_id for job_id, job in jobs.items() if job['status'] not in FINAL_STATES]
+            if pending:
+                # Un onglet par poller, répartis sur les jobs en cours
+                job_id = pending[index % len(pending)]
+                seconds, status, data = request(f'{url}/api/job/{job_id}?since={cursors.get(job_id, 0)}',
+                                                timeout=timeout)
+                with lock:
+                    samples['job'].append((seconds, status))
+                    if data and 'status' in data:
+                        cursors[job_id] = data.get('cursor', 0)
+                        job = jobs[job_id]
+                        if data['status'] in FINAL_STATES and job['status'] not in FINAL_STATES:
+                            job['finished'] = time.time()
+                        job['status'] = data['status']
+            done.wait(poll_interval)
+
+    threads = [threading.Thread(target=poll, args=(index,)) for index in range(pollers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    for thread in uploaders:
+        thread.join()
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with lock:
+            if all(job['status'] in FINAL_STATES for job in jobs.values()):
+                break
+        time.sleep(0.2)
+    done.set()
+    for thread in threads:
+        thread.join()
+    return samples, jobs, time.time() - start
+
+def report(samples, jobs, elapsed, server):
+    """Résumé: latences par route, issue et durée des jobs, débit, ressources du serveur"""
+    outcomes = {}
+    for job in jobs.values():
+        outcomes[job['status']] = outcomes.get(job['status'], 0) + 1
+    durations = [job['finished'] - job['submitted'] for job in jobs.values() if 'finished' in job]
+    completed = outcomes.get('completed', 0)
+    return {
+        'elapsed_seconds': round(elapsed, 2),
+        'routes': {
+            '/api/upload': latency_summary(samples['upload']),
+            '/api/job': latency_summary(samples['job'])
+        },
+        'jobs': {
+            'submitted': len(jobs),
+            'outcomes': outcomes,
+            'p50_seconds': round(percentile(durations, 0.50), 2) if durations else None,
+            'p95_seconds': round(percentile(durations, 0.95), 2) if durations else None,
+            'completed_per_minute': round(60 * completed / elapsed, 2) if elapsed else None
+        },
+        'server': server
+    }
+
+def main():
+    """Point d'entrée CLI: résultats JSON sur stdout ou dans --output"""
+    parser = argparse.ArgumentParser(description='Test de charge de l\'interface web d\'import')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='Interface web déjà démarrée')
+    parser.add_argument('--server-pid', type=int, help='PID du serveur (relevés CPU / mémoire)')
+    parser.add_argument('--start-server', action='store_true',
+                        help='Démarrer l\'interface avec mmctl et convertisseur simulés')
+    parser.add_argument('--port', type=int, default=5055, help='Port du serveur démarré (--start-server)')
+    parser.add_argument('--uploaders', type=int, default=20, help='Uploads simultanés')
+    parser.add_argument('--pollers', type=int, default=100, help='Onglets qui suivent les jobs')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='Intervalle de suivi (s, comme la page)')
+    parser.add_argument('--messages', type=int, default=2000, help='Messages par export')
+    parser.add_argument('--convert-seconds', type=float, default=1, help='Durée d\'une conversion simulée')
+    parser.add_argument('--convert-seconds-per-mb', type=float, default=0, help='Durée supplémentaire par MB')
+    parser.add_argument('--import-seconds', type=float, default=2, help='Durée d\'un import mmctl simulé')
+    parser.add_argument('--mmctl-latency', type=float, default=0, help='Délai de réponse de chaque commande mmctl')
+    parser.add_argument('--import-fail', type=float, default=0, help='Part des imports mmctl en erreur')
+    parser.add_argument('--timeout', type=float, default=600, help='Attente maximale de la fin des jobs (s)')
+    parser.add_argument('--output', help='Fichier JSON des résultats')
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix='element-load-'))
+    server = None
+    try:
+        print(f'Génération de {args.uploaders} exports...', file=sys.stderr)
+        exports = [
+            generate_exports(work_dir / 'exports' / f'export-{index:03d}.json', messages=args.messages,
+                             seed=index)['paths'][0]
+            for index in range(args.uploaders)
+        ]
+
+        url = args.url.rstrip('/')
+        pid = args.server_pid
+        if args.start_server:
+            server, url = start_server(work_dir, args.port, args)
+            pid = server.pid
+        sampler = ProcessSampler(pid) if pid else None
+        if sampler:
+            sampler.start()
+
+        print(f'{args.uploaders} uploads, {args.pollers} pollers sur {url}...', file=sys.stderr)
+        samples, jobs, elapsed = run_load(url, exports, args.pollers, args.poll_interval, args.timeout)
+        results = report(samples, jobs, elapsed, sampler.stop() if sampler else None)
+        results['parameters'] = {k: v for k, v in vars(args).items() if k not in ('output', 'server_pid')}
+    except (RuntimeError, OSError) as e:
+        print(f'Erreur: {e}', file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
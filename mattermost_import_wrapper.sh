@@ -5,6 +5,7 @@
 #
 # Usage (en tant que mattermost):
 #   ./element-import.sh --team myteam export.json
+#   ./element-import.sh --team myteam --resume export.json   # reprise après échec
 #
 # Prérequis:
 #   - Script exécuté par l'utilisateur 'mattermost'
@@ -26,7 +27,20 @@ readonly NC='\033[0m'
 # Configuration
 readonly SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 readonly CONVERTER_SCRIPT="${SCRIPT_DIR}/element_to_mattermost.py"
-readonly WORK_DIR="/tmp/mattermost_import_$$"
+readonly ARCHIVE_SCRIPT="${SCRIPT_DIR}/import_archive.py"
+readonly WATCHER_SCRIPT="${SCRIPT_DIR}/mmctl_watcher.py"
+# Répertoire de travail persistant par (export, équipe): gardé en cas d'échec pour --resume
+readonly WORK_ROOT="${ELEMENT_IMPORT_WORK_ROOT:-/var/tmp/element_import}"
+WORK_DIR=""
+CHECKPOINT_FILE=""
+KEEP_WORK_DIR=true
+RESUME_HINT=""
+# Suivi de l'import: délai maximal selon le nombre de posts (débit supposé, marge, minimum)
+# et délai sans activité du job Mattermost avant de le déclarer bloqué (0: désactivé)
+readonly IMPORT_POSTS_PER_SECOND="${ELEMENT_IMPORT_POSTS_PER_SECOND:-25}"
+readonly IMPORT_TIMEOUT_MARGIN=4
+readonly MIN_IMPORT_TIMEOUT=600
+readonly STALL_TIMEOUT="${ELEMENT_IMPORT_STALL_TIMEOUT:-600}"
 readonly LOG_FILE="/var/log/mattermost/element_import.log"
 readonly MATTERMOST_USER="mattermost"
 
@@ -61,12 +75,32 @@ log_step() {
 }
 
 cleanup() {
-    if [ -d "$WORK_DIR" ]; then
-        log_info "Nettoyage du répertoire temporaire..."
+    if [ -z "$WORK_DIR" ] || [ ! -d "$WORK_DIR" ]; then
+        return
+    fi
+    if [ "$KEEP_WORK_DIR" = true ]; then
+        log_info "Répertoire de travail conservé: $WORK_DIR"
+        if [ -n "$RESUME_HINT" ]; then
+            log_info "Pour reprendre là où l'import s'est arrêté:"
+            log_info "  $RESUME_HINT"
+        fi
+    else
+        log_info "Nettoyage du répertoire de travail..."
         rm -rf "$WORK_DIR" 2>/dev/null || true
     fi
 }
 
+# Points de reprise: une ligne clé=valeur par étape terminée (input_sha256, converted,
+# archived, submitted, imported), réécrits de façon atomique
+checkpoint_get() {
+    grep -m1 "^$1=" "$CHECKPOINT_FILE" 2>/dev/null | cut -d= -f2- || true
+}
+
+checkpoint_set() {
+    { grep -v "^$1=" "$CHECKPOINT_FILE" 2>/dev/null || true; echo "$1=$2"; } > "${CHECKPOINT_FILE}.tmp"
+    mv "${CHECKPOINT_FILE}.tmp" "$CHECKPOINT_FILE"
+}
+
 trap cleanup EXIT INT TERM
 
 show_banner() {
@@ -122,12 +156,20 @@ check_requirements() {
         log_info "✓ Script Python trouvé"
     fi
     
-    # Zip
-    if ! command -v zip &> /dev/null; then
-        log_error "La commande 'zip' n'est pas installée"
+    # Création des archives (remplace la commande zip)
+    if [ ! -f "$ARCHIVE_SCRIPT" ]; then
+        log_error "Script d'archivage introuvable: $ARCHIVE_SCRIPT"
+        ((errors++))
+    else
+        log_info "✓ Script d'archivage trouvé"
+    fi
+    
+    # Suivi des jobs mmctl
+    if [ ! -f "$WATCHER_SCRIPT" ]; then
+        log_error "Script de suivi mmctl introuvable: $WATCHER_SCRIPT"
         ((errors++))
     else
-        log_info "✓ zip installé"
+        log_info "✓ Script de suivi mmctl trouvé"
     fi
     
     # Dossier logs
@@ -186,7 +228,11 @@ OPTIONS:
     -p, --password PASS     Mot de passe par défaut pour les utilisateurs
                             (défaut: ChangeMe123!)
     -o, --output FILE       Fichier JSONL de sortie (défaut: auto-généré)
+    -c, --compression MODE  Compression de l'archive: deflated (défaut) ou stored
+                            (stored: plus rapide à ingérer pour mmctl)
     -n, --no-import         Conversion uniquement, pas d'import
+    -r, --resume            Reprendre un import interrompu à la première étape
+                            incomplète (conversion, archive, import, suivi)
     -h, --help              Afficher cette aide
 
 EXEMPLES:
@@ -198,6 +244,12 @@ EXEMPLES:
     
     # Conversion seule (pour vérification)
     $0 --team myteam --no-import export_element.json
+    
+    # Archive non compressée (ingestion mmctl plus rapide)
+    $0 --team myteam --compression stored export_element.json
+    
+    # Reprise après un échec (même export, même équipe)
+    $0 --team myteam --resume export_element.json
 
 NOTES:
     - Le script DOIT être exécuté en tant qu'utilisateur '$MATTERMOST_USER'
@@ -205,6 +257,11 @@ NOTES:
     - Mode local mmctl requis (MMCTL_LOCAL=true)
     - L'équipe et les canaux seront créés automatiquement
     - Les utilisateurs seront créés avec le mot de passe par défaut
+    - Délai maximal de l'import: \${ELEMENT_IMPORT_POSTS_PER_SECOND:-25} posts/s supposés,
+      marge x${IMPORT_TIMEOUT_MARGIN}, ${MIN_IMPORT_TIMEOUT}s minimum; import arrêté après
+      \${ELEMENT_IMPORT_STALL_TIMEOUT:-600}s sans activité côté serveur
+    - Répertoire de travail: \${ELEMENT_IMPORT_WORK_ROOT:-/var/tmp/element_import},
+      conservé en cas d'échec ou avec --no-import, supprimé après un import réussi
 
 EOF
 }
@@ -220,20 +277,62 @@ process_import() {
     local password="$4"
     local output_file="$5"
     local no_import="$6"
+    local compression="$7"
+    local resume="$8"
+    local keep_jsonl=true
     
     # Vérifier que le fichier existe
     if [ ! -f "$input_file" ]; then
         log_error "Fichier d'entrée introuvable: $input_file"
         exit 1
     fi
+    input_file="$(cd "$(dirname "$input_file")" && pwd)/$(basename "$input_file")"
+    if [ -n "$data_dir" ]; then
+        if [ ! -d "$data_dir" ]; then
+            log_error "Dossier des médias introuvable: $data_dir"
+            exit 1
+        fi
+        data_dir="$(cd "$data_dir" && pwd)"
+    fi
     
-    # Créer le répertoire de travail
-    mkdir -p "$WORK_DIR"
-    log_info "Répertoire de travail: $WORK_DIR"
+    # Répertoire de travail propre à ce couple (export, équipe)
+    WORK_DIR="${WORK_ROOT}/$(printf '%s|%s' "$input_file" "$team_name" | sha256sum | cut -c1-16)"
+    CHECKPOINT_FILE="${WORK_DIR}/checkpoint"
+    RESUME_HINT="$0 --team $team_name --resume $input_file"
+    
+    local input_sha256
+    input_sha256=$(sha256sum "$input_file" | cut -d' ' -f1)
+    if [ "$resume" = true ] && [ -f "$CHECKPOINT_FILE" ]; then
+        if [ "$(checkpoint_get input_sha256)" != "$input_sha256" ]; then
+            log_error "L'export a changé depuis l'import interrompu: relancez sans --resume"
+            RESUME_HINT=""
+            exit 1
+        fi
+        log_info "Reprise de l'import: $WORK_DIR"
+    else
+        if [ "$resume" = true ]; then
+            log_warning "Aucun import interrompu à reprendre: import complet"
+        elif [ -f "$CHECKPOINT_FILE" ]; then
+            log_warning "Import précédent non terminé ignoré (utilisez --resume pour le reprendre)"
+        fi
+        rm -rf "$WORK_DIR"
+        mkdir -p "$WORK_DIR"
+        checkpoint_set input_sha256 "$input_sha256"
+        log_info "Répertoire de travail: $WORK_DIR"
+    fi
     
     # Générer nom de fichier si non spécifié
     if [ -z "$output_file" ]; then
-        output_file="${WORK_DIR}/import_${team_name}_$(date +%Y%m%d_%H%M%S).jsonl"
+        output_file="${WORK_DIR}/import_${team_name}.jsonl"
+        keep_jsonl=false
+    fi
+    output_file="$(cd "$(dirname "$output_file")" && pwd)/$(basename "$output_file")"
+    local zip_file="import_${team_name}.zip"
+    
+    if [ -n "$(checkpoint_get imported)" ]; then
+        log "✓ Import déjà terminé (job $(checkpoint_get imported))"
+        KEEP_WORK_DIR=false
+        return 0
     fi
     
     # ========================================================================
@@ -241,31 +340,39 @@ process_import() {
     # ========================================================================
     log_step "Étape 1/4" "Conversion Element → Mattermost JSONL"
     
-    local convert_cmd="python3 \"$CONVERTER_SCRIPT\" \"$input_file\" --team \"$team_name\" --output \"$output_file\""
+    if [ -f "${WORK_DIR}/$(checkpoint_get archived)" ] && [ -n "$(checkpoint_get archived)" ]; then
+        log_info "Reprise: conversion et archive déjà effectuées"
+    elif [ -n "$(checkpoint_get converted)" ] && [ -f "$output_file" ]; then
+        log_info "Reprise: conversion déjà effectuée ($output_file)"
+    else
+        local convert_cmd="python3 \"$CONVERTER_SCRIPT\" \"$input_file\" --team \"$team_name\" --output \"$output_file\""
     
-    if [ -n "$data_dir" ]; then
-        convert_cmd="$convert_cmd --data-dir \"$data_dir\""
-    fi
+        if [ -n "$data_dir" ]; then
+            convert_cmd="$convert_cmd --data-dir \"$data_dir\""
+        fi
     
-    if [ -n "$password" ]; then
-        convert_cmd="$convert_cmd --password \"$password\""
-    fi
+        if [ -n "$password" ]; then
+            convert_cmd="$convert_cmd --password \"$password\""
+        fi
     
-    log_info "Commande: $convert_cmd"
+        log_info "Commande: $convert_cmd"
     
-    if ! eval $convert_cmd >> "$LOG_FILE" 2>&1; then
-        log_error "Échec de la conversion"
-        log_error "Consultez les logs: $LOG_FILE"
-        exit 1
-    fi
+        if ! eval $convert_cmd >> "$LOG_FILE" 2>&1; then
+            log_error "Échec de la conversion"
+            log_error "Consultez les logs: $LOG_FILE"
+            exit 1
+        fi
     
-    if [ ! -f "$output_file" ]; then
-        log_error "Le fichier $output_file n'a pas été créé"
-        exit 1
-    fi
+        if [ ! -f "$output_file" ]; then
+            log_error "Le fichier $output_file n'a pas été créé"
+            exit 1
+        fi
     
-    log "✓ Conversion réussie: $output_file"
-    log_info "Taille: $(du -h "$output_file" | cut -f1)"
+        checkpoint_set converted "$output_file"
+        checkpoint_set posts "$(grep -c '"type": *"\(direct_\)\?post"' "$output_file" || true)"
+        log "✓ Conversion réussie: $output_file"
+        log_info "Taille: $(du -h "$output_file" | cut -f1)"
+    fi
     
     # ========================================================================
     # Étape 2: Création de l'archive ZIP
@@ -274,22 +381,44 @@ process_import() {
     
     cd "$WORK_DIR" || exit 1
     
-    local zip_file="import_${team_name}_$(date +%Y%m%d_%H%M%S).zip"
-    
-    if [ -d "mattermost_data" ]; then
-        log_info "Inclusion des fichiers média..."
-        zip -q -r "$zip_file" "$(basename "$output_file")" mattermost_data/
+    if [ "$(checkpoint_get archived)" = "$zip_file" ] && [ -f "$zip_file" ]; then
+        log_info "Reprise: archive déjà créée ($zip_file)"
     else
-        zip -q "$zip_file" "$(basename "$output_file")"
-    fi
+        # Pièces jointes dédupliquées (même contenu ajouté une fois), liées dans le
+        # répertoire de travail plutôt que copiées quand le système de fichiers le permet
+        local archive_options=(--compression "$compression")
+        local media_dir="$data_dir"
+        if [ -z "$media_dir" ] && [ -d "mattermost_data" ]; then
+            media_dir="mattermost_data"
+        fi
+        if [ -n "$media_dir" ]; then
+            log_info "Inclusion des fichiers média (dédupliqués): $media_dir"
+            archive_options+=(--media-dir "$media_dir" --stage-dir "${WORK_DIR}/media")
+        fi
     
-    if [ ! -f "$zip_file" ]; then
-        log_error "Échec de la création de l'archive"
-        exit 1
-    fi
+        if ! python3 "$ARCHIVE_SCRIPT" "${archive_options[@]}" "$zip_file" "$output_file" >> "$LOG_FILE" 2>&1; then
+            log_error "Échec de la création de l'archive"
+            exit 1
+        fi
+    
+        if [ ! -f "$zip_file" ]; then
+            log_error "Échec de la création de l'archive"
+            exit 1
+        fi
     
-    log "✓ Archive créée: $zip_file"
-    log_info "Taille: $(du -h "$zip_file" | cut -f1)"
+        # Le JSONL intermédiaire et les liens des médias ne sont plus utiles une fois dans l'archive
+        if [ "$keep_jsonl" = false ]; then
+            rm -f "$output_file"
+        fi
+        if [ -n "$media_dir" ]; then
+            log_info "$(grep '^Pièces jointes' "$LOG_FILE" | tail -1)"
+            rm -rf "${WORK_DIR}/media"
+        fi
+    
+        checkpoint_set archived "$zip_file"
+        log "✓ Archive créée: $zip_file ($compression)"
+        log_info "Taille: $(du -h "$zip_file" | cut -f1)"
+    fi
     
     # Si mode conversion seule, s'arrêter ici
     if [ "$no_import" = true ]; then
@@ -306,55 +435,87 @@ process_import() {
     # Étape 3: Import dans Mattermost avec mmctl
     # ========================================================================
     log_step "Étape 3/4" "Import dans Mattermost"
-    log_warning "Ceci peut prendre du temps selon la taille des données..."
-    
-    # Utiliser --bypass-upload pour import local direct (pas de validation séparée)
-    local import_output
-    import_output=$(mmctl --local import process --bypass-upload "$zip_file" 2>&1 | tee -a "$LOG_FILE")
     
-    # Extraire le Job ID
+    # Délai maximal selon la taille de l'import (posts comptés après la conversion)
+    local posts
+    posts=$(checkpoint_get posts)
+    local max_wait=$(( IMPORT_TIMEOUT_MARGIN * ${posts:-0} / IMPORT_POSTS_PER_SECOND ))
+    if [ "$max_wait" -lt "$MIN_IMPORT_TIMEOUT" ]; then
+        max_wait=$MIN_IMPORT_TIMEOUT
+    fi
+    log_info "Délai maximal de l'import: ${max_wait}s (${posts:-?} posts), bloqué après ${STALL_TIMEOUT}s sans activité"
+    local status
     local job_id
-    job_id=$(echo "$import_output" | grep -oP 'ID: \K[a-z0-9]+' | head -1 || echo "")
-    
-    if [ -z "$job_id" ]; then
-        log_error "Impossible d'extraire le Job ID de l'import"
-        log_error "Sortie mmctl:"
-        echo "$import_output" | tee -a "$LOG_FILE"
-        log_info ""
-        log_info "L'import a peut-être échoué. Vérifiez manuellement:"
-        log_info "  mmctl --local import job list"
-        exit 1
+    job_id=$(checkpoint_get submitted)
+    # Job déjà soumis lors d'une exécution précédente: seul son suivi est repris,
+    # resoumis une fois s'il s'est terminé en échec
+    local resubmit=false
+    if [ -n "$job_id" ]; then
+        log_info "Reprise: job d'import déjà créé ($job_id)"
+        resubmit=true
     fi
     
-    log "✓ Job d'import créé: $job_id"
-    
-    # ========================================================================
-    # Étape 4: Suivi de la progression
-    # ========================================================================
-    log_step "Étape 4/4" "Suivi de la progression"
-    
-    local status="pending"
-    local attempts=0
-    local max_attempts=600  # 10 minutes max (600 * 1s)
-    local last_status=""
-    
-    while [ "$status" != "success" ] && [ "$status" != "error" ] && [ "$status" != "canceled" ] && [ "$attempts" -lt "$max_attempts" ]; do
-        sleep 1
-        ((attempts++))
+    while true; do
+        if [ -z "$job_id" ]; then
+            log_warning "Ceci peut prendre du temps selon la taille des données..."
+            
+            # Utiliser --bypass-upload pour import local direct (pas de validation séparée)
+            local import_output
+            import_output=$(mmctl --local import process --bypass-upload "$zip_file" 2>&1 | tee -a "$LOG_FILE")
+            
+            # Extraire le Job ID
+            job_id=$(echo "$import_output" | grep -oP 'ID: \K[a-z0-9]+' | head -1 || echo "")
+            
+            if [ -z "$job_id" ]; then
+                log_error "Impossible d'extraire le Job ID de l'import"
+                log_error "Sortie mmctl:"
+                echo "$import_output" | tee -a "$LOG_FILE"
+                log_info ""
+                log_info "L'import a peut-être échoué. Vérifiez manuellement:"
+                log_info "  mmctl --local import job list"
+                exit 1
+            fi
+            
+            checkpoint_set submitted "$job_id"
+            log "✓ Job d'import créé: $job_id"
+        fi
         
-        # Récupérer le statut
-        local job_info
-        job_info=$(mmctl --local import job show "$job_id" 2>/dev/null || echo "")
+        # ====================================================================
+        # Étape 4: Suivi de la progression
+        # ====================================================================
+        log_step "Étape 4/4" "Suivi de la progression"
         
-        if [ -n "$job_info" ]; then
-            status=$(echo "$job_info" | grep "Status:" | awk '{print $2}' || echo "unknown")
-            
-            # Afficher la progression tous les 10 secondes
-            if [ "$status" != "$last_status" ] || [ $((attempts % 10)) -eq 0 ]; then
-                log_info "Statut: $status (${attempts}s écoulées)"
-                last_status="$status"
+        # Suivi avec intervalle croissant tant que le statut ne change pas (1s → 30s)
+        local watch_code=0
+        # pipefail: le code de sortie du pipeline est celui du script de suivi
+        python3 "$WATCHER_SCRIPT" "$job_id" --timeout "$max_wait" --stall-timeout "$STALL_TIMEOUT" \
+            2>> "$LOG_FILE" | while read -r line; do
+            log_info "$line"
+        done || watch_code=$?
+        
+        case $watch_code in
+            0) status="success" ;;
+            2) status="timeout" ;;
+            3) status="canceled" ;;
+            4) status="stalled" ;;
+            *) status="error" ;;
+        esac
+        
+        # Échec, annulation ou blocage: le job sera resoumis à la prochaine reprise; timeout: suivi repris
+        if [ "$status" = "stalled" ]; then
+            checkpoint_set submitted ""
+            break
+        fi
+        if [ "$status" = "error" ] || [ "$status" = "canceled" ]; then
+            checkpoint_set submitted ""
+            if [ "$resubmit" = true ]; then
+                log_warning "Le job d'import repris s'est terminé en échec ($status): nouvelle soumission"
+                resubmit=false
+                job_id=""
+                continue
             fi
         fi
+        break
     done
     
     # Vérifier le résultat final
@@ -362,6 +523,8 @@ process_import() {
         log ""
         log "✅ Import terminé avec succès!"
         log ""
+        checkpoint_set imported "$job_id"
+        KEEP_WORK_DIR=false
         
         # Afficher les détails
         mmctl --local import job show "$job_id" | tee -a "$LOG_FILE"
@@ -386,9 +549,13 @@ process_import() {
         log_error "Import annulé"
         exit 1
         
+    elif [ "$status" = "stalled" ]; then
+        log_error "Import bloqué: aucune activité depuis ${STALL_TIMEOUT}s, job arrêté"
+        mmctl --local job update "$job_id" cancel_requested >> "$LOG_FILE" 2>&1 || true
+        exit 1
+        
     else
-        log_warning "Timeout atteint (${max_attempts}s)"
-        log_warning "Statut actuel: $status"
+        log_warning "Timeout atteint (${max_wait}s)"
         log_info "Vérifiez manuellement:"
         log_info "  mmctl --local import job show $job_id"
         exit 1
@@ -427,6 +594,8 @@ main() {
     local password=""
     local output_file=""
     local no_import=false
+    local compression="deflated"
+    local resume=false
     
     while [[ $# -gt 0 ]]; do
         case $1 in
@@ -450,6 +619,14 @@ main() {
                 no_import=true
                 shift
                 ;;
+            -r|--resume)
+                resume=true
+                shift
+                ;;
+            -c|--compression)
+                compression="$2"
+                shift 2
+                ;;
             -h|--help)
                 show_usage
                 exit 0
@@ -487,8 +664,13 @@ main() {
         exit 1
     fi
     
+    if [ "$compression" != "deflated" ] && [ "$compression" != "stored" ]; then
+        log_error "Compression inconnue: $compression (deflated ou stored)"
+        exit 1
+    fi
+    
     # Lancer l'import
-    process_import "$input_file" "$team_name" "$data_dir" "$password" "$output_file" "$no_import"
+    process_import "$input_file" "$team_name" "$data_dir" "$password" "$output_file" "$no_import" "$compression" "$resume"
 }
 
 # Lancer le script
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Métriques au format texte Prometheus (sans dépendance)
+Compteurs et histogrammes mis à jour par l'application, jauges lues au moment
+de la collecte. Sans stockage partagé, les valeurs sont propres au processus
+(remises à zéro au redémarrage, ce que rate() et increase() de Prometheus
+gèrent). Avec un stockage partagé (job_store.py), compteurs et histogrammes
+sont cumulés pour tous les workers: chaque scrape voit le total.
+"""
+
+import json
+import threading
+
+# Content-Type du format texte Prometheus 0.0.4
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Bornes des histogrammes de durée (secondes): de la conversion d'un petit salon à l'import d'un gros export
+DURATION_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+
+
+def format_value(value):
+    """Valeur numérique au format Prometheus"""
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+def format_labels(labels):
+    """Étiquettes {a="x",b="y"} (chaîne vide sans étiquette)"""
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+def encode_labels(key):
+    """Étiquettes d'une série ((nom, valeur), ...) en JSON, clé du stockage partagé"""
+    return json.dumps([list(pair) for pair in key], ensure_ascii=False)
+
+def decode_labels(text):
+    """Étiquettes d'une série à partir de leur JSON"""
+    return tuple(tuple(pair) for pair in json.loads(text))
+
+
+class Metric:
+    """Métrique étiquetée: valeurs indexées par le tuple des étiquettes"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, description, labelnames=(), store=None):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        # store(): stockage partagé (add_metrics, metric_values), None pour des valeurs du processus
+        self.store = store
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        """Tuple ((nom, valeur), ...) des étiquettes, dans l'ordre déclaré"""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name}: étiquettes attendues {self.labelnames}, reçues {tuple(labels)}')
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """Lignes (suffixe, étiquettes, valeur) exposées"""
+        with self._lock:
+            return [('', key, value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        """Bloc texte de la métrique (HELP, TYPE puis échantillons)"""
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} {self.kind}']
+        for suffix, labels, value in self.samples():
+            lines.append(f'{self.name}{suffix}{format_labels(labels)} {format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Compteur croissant"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """Incrémenter le compteur"""
+        key = self._key(labels)
+        if self.store:
+            self.store().add_metrics([(self.name, encode_labels(key), amount)])
+            return
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        """Valeurs du compteur (cumulées entre processus avec un stockage partagé)"""
+        if not self.store:
+            return super().samples()
+        values = self.store().metric_values([self.name])
+        return sorted(('', decode_labels(labels), value) for (_, labels), value in values.items())
+
+
+class Gauge(Metric):
+    """Jauge lue à la collecte: collect() retourne une valeur, ou {tuple des étiquettes: valeur}"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, description, collect, labelnames=()):
+        super().__init__(name, description, labelnames)
+        self.collect = collect
+
+    def samples(self):
+        """Valeurs courantes"""
+        values = self.collect()
+        if not isinstance(values, dict):
+            return [('', (), values)]
+        return [
+            ('', tuple(zip(self.labelnames, key if isinstance(key, tuple) else (key,))), value)
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(Metric):
+    """Histogramme cumulatif (buckets, somme et nombre d'observations)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, description, labelnames=(), buckets=DURATION_BUCKETS, store=None):
+        super().__init__(name, description, labelnames, store)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        """Enregistrer une observation"""
+        key = self._key(labels)
+        if self.store:
+            # Une série par bucket (déjà cumulé), plus _sum et _count
+            self.store().add_metrics([
+                *((f'{self.name}_bucket', encode_labels(key + (('le', format_value(float(bound))),)), 1)
+                  for bound in self.buckets if value <= bound),
+                (f'{self.name}_sum', encode_labels(key), value),
+                (f'{self.name}_count', encode_labels(key), 1)
+            ])
+            return
+        with self._lock:
+            state = self._values.setdefault(key, {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][index] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    def samples(self):
+        """Buckets cumulés, _sum et _count de chaque série"""
+        if self.store:
+            return self._shared_samples()
+        samples = []
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, state['counts']):
+                    samples.append(('_bucket', key + (('le', format_value(float(bound))),), count))
+                samples.append(('_sum', key, state['sum']))
+                samples.append(('_count', key, state['count']))
+        return samples
+
+    def _shared_samples(self):
+        """Buckets, _sum et _count cumulés par le stockage partagé"""
+        values = self.store().metric_values([f'{self.name}{suffix}' for suffix in ('_bucket', '_sum', '_count')])
+        samples = []
+        for key in sorted(decode_labels(labels) for name, labels in values if name == f'{self.name}_count'):
+            for bound in self.buckets:
+                le = key + (('le', format_value(float(bound))),)
+                samples.append(('_bucket', le, values.get((f'{self.name}_bucket', encode_labels(le)), 0)))
+            samples.append(('_sum', key, values.get((f'{self.name}_sum', encode_labels(key)), 0)))
+            samples.append(('_count', key, values[(f'{self.name}_count', encode_labels(key))]))
+        return samples
+
+
+class MetricsRegistry:
+    """Ensemble des métriques exposées par /metrics.
+
+    store(), s'il est fourni, retourne le stockage partagé où compteurs et histogrammes
+    sont cumulés (appelé à chaque mise à jour: il peut être ouvert après la déclaration).
+    """
+
+    def __init__(self, store=None):
+        self.store = store
+        self._metrics = []
+
+    def register(self, metric):
+        """Ajouter une métrique, retourne la métrique"""
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, description, labelnames=()):
+        """Nouveau compteur"""
+        return self.register(Counter(name, description, labelnames, self.store))
+
+    def gauge(self, name, description, collect, labelnames=()):
+        """Nouvelle jauge lue à la collecte"""
+        return self.register(Gauge(name, description, collect, labelnames))
+
+    def histogram(self, name, description, labelnames=(), buckets=DURATION_BUCKETS):
+        """Nouvel histogramme"""
+        return self.register(Histogram(name, description, labelnames, buckets, self.store))
+
+    def render(self):
+        """Toutes les métriques au format texte Prometheus"""
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
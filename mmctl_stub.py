@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Remplaçant de mmctl pour les benchmarks et tests de charge (sans serveur Mattermost)
+Seules les commandes d'import utilisées par element-import.sh et l'interface web
+sont simulées; un import dure MMCTL_STUB_SECONDS secondes.
+
+Usage (via un exécutable `mmctl` placé en tête du PATH):
+    mmctl --local import process --bypass-upload import.zip
+    mmctl --local --format json import job list --per-page 200
+    mmctl --local --format json import job show <id>
+    mmctl --local --format json job update <id> cancel_requested
+
+Environnement:
+    MMCTL_STUB_DIR       dossier d'état des jobs (défaut: /tmp/mmctl_stub)
+    MMCTL_STUB_SECONDS   durée d'un import (défaut: 1)
+    MMCTL_STUB_LATENCY   délai de réponse de chaque commande (défaut: 0)
+    MMCTL_STUB_FAIL      part des imports terminés en erreur (défaut: 0)
+    MMCTL_STUB_HANG      part des imports bloqués en cours, sans activité (défaut: 0)
+"""
+
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+STATE_DIR = Path(os.environ.get('MMCTL_STUB_DIR', '/tmp/mmctl_stub'))
+IMPORT_SECONDS = float(os.environ.get('MMCTL_STUB_SECONDS', 1))
+LATENCY = float(os.environ.get('MMCTL_STUB_LATENCY', 0))
+FAIL_RATIO = float(os.environ.get('MMCTL_STUB_FAIL', 0))
+HANG_RATIO = float(os.environ.get('MMCTL_STUB_HANG', 0))
+
+
+def create_job(path):
+    """Enregistrer un job d'import, retourne son ID"""
+    job_id = uuid.uuid4().hex[:26]
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(STATE_DIR / job_id, 'w', encoding='utf-8') as f:
+        json.dump({'created': time.time(), 'path': path, 'fail': random.random() < FAIL_RATIO,
+                   'hang': random.random() < HANG_RATIO}, f)
+    return job_id
+
+def job_state(job_id):
+    """Job au format de `mmctl --format json import job show`, None s'il n'existe pas"""
+    try:
+        with open(STATE_DIR / job_id, encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    elapsed = time.time() - state['created']
+    # Job bloqué: figé au début de l'import (progression et heartbeat arrêtés)
+    if state.get('hang') and not state.get('canceled'):
+        elapsed = min(elapsed, IMPORT_SECONDS / 5)
+    if state.get('canceled'):
+        status = 'canceled'
+    elif state.get('hang') or elapsed < IMPORT_SECONDS:
+        status = 'pending' if elapsed < IMPORT_SECONDS / 10 else 'in_progress'
+    else:
+        status = 'error' if state['fail'] else 'success'
+    return {
+        'id': job_id,
+        'type': 'import_process',
+        'status': status,
+        'progress': min(100, int(100 * elapsed / IMPORT_SECONDS)) if IMPORT_SECONDS else 100,
+        'create_at': int(state['created'] * 1000),
+        'last_activity_at': int((state['created'] + elapsed) * 1000),
+        'data': {'import_file': state['path']}
+    }
+
+def main():
+    """Point d'entrée: mmctl [options] import (process|job list|job show) ou job update"""
+    args = [arg for arg in sys.argv[1:] if arg not in ('--local', '--format', 'json')]
+    time.sleep(LATENCY)
+
+    if args[:2] == ['import', 'process']:
+        path = args[-1]
+        if not os.path.isfile(path):
+            print(f'Error: fichier introuvable: {path}', file=sys.stderr)
+            sys.exit(1)
+        print(f'Import process job successfully created, ID: {create_job(path)}')
+    elif args[:3] == ['import', 'job', 'list']:
+        jobs = [job_state(path.name) for path in STATE_DIR.glob('*')] if STATE_DIR.is_dir() else []
+        jobs = sorted((job for job in jobs if job), key=lambda job: job['create_at'], reverse=True)
+        print(json.dumps(jobs))
+    elif args[:3] == ['import', 'job', 'show'] and len(args) > 3:
+        job = job_state(args[3])
+        if job is None:
+            print(f'Error: job introuvable: {args[3]}', file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps(job))
+    elif args[:2] == ['job', 'update'] and len(args) > 3:
+        job = job_state(args[2])
+        if job is None:
+            print(f'Error: job introuvable: {args[2]}', file=sys.stderr)
+            sys.exit(1)
+        # Seul un job en attente ou en cours peut être annulé
+        if args[3] in ('cancel_requested', 'canceled') and job['status'] in ('pending', 'in_progress'):
+            with open(STATE_DIR / args[2], encoding='utf-8') as f:
+                state = json.load(f)
+            with open(STATE_DIR / args[2], 'w', encoding='utf-8') as f:
+                json.dump({**state, 'canceled': True}, f)
+        print(json.dumps(job_state(args[2])))
+    else:
+        print(f'Commande non simulée: {" ".join(sys.argv[1:])}', file=sys.stderr)
+        sys.exit(1)
+
+def install(bin_dir):
+    """Créer un exécutable `mmctl` dans bin_dir (à placer en tête du PATH), retourne son chemin"""
+    bin_dir = Path(bin_dir)
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    path = bin_dir / 'mmctl'
+    path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{Path(__file__).resolve()}" "$@"\n')
+    path.chmod(0o755)
+    return path
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Suivi des jobs d'import mmctl
+Un seul thread suit tous les jobs d'import en cours du service: une requête
+`mmctl import job list` par tick (au lieu d'un `import job show` par job et par
+seconde), avec un intervalle qui s'allonge tant que rien ne change. Un job en
+cours dont l'activité (statut, progression, last_activity_at) ne change plus est
+signalé comme bloqué sans attendre le délai maximal.
+
+Usage:
+    python3 mmctl_watcher.py <job_id> [--timeout 600] [--stall-timeout 600]
+    Code de sortie: 0 succès, 1 erreur, 2 timeout, 3 annulé, 4 bloqué
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+# États finaux d'un job Mattermost ('warning': terminé avec des avertissements)
+TERMINAL_STATUSES = ('success', 'warning', 'error', 'canceled')
+SUCCESS_STATUSES = ('success', 'warning')
+
+# Jobs récupérés par `import job list` (les plus récents d'abord)
+LIST_PAGE_SIZE = 200
+
+# Intervalle de vérification de l'annulation pendant wait() (secondes)
+CANCEL_POLL_INTERVAL = 0.5
+
+JOB_ID_PATTERN = re.compile(r'ID: ([a-z0-9]+)')
+
+
+class ImportStalled(subprocess.TimeoutExpired):
+    """Job d'import en cours sans aucune activité côté serveur pendant stall_timeout secondes"""
+
+    def __init__(self, job_id, stall_timeout, job=None):
+        super().__init__(['mmctl', 'import', 'job', job_id], stall_timeout)
+        self.job_id = job_id
+        self.job = job
+
+    def __str__(self):
+        return f'Import {self.job_id} bloqué: aucune activité depuis {self.timeout:.0f}s'
+
+
+def parse_job_id(output):
+    """Extraire l'ID du job de la sortie de `mmctl import process`"""
+    match = JOB_ID_PATTERN.search(output or '')
+    return match.group(1) if match else None
+
+def run_mmctl(args, timeout=60):
+    """Exécuter mmctl en mode local, sortie JSON décodée"""
+    result = subprocess.run(
+        ['mmctl', '--local', '--format', 'json'] + args,
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+        env={**os.environ, 'MMCTL_LOCAL': 'true'}
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f'mmctl a échoué (code {result.returncode})')
+    return parse_json_output(result.stdout)
+
+def parse_json_output(output):
+    """Décoder la sortie JSON de mmctl (document unique ou un objet par ligne)"""
+    output = output.strip()
+    if not output:
+        return []
+    try:
+        data = json.loads(output)
+    except ValueError:
+        data = [json.loads(line) for line in output.splitlines() if line.strip()]
+    return data if isinstance(data, list) else [data]
+
+def list_import_jobs():
+    """Derniers jobs d'import Mattermost, indexés par ID"""
+    jobs = run_mmctl(['import', 'job', 'list', '--per-page', str(LIST_PAGE_SIZE)])
+    return {job['id']: job for job in jobs if isinstance(job, dict) and 'id' in job}
+
+def show_import_job(job_id):
+    """Un job d'import Mattermost (hors de la première page de la liste)"""
+    jobs = run_mmctl(['import', 'job', 'show', job_id])
+    return jobs[0] if jobs else None
+
+def cancel_import_job(job_id):
+    """Demander l'arrêt d'un job d'import côté serveur (en attente ou en cours)"""
+    run_mmctl(['job', 'update', job_id, 'cancel_requested'])
+
+
+class MmctlWatcher:
+    """Suivi partagé des jobs d'import mmctl, avec intervalle adaptatif"""
+
+    def __init__(self, min_interval=1.0, max_interval=30.0, backoff=1.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self._watched = {}
+        self._cond = threading.Condition()
+        self._interval = min_interval
+        self.polls = 0
+
+        thread = threading.Thread(target=self._run, name='mmctl-watcher')
+        thread.daemon = True
+        thread.start()
+
+    def watch(self, job_id, on_update=None):
+        """Suivre un job; on_update(job) est appelé à chaque changement de statut ou de progression.
+
+        Chaque watch() est suivi d'un unwatch(): le job reste suivi tant qu'un appelant l'attend.
+        """
+        with self._cond:
+            entry = self._watched.get(job_id)
+            if entry is None:
+                now = time.time()
+                entry = {'job': None, 'callbacks': [], 'done': threading.Event(), 'active_at': now,
+                         'seen_at': now, 'waiters': 0}
+                self._watched[job_id] = entry
+            entry['waiters'] += 1
+            if on_update:
+                entry['callbacks'].append(on_update)
+            self._interval = self.min_interval
+            self._cond.notify()
+        return entry
+
+    def unwatch(self, job_id, on_update=None):
+        """Ne plus suivre un job pour cet appelant (suivi arrêté au départ du dernier)"""
+        with self._cond:
+            entry = self._watched.get(job_id)
+            if entry is None:
+                return
+            if on_update in entry['callbacks']:
+                entry['callbacks'].remove(on_update)
+            entry['waiters'] -= 1
+            if entry['waiters'] <= 0:
+                del self._watched[job_id]
+
+    def wait(self, job_id, timeout=None, on_update=None, cancel=None, stall_timeout=None):
+        """Attendre l'état final d'un job, retourne le job mmctl (None si timeout ou annulation).
+
+        cancel (objet avec is_set(), ex. CancelToken) interrompt l'attente sans toucher au job.
+        Un job en cours observé sans activité pendant stall_timeout secondes lève ImportStalled.
+        """
+        entry = self.watch(job_id, on_update)
+        deadline = time.time() + timeout if timeout is not None else None
+        stalled = False
+        try:
+            while True:
+                remaining = None if deadline is None else max(0, deadline - time.time())
+                if cancel is not None:
+                    remaining = CANCEL_POLL_INTERVAL if remaining is None else min(remaining, CANCEL_POLL_INTERVAL)
+                if stall_timeout:
+                    stall_in = max(CANCEL_POLL_INTERVAL, entry['active_at'] + stall_timeout - time.time())
+                    remaining = stall_in if remaining is None else min(remaining, stall_in)
+                finished = entry['done'].wait(remaining)
+                # Bloqué: toujours en cours à une observation postérieure au délai sans activité
+                stalled = bool(not finished and stall_timeout and entry['job']
+                               and entry['job'].get('status') == 'in_progress'
+                               and entry['seen_at'] - entry['active_at'] >= stall_timeout)
+                if finished or stalled or (cancel is not None and cancel.is_set()) \
+                        or (deadline is not None and time.time() >= deadline):
+                    break
+        finally:
+            self.unwatch(job_id, on_update)
+        if stalled:
+            raise ImportStalled(job_id, stall_timeout, entry['job'])
+        return entry['job'] if finished else None
+
+    def watched(self):
+        """IDs des jobs suivis"""
+        with self._cond:
+            return list(self._watched)
+
+    def _run(self):
+        """Boucle de suivi: une liste mmctl par tick pour tous les jobs suivis"""
+        while True:
+            with self._cond:
+                while not self._watched:
+                    self._cond.wait()
+                self._cond.wait(self._interval)
+                watched = dict(self._watched)
+            if not watched:
+                continue
+
+            changed = False
+            try:
+                self.polls += 1
+                jobs = list_import_jobs()
+            except Exception as e:
+                print(f'Suivi mmctl: {e}', file=sys.stderr)
+                watched = {}
+            # Chaque job séparément: un job introuvable ne bloque pas le suivi des autres
+            for job_id, entry in watched.items():
+                try:
+                    job = jobs.get(job_id)
+                    if job is None:
+                        self.polls += 1
+                        job = show_import_job(job_id)
+                    if job is not None:
+                        changed = self._update(entry, job) or changed
+                except Exception as e:
+                    print(f'Suivi mmctl ({job_id}): {e}', file=sys.stderr)
+
+            with self._cond:
+                if changed:
+                    self._interval = self.min_interval
+                else:
+                    self._interval = min(self._interval * self.backoff, self.max_interval)
+
+    @staticmethod
+    def _update(entry, job):
+        """Enregistrer l'état d'un job, prévenir ses abonnés s'il a changé"""
+        previous = entry['job']
+        now = time.time()
+        entry['seen_at'] = now
+        # Activité du job (heartbeat serveur compris), sans effet sur l'intervalle de suivi
+        if previous is None or previous.get('last_activity_at') != job.get('last_activity_at'):
+            entry['active_at'] = now
+        if previous is not None and (previous.get('status'), previous.get('progress')) == \
+                (job.get('status'), job.get('progress')):
+            entry['job'] = job
+            return False
+
+        entry['active_at'] = now
+
+        entry['job'] = job
+        for callback in list(entry['callbacks']):
+            try:
+                callback(job)
+            except Exception as e:
+                print(f'Suivi mmctl: {e}', file=sys.stderr)
+        if job.get('status') in TERMINAL_STATUSES:
+            entry['done'].set()
+        return True
+
+
+def main():
+    """Point d'entrée CLI: suivre un job jusqu'à son état final (utilisé par element-import.sh)"""
+    parser = argparse.ArgumentParser(description='Suivi d\'un job d\'import mmctl')
+    parser.add_argument('job_id', help='ID du job d\'import Mattermost')
+    parser.add_argument('--timeout', type=float, default=600, help='Délai maximal (secondes)')
+    parser.add_argument('--stall-timeout', type=float, default=600,
+                        help='Délai sans activité d\'un job en cours avant de le déclarer bloqué (0: désactivé)')
+    parser.add_argument('--max-interval', type=float, default=30, help='Intervalle maximal entre deux requêtes')
+    args = parser.parse_args()
+
+    started = time.time()
+
+    def on_update(job):
+        progress = f", {job['progress']}%" if job.get('progress') is not None else ''
+        print(f"Statut: {job.get('status')}{progress} ({time.time() - started:.0f}s écoulées)", flush=True)
+
+    watcher = MmctlWatcher(max_interval=args.max_interval)
+    try:
+        job = watcher.wait(args.job_id, args.timeout, on_update, stall_timeout=args.stall_timeout or None)
+    except ImportStalled as e:
+        print(e, file=sys.stderr)
+        sys.exit(4)
+    if job is None:
+        print(f'Timeout atteint ({args.timeout:.0f}s)', file=sys.stderr)
+        sys.exit(2)
+    if job.get('status') in SUCCESS_STATUSES:
+        sys.exit(0)
+    sys.exit(3 if job.get('status') == 'canceled' else 1)
+
+if __name__ == '__main__':
+    main()
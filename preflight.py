@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Analyse préalable d'un export Element, avant la mise en file d'attente
+Un parcours en flux compte les événements par type, les expéditeurs distincts,
+les threads, les pièces jointes et la taille de chaque salon. Avec le débit des
+imports précédents, on en déduit une durée estimée, un plan de découpage et les
+délais maximaux de la conversion et de l'import.
+
+Usage:
+    python3 preflight.py export.json
+    python3 preflight.py salon1.json salon2.json --shard-posts 50000
+    python3 preflight.py exports.zip
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+from element_stream import MEDIA_MSGTYPES, is_message, iter_export_stream, relation
+
+# Débits supposés tant qu'aucun import n'a été mesuré (événements/s convertis, posts/s importés)
+DEFAULT_CONVERT_RATE = 10000
+DEFAULT_IMPORT_RATE = 25
+
+# Jobs terminés pris en compte pour mesurer les débits
+HISTORY_JOBS = 50
+
+# Durée visée pour l'import d'un shard (reprise et pipeline plus fins au-delà)
+TARGET_SHARD_SECONDS = 600
+MIN_SHARD_POSTS = 1000
+
+# Au-delà de cette durée estimée, l'import est à planifier hors des heures de travail
+OFF_HOURS_SECONDS = 3600
+
+# Salons détaillés dans le plan (les plus gros)
+PLAN_ROOMS = 20
+
+# Délais maximaux: durée estimée multipliée par la marge, jamais sous le minimum (secondes)
+TIMEOUT_MARGIN = 4
+MIN_CONVERT_TIMEOUT = 300
+MIN_IMPORT_TIMEOUT = 600
+
+# Taille moyenne d'un événement dans un export, pour estimer un salon non analysé
+EVENT_BYTES = 500
+
+
+def analyze_stream(fp, name, size, all_senders=None):
+    """Compter les événements d'un salon lu en flux (expéditeurs ajoutés à all_senders)"""
+    meta = {}
+    types = {}
+    senders = set()
+    thread_roots = set()
+    analysis = {'name': name, 'bytes': size, 'events': 0, 'messages': 0, 'thread_replies': 0,
+                'attachments': 0, 'edits': 0, 'redactions': 0}
+
+    for event in iter_export_stream(fp, meta):
+        analysis['events'] += 1
+        event_type = event.get('type') or '?'
+        types[event_type] = types.get(event_type, 0) + 1
+        if event_type == 'm.room.redaction':
+            analysis['redactions'] += 1
+        rel_type, target = relation(event)
+        if rel_type == 'm.replace':
+            analysis['edits'] += 1
+        if not is_message(event):
+            continue
+        analysis['messages'] += 1
+        senders.add(event.get('sender', ''))
+        if (event.get('content') or {}).get('msgtype') in MEDIA_MSGTYPES:
+            analysis['attachments'] += 1
+        if rel_type == 'm.thread' and target:
+            analysis['thread_replies'] += 1
+            thread_roots.add(target)
+
+    analysis['name'] = meta.get('room_name') or meta.get('name') or name
+    analysis['senders'] = len(senders)
+    if all_senders is not None:
+        all_senders |= senders
+    analysis['thread_roots'] = len(thread_roots)
+    analysis['types'] = dict(sorted(types.items(), key=lambda item: -item[1]))
+    return analysis
+
+def analyze_paths(paths):
+    """Analyser des exports: fichiers .json ou archive .zip de salons"""
+    started = time.time()
+    rooms = []
+    senders = set()
+    for path in map(Path, paths):
+        if path.suffix.lower() == '.zip':
+            with zipfile.ZipFile(path) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and info.filename.lower().endswith('.json'):
+                        with archive.open(info) as fp:
+                            rooms.append(analyze_stream(fp, Path(info.filename).stem, info.file_size, senders))
+        else:
+            with open(path, 'rb') as fp:
+                rooms.append(analyze_stream(fp, path.stem, os.path.getsize(path), senders))
+
+    totals = {key: sum(room[key] for room in rooms)
+              for key in ('bytes', 'events', 'messages', 'thread_roots', 'thread_replies', 'attachments',
+                          'edits', 'redactions')}
+    return {**totals, 'senders': len(senders), 'rooms': rooms, 'seconds': round(time.time() - started, 3)}
+
+def throughput(jobs):
+    """Débits mesurés sur des jobs terminés (stats et timings), débits par défaut sinon"""
+    events = convert_seconds = posts = import_seconds = 0
+    for job in jobs[:HISTORY_JOBS]:
+        timings = job.get('timings') or {}
+        stats = job.get('stats') or {}
+        if timings.get('convert') and stats.get('events'):
+            events += stats['events']
+            convert_seconds += timings['convert']
+        imports = [seconds for seconds in timings.get('mmctl') or [] if seconds]
+        if imports and stats.get('messages'):
+            posts += stats['messages']
+            import_seconds += sum(imports)
+    return {
+        'convert_events_per_second': round(events / convert_seconds) if convert_seconds else DEFAULT_CONVERT_RATE,
+        'import_posts_per_second': round(posts / import_seconds, 1) if import_seconds else DEFAULT_IMPORT_RATE,
+        'measured': bool(convert_seconds or import_seconds)
+    }
+
+def estimate(analysis, rates, shard_posts=None, shard_bytes=None):
+    """Durée estimée (secondes) et plan de découpage avec les limites configurées.
+
+    Les shards sont importés pendant la conversion des suivants: la durée tend vers
+    celle de l'import, plus la conversion du premier shard. Sans shard_posts, l'export
+    est converti puis importé d'un bloc. La taille de shard visée (environ
+    TARGET_SHARD_SECONDS d'import) n'est qu'une suggestion de configuration
+    (suggested_shard_posts), proposée quand elle est plus petite que shard_posts.
+    """
+    import_rate = rates['import_posts_per_second']
+    recommended = max(MIN_SHARD_POSTS, int(round(import_rate * TARGET_SHARD_SECONDS, -3)))
+
+    def shard_count(messages, size):
+        shards = max(1, math.ceil(messages / shard_posts)) if shard_posts else 1
+        # Taille de l'export: majorant de celle du JSONL converti
+        if shard_bytes:
+            shards = max(shards, math.ceil(size / shard_bytes))
+        return shards
+
+    def duration(events, posts, per_shard):
+        shards = max(1, math.ceil(posts / per_shard)) if per_shard else 1
+        convert = events / rates['convert_events_per_second']
+        return convert / shards + max(convert - convert / shards, posts / import_rate)
+
+    seconds = duration(analysis['events'], analysis['messages'], shard_posts)
+    shard_messages = min(analysis['messages'], shard_posts) if shard_posts else analysis['messages']
+    rooms = [
+        {'name': room['name'], 'messages': room['messages'],
+         'shards': shard_count(room['messages'], room['bytes']),
+         'eta_seconds': round(duration(room['events'], room['messages'], shard_posts))}
+        for room in sorted(analysis['rooms'], key=lambda room: -room['messages'])[:PLAN_ROOMS]
+    ]
+
+    off_hours = seconds > OFF_HOURS_SECONDS
+    return {
+        'eta_seconds': round(seconds),
+        'rates': rates,
+        'plan': {
+            'shard_posts': shard_posts,
+            'shard_bytes': shard_bytes,
+            'shards': shard_count(analysis['messages'], analysis['bytes']),
+            'suggested_shard_posts': recommended if not shard_posts or recommended < shard_posts else None,
+            'rooms': rooms,
+            'off_hours': off_hours,
+            'priority': 'low' if off_hours else 'normal'
+        },
+        'timeouts': {
+            'convert': convert_timeout(analysis['events'], rates),
+            'import_shard': import_timeout(shard_messages, rates)
+        }
+    }
+
+def convert_timeout(events, rates, minimum=MIN_CONVERT_TIMEOUT):
+    """Délai maximal de la conversion de events événements, selon le débit mesuré"""
+    return max(minimum, math.ceil(TIMEOUT_MARGIN * events / rates['convert_events_per_second']))
+
+def import_timeout(posts, rates, minimum=MIN_IMPORT_TIMEOUT):
+    """Délai maximal de l'import mmctl de posts posts (un shard), selon le débit mesuré"""
+    return max(minimum, math.ceil(TIMEOUT_MARGIN * posts / rates['import_posts_per_second']))
+
+def main():
+    """Point d'entrée CLI: analyse et estimation (débits par défaut) en JSON"""
+    parser = argparse.ArgumentParser(description='Analyse préalable d\'exports Element')
+    parser.add_argument('paths', nargs='+', help='Exports .json ou archive .zip de salons')
+    parser.add_argument('--shard-posts', type=int, default=None, help='Posts maximum par shard configurés (SHARD_MAX_POSTS)')
+    parser.add_argument('--shard-bytes', type=int, default=None, help='Octets maximum par shard configurés (SHARD_MAX_BYTES)')
+    args = parser.parse_args()
+
+    try:
+        analysis = analyze_paths(args.paths)
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        print(f'Erreur: {e}', file=sys.stderr)
+        sys.exit(1)
+    result = {'analysis': analysis, **estimate(analysis, throughput([]), args.shard_posts, args.shard_bytes)}
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -139,14 +139,6 @@ test_dependencies() {
         test_fail "mmctl non installé"
     fi
     
-    # zip
-    test_start "zip"
-    if command -v zip &> /dev/null; then
-        test_pass
-    else
-        test_fail "La commande 'zip' n'est pas installée"
-    fi
-    
     # Flask (pour interface web)
     test_start "Flask (optionnel)"
     if python3 -c "import flask" 2>/dev/null; then
@@ -206,6 +198,22 @@ test_files() {
         test_fail "Fichier manquant"
     fi
     
+    # Script de création des archives (remplace la commande zip)
+    test_start "Script import_archive.py"
+    if [ -f "/opt/mattermost/scripts/import_archive.py" ]; then
+        test_pass
+    else
+        test_fail "Fichier manquant"
+    fi
+    
+    # Suivi des jobs d'import mmctl
+    test_start "Script mmctl_watcher.py"
+    if [ -f "/opt/mattermost/scripts/mmctl_watcher.py" ]; then
+        test_pass
+    else
+        test_fail "Fichier manquant"
+    fi
+    
     # Script Bash principal
     test_start "Script element-import.sh"
     if [ -f "/opt/mattermost/scripts/element-import.sh" ]; then
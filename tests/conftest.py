@@ -0,0 +1,66 @@
+"""Configuration commune des tests: modules du dépôt importables, mmctl simulé"""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import mmctl_stub  # noqa: E402
+
+
+@pytest.fixture
+def mmctl(tmp_path, monkeypatch):
+    """mmctl simulé (mmctl_stub.py) en tête du PATH, imports de 0,5 s; retourne le dossier d'état"""
+    mmctl_stub.install(tmp_path / 'bin')
+    monkeypatch.setenv('PATH', f'{tmp_path / "bin"}:{os.environ["PATH"]}')
+    monkeypatch.setenv('MMCTL_STUB_DIR', str(tmp_path / 'mmctl'))
+    monkeypatch.setenv('MMCTL_STUB_SECONDS', '0.5')
+    return tmp_path / 'mmctl'
+
+
+@pytest.fixture(scope='session')
+def web(tmp_path_factory):
+    """Module de l'interface web, configuré sur un dossier de travail temporaire et le mmctl simulé"""
+    root = tmp_path_factory.mktemp('web')
+    mmctl_stub.install(root / 'bin')
+    os.environ.update({
+        'PATH': f'{root / "bin"}:{os.environ["PATH"]}',
+        'MMCTL_STUB_DIR': str(root / 'mmctl'),
+        'MMCTL_STUB_SECONDS': '0.2',
+        'MMCTL_POLL_MAX_INTERVAL': '0.2',
+        'UPLOAD_FOLDER': str(root / 'uploads'),
+        'JOB_STORE': 'memory',
+        'CONVERTER_WORKERS': '1',
+        'ARTIFACT_CACHE_MAX_BYTES': '0',
+        'WORKSPACE_SWEEP_INTERVAL': '3600'
+    })
+    import web_interface_flask
+    return web_interface_flask
+
+@pytest.fixture
+def client(web):
+    """Client de test Flask"""
+    return web.app.test_client()
+
+def element_export(messages=3, room_name='Général'):
+    """Export Element minimal (JSON, octets): messages de deux utilisateurs"""
+    events = [{'type': 'm.room.message', 'event_id': f'$m{index}', 'sender': f'@user{index % 2}:example.org',
+               'origin_server_ts': 1700000000000 + index, 'content': {'msgtype': 'm.text', 'body': f'message {index}'}}
+              for index in range(messages)]
+    return json.dumps({'room_name': room_name, 'messages': events}).encode()
+
+def wait_job(client, job_id, timeout=60):
+    """Attendre l'état final d'un job, retourne sa réponse JSON"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f'/api/job/{job_id}').get_json()
+        if job['status'] in ('completed', 'error', 'canceled'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'Job {job_id} toujours {job["status"]}')
@@ -0,0 +1,67 @@
+"""Cache des conversions: entrées, restauration, éviction des moins récemment utilisées"""
+
+import os
+
+from artifact_cache import META_FILE, ArtifactCache, cache_key
+
+
+def artifact(tmp_path, name, size):
+    """Fichier produit par une conversion, de size octets"""
+    path = tmp_path / 'out' / name
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(b'x' * size)
+    return {'path': str(path), 'kind': 'archive'}
+
+def touch(cache, key, when):
+    """Dernier usage d'une entrée fixé à when"""
+    os.utime(cache.root / key / META_FILE, (when, when))
+
+def test_cache_key_depends_on_every_part():
+    key = cache_key('sha', 'team', 'stream:v1', {'shard_posts': 10})
+    assert key == cache_key('sha', 'team', 'stream:v1', {'shard_posts': 10})
+    assert key != cache_key('sha', 'autre', 'stream:v1', {'shard_posts': 10})
+    assert key != cache_key('sha', 'team', 'stream:v2', {'shard_posts': 10})
+    assert key != cache_key('sha', 'team', 'stream:v1', {'shard_posts': 20})
+
+def test_put_get_and_restore(tmp_path):
+    cache = ArtifactCache(tmp_path / 'cache', 1000)
+    assert cache.get('k') is None
+    assert cache.put('k', [artifact(tmp_path, 'import.zip', 100)], {'messages': 3})
+    # Entrée existante: pas de nouvelle écriture
+    assert not cache.put('k', [artifact(tmp_path, 'import.zip', 100)], {'messages': 3})
+
+    entry = cache.get('k')
+    assert entry['stats'] == {'messages': 3}
+    assert entry['files'] == [{'kind': 'archive', 'name': 'import.zip'}]
+    paths = cache.restore('k', entry, tmp_path)
+    assert [path.read_bytes() for path in paths] == [b'x' * 100]
+    assert cache.stats() == {'entries': 1, 'bytes': 100, 'max_bytes': 1000, 'hits': 1, 'misses': 1}
+
+def test_restore_after_eviction(tmp_path):
+    cache = ArtifactCache(tmp_path / 'cache', 1000)
+    cache.put('k', [artifact(tmp_path, 'import.zip', 10)], {})
+    entry = cache.get('k')
+    cache.shrink(10)
+    assert cache.restore('k', entry, tmp_path) is None
+
+def test_disabled_or_oversized_entries_are_skipped(tmp_path):
+    assert not ArtifactCache(tmp_path / 'off', 0).put('k', [artifact(tmp_path, 'a.zip', 10)], {})
+    assert not ArtifactCache(tmp_path / 'small', 5).put('k', [artifact(tmp_path, 'a.zip', 10)], {})
+
+def test_least_recently_used_entries_are_evicted_first(tmp_path):
+    cache = ArtifactCache(tmp_path / 'cache', 250)
+    for index, key in enumerate(('a', 'b')):
+        cache.put(key, [artifact(tmp_path, f'{key}.zip', 100)], {})
+        touch(cache, key, 1000 + index)
+    # a relu après b: b est le moins récemment utilisé
+    cache.get('a')
+    cache.put('c', [artifact(tmp_path, 'c.zip', 100)], {})
+    assert sorted(entry['key'] for entry in cache.entries()) == ['a', 'c']
+
+def test_shrink_frees_oldest_entries(tmp_path):
+    cache = ArtifactCache(tmp_path / 'cache', 1000)
+    for index, key in enumerate(('a', 'b', 'c')):
+        cache.put(key, [artifact(tmp_path, f'{key}.zip', 100)], {})
+        touch(cache, key, 1000 + index)
+    assert cache.shrink(150) == 200
+    assert [entry['key'] for entry in cache.entries()] == ['c']
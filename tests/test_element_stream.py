@@ -0,0 +1,118 @@
+"""Lecture en flux et première passe des exports Element"""
+
+import io
+import json
+
+import pytest
+
+import element_stream
+from element_stream import ExportReader, iter_export_stream, iter_posts, scan_export
+
+
+def message(event_id, ts, body=None, relates_to=None, sender='@alice:example.org'):
+    """Événement m.room.message"""
+    content = {'msgtype': 'm.text', 'body': body or event_id}
+    if relates_to:
+        content['m.relates_to'] = relates_to
+    return {'type': 'm.room.message', 'event_id': event_id, 'sender': sender,
+            'origin_server_ts': ts, 'content': content}
+
+def reply(event_id, ts, root):
+    """Réponse dans le thread de root"""
+    return message(event_id, ts, relates_to={'rel_type': 'm.thread', 'event_id': root})
+
+def edit(event_id, ts, target, body):
+    """Édition de target (nouveau texte body)"""
+    event = message(event_id, ts, f'* {body}', {'rel_type': 'm.replace', 'event_id': target})
+    event['content']['m.new_content'] = {'msgtype': 'm.text', 'body': body}
+    return event
+
+def redaction(event_id, ts, target):
+    """Suppression de target"""
+    return {'type': 'm.room.redaction', 'event_id': event_id, 'sender': '@alice:example.org',
+            'origin_server_ts': ts, 'redacts': target}
+
+@pytest.fixture
+def export(tmp_path):
+    """Écrire un export Element, retourne son chemin"""
+    def write(events, **meta):
+        path = tmp_path / 'export.json'
+        path.write_text(json.dumps({'room_name': 'Général', **meta, 'messages': events}))
+        return path
+    return write
+
+def test_reader_reads_values_across_blocks(monkeypatch):
+    monkeypatch.setattr(element_stream, 'READ_SIZE', 7)
+    data = json.dumps({'room_name': 'é' * 20, 'messages': [{'n': 12345}, {'n': 6}]}).encode()
+    meta = {}
+    assert list(iter_export_stream(io.BytesIO(data), meta)) == [{'n': 12345}, {'n': 6}]
+    assert meta['room_name'] == 'é' * 20
+
+def test_reader_accepts_bare_event_list():
+    assert list(iter_export_stream(io.BytesIO(b' [{"a": 1}, {"a": 2}] '))) == [{'a': 1}, {'a': 2}]
+
+def test_reader_rejects_truncated_export():
+    with pytest.raises(ValueError):
+        list(iter_export_stream(io.BytesIO(b'{"messages": [{"body": "abc')))
+
+def test_reader_fails_fast_on_malformed_value(monkeypatch):
+    monkeypatch.setattr(element_stream, 'READ_SIZE', 64)
+    monkeypatch.setattr(element_stream, 'MAX_TOKEN_SIZE', 256)
+    fp = io.BytesIO(b'{"messages": [{"body": x' + b' ' * 100000 + b'}]}')
+    reader = ExportReader(fp)
+    reader.expect('{')
+    reader.value()
+    reader.expect(':')
+    reader.expect('[')
+    with pytest.raises(ValueError):
+        reader.value()
+    assert reader.bytes_read < 1024
+
+def test_scan_keeps_latest_edit(export):
+    path = export([message('$a', 1, 'v1'), edit('$e2', 3, '$a', 'v3'), edit('$e1', 2, '$a', 'v2')])
+    scan = scan_export(path)
+    assert scan['edits'] == {'$a': (3, 'v3')}
+    assert [post['message'] for post in iter_posts(path, scan, 'team')] == ['v3']
+
+def test_scan_counts_thread_replies(export):
+    path = export([message('$root', 1), reply('$r1', 2, '$root'), reply('$r2', 5, '$root'), message('$b', 6)])
+    scan = scan_export(path)
+    assert scan['reply_counts'] == {'$root': 2}
+    assert scan['thread_last_ts'] == {'$root': 5}
+    posts = list(iter_posts(path, scan, 'team'))
+    assert [(post['message'], [r['message'] for r in post.get('replies', [])]) for post in posts] == [
+        ('$root', ['$r1', '$r2']), ('$b', [])]
+
+def test_redacted_messages_are_skipped(export):
+    path = export([message('$a', 1), message('$b', 2), redaction('$x', 3, '$a')])
+    scan = scan_export(path)
+    assert scan['redacted'] == {'$a'}
+    assert [post['message'] for post in iter_posts(path, scan, 'team')] == ['$b']
+
+def test_redacted_reply_closes_its_thread(export):
+    path = export([message('$root', 1), reply('$r1', 2, '$root'), reply('$r2', 3, '$root'),
+                   redaction('$x', 4, '$r2'), message('$b', 5)])
+    scan = scan_export(path)
+    posts = iter_posts(path, scan, 'team')
+    root = next(posts)
+    # Racine émise dès la réponse supprimée, avant le message suivant
+    assert root['message'] == '$root'
+    assert [r['message'] for r in root['replies']] == ['$r1']
+    assert [post['message'] for post in posts] == ['$b']
+
+def test_incremental_keeps_messages_of_the_watermark_millisecond(export):
+    first = scan_export(export([message('$a', 1), message('$b', 2)]))
+    assert (first['last_ts'], first['last_ids']) == (2, ['$b'])
+    room = element_stream.watermark(first)
+    path = export([message('$a', 1), message('$b', 2), message('$c', 2), message('$d', 3)])
+    scan = scan_export(path)
+    scan['since'], scan['since_ids'] = room['last_ts'], room['last_ids']
+    assert [post['message'] for post in iter_posts(path, scan, 'team')] == ['$c', '$d']
+    assert element_stream.watermark(scan) == {'last_ts': 3, 'last_ids': ['$d']}
+
+def test_watermark_merges_ids_of_the_same_millisecond(export):
+    path = export([message('$a', 1), message('$b', 2), message('$c', 2)])
+    scan = scan_export(path)
+    scan['since'], scan['since_ids'] = 2, ['$b']
+    assert [post['message'] for post in iter_posts(path, scan, 'team')] == ['$c']
+    assert element_stream.watermark(scan) == {'last_ts': 2, 'last_ids': ['$b', '$c']}
@@ -0,0 +1,55 @@
+"""Archives d'import: pièces jointes dédupliquées et liées"""
+
+import json
+import os
+import zipfile
+
+import import_archive
+from import_archive import build_import_archive, stage_media
+
+
+def test_identical_media_are_staged_once_by_hard_link(tmp_path):
+    media = tmp_path / 'media'
+    media.mkdir()
+    (media / 'a.jpg').write_bytes(b'image')
+    (media / 'b.jpg').write_bytes(b'image')
+    (media / 'c.txt').write_bytes(b'texte')
+    paths, sources, stats = stage_media(media, ['a.jpg', 'b.jpg', 'c.txt'], stage_dir=tmp_path / 'staged')
+    assert paths['a.jpg'] == paths['b.jpg'] != paths['c.txt']
+    assert (stats['media_files'], stats['media_duplicates']) == (2, 1)
+    staged = sources[paths['a.jpg']]
+    assert staged.startswith(str(tmp_path / 'staged'))
+    assert os.stat(staged).st_ino == os.stat(media / 'a.jpg').st_ino
+
+def test_staging_copies_across_filesystems(tmp_path, monkeypatch):
+    def cross_device(source, target):
+        raise OSError(18, 'Invalid cross-device link')
+
+    monkeypatch.setattr(import_archive.os, 'link', cross_device)
+    (tmp_path / 'a.jpg').write_bytes(b'image')
+    _, sources, _ = stage_media(tmp_path, ['a.jpg'], stage_dir=tmp_path / 'staged')
+    staged = next(iter(sources.values()))
+    assert open(staged, 'rb').read() == b'image'
+    assert os.stat(staged).st_ino != os.stat(tmp_path / 'a.jpg').st_ino
+
+def test_import_archive_rewrites_attachment_paths(tmp_path):
+    media = tmp_path / 'mattermost_data'
+    media.mkdir()
+    (media / 'a.jpg').write_bytes(b'image')
+    (media / 'b.jpg').write_bytes(b'image')
+    lines = [
+        {'type': 'post', 'post': {'message': 'a', 'attachments': [{'path': 'mattermost_data/a.jpg'}],
+                                  'replies': [{'message': 'b', 'attachments': [{'path': 'b.jpg'}]}]}},
+        {'type': 'post', 'post': {'message': 'c', 'attachments': [{'path': 'absent.jpg'}]}}
+    ]
+    jsonl = tmp_path / 'import.jsonl'
+    jsonl.write_text(''.join(json.dumps(line) + '\n' for line in lines))
+    stats = build_import_archive(tmp_path / 'import.zip', jsonl, media, stage_dir=tmp_path / 'staged')
+    assert (stats['media_files'], stats['media_duplicates'], stats['media_unresolved']) == (1, 1, 1)
+
+    with zipfile.ZipFile(tmp_path / 'import.zip') as archive:
+        posts = [json.loads(text) for text in archive.read('import.jsonl').decode().splitlines()]
+        path = posts[0]['post']['attachments'][0]['path']
+        assert posts[0]['post']['replies'][0]['attachments'][0]['path'] == path
+        assert posts[1]['post']['attachments'][0]['path'] == 'absent.jpg'
+        assert [name for name in archive.namelist() if name.startswith('data/')] == [f'data/{path}']
@@ -0,0 +1,33 @@
+"""Index des imports: watermark des salons"""
+
+import sqlite3
+
+from import_index import ImportIndex
+
+
+def room(last_ts, last_ids):
+    """Entrée de salon produite par le convertisseur"""
+    return {'rooms': {'!r': {'room_name': 'Général', 'channel': 'general', 'last_ts': last_ts,
+                             'last_ids': last_ids}}}
+
+def test_watermark_ids_are_merged_at_the_same_timestamp(tmp_path):
+    index = ImportIndex(tmp_path / 'index.db')
+    index.record('team', room(2, ['$b']))
+    index.record('team', room(2, ['$c']))
+    assert index.snapshot('team')['rooms']['!r'] == {'channel': 'general', 'last_ts': 2, 'last_ids': ['$b', '$c']}
+    # Le watermark ne recule jamais
+    index.record('team', room(1, ['$a']))
+    assert index.snapshot('team')['rooms']['!r']['last_ids'] == ['$b', '$c']
+    index.record('team', room(3, ['$d']))
+    assert index.snapshot('team')['rooms']['!r'] == {'channel': 'general', 'last_ts': 3, 'last_ids': ['$d']}
+
+def test_index_without_watermark_ids_is_migrated(tmp_path):
+    path = tmp_path / 'index.db'
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE rooms (team TEXT NOT NULL, room_key TEXT NOT NULL, room_name TEXT, '
+                 'channel TEXT NOT NULL, last_ts INTEGER NOT NULL DEFAULT 0, imported_at TEXT, '
+                 'PRIMARY KEY (team, room_key))')
+    conn.execute("INSERT INTO rooms VALUES ('team', '!r', 'Général', 'general', 2, NULL)")
+    conn.commit()
+    conn.close()
+    assert ImportIndex(path).snapshot('team')['rooms']['!r'] == {'channel': 'general', 'last_ts': 2, 'last_ids': None}
@@ -0,0 +1,68 @@
+"""Import des shards au fil de la conversion: ordre, arrêt et erreurs"""
+
+import threading
+
+import pytest
+
+from import_pipeline import ShardPipeline
+
+
+def shard(index):
+    """Shard converti"""
+    return {'index': index, 'path': f'import-{index}.zip', 'posts': 10, 'bytes': 100}
+
+def test_shards_imported_in_order():
+    imported = []
+    pipeline = ShardPipeline(lambda shard: imported.append(shard['index']) or {'mmctl_job': shard['index']})
+    for index in range(3):
+        pipeline.add(shard(index))
+    pipeline.close()
+    assert imported == [0, 1, 2]
+    assert [(s['status'], s['mmctl_job']) for s in pipeline.shards()] == [('imported', i) for i in range(3)]
+
+def test_import_error_skips_following_shards():
+    def import_shard(shard):
+        if shard['index'] == 1:
+            raise RuntimeError('import refusé')
+
+    pipeline = ShardPipeline(import_shard)
+    for index in range(3):
+        pipeline.add(shard(index))
+    with pytest.raises(RuntimeError, match='import refusé'):
+        pipeline.close()
+    assert [s['status'] for s in pipeline.shards()] == ['imported', 'error', 'skipped']
+
+def test_abort_skips_pending_shards():
+    started = threading.Event()
+    release = threading.Event()
+
+    def import_shard(shard):
+        started.set()
+        release.wait(5)
+
+    pipeline = ShardPipeline(import_shard)
+    pipeline.add(shard(0))
+    started.wait(5)
+    pipeline.add(shard(1))
+    pipeline.abort(ValueError('conversion interrompue'))
+    release.set()
+    # Le shard en cours se termine, le suivant n'est pas importé; close() lève l'erreur de conversion
+    with pytest.raises(ValueError, match='conversion interrompue'):
+        pipeline.close()
+    assert [s['status'] for s in pipeline.shards()] == ['imported', 'skipped']
+
+def test_first_error_is_kept():
+    pipeline = ShardPipeline(lambda shard: None)
+    pipeline.abort(ValueError('première'))
+    pipeline.abort(ValueError('seconde'))
+    with pytest.raises(ValueError, match='première'):
+        pipeline.close()
+
+def test_on_change_receives_copies():
+    states = []
+    pipeline = ShardPipeline(lambda shard: None, on_change=lambda shards: states.append(shards))
+    pipeline.add(shard(0))
+    pipeline.close()
+    assert [shards[0]['status'] for shards in states] == ['converted', 'importing', 'imported']
+    states[-1][0]['status'] = 'modifié'
+    assert pipeline.shards()[0]['status'] == 'imported'
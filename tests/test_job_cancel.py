@@ -0,0 +1,51 @@
+"""Annulation d'un job: en file d'attente ou en cours"""
+
+import io
+import time
+
+from conftest import element_export, wait_job
+
+
+def start_job(client):
+    """Job d'un salon, retourne son ID"""
+    response = client.post('/api/upload', content_type='multipart/form-data', data={
+        'file': (io.BytesIO(element_export()), 'export.json'), 'team': 'équipe'})
+    assert response.status_code == 200
+    return response.get_json()['job_id']
+
+def wait_stage(client, job_id, stage, timeout=30):
+    """Attendre qu'un job atteigne l'étape stage"""
+    deadline = time.time() + timeout
+    while client.get(f'/api/job/{job_id}').get_json().get('stage') != stage:
+        assert time.time() < deadline, f'Job {job_id} jamais à l\'étape {stage}'
+        time.sleep(0.05)
+
+def test_cancel_queued_and_running_jobs(client, web, monkeypatch):
+    # Imports de 30 s: les deux workers de l'ordonnanceur restent occupés
+    monkeypatch.setenv('MMCTL_STUB_SECONDS', '30')
+    running = [start_job(client) for _ in range(web.app.config['SCHEDULER_WORKERS'])]
+    # Étape mmctl: import en cours, ou en attente du créneau mmctl (un seul par défaut)
+    for job_id in running:
+        wait_stage(client, job_id, 'mmctl')
+    queued = start_job(client)
+    assert client.get(f'/api/job/{queued}').get_json()['status'] == 'queued'
+
+    response = client.delete(f'/api/job/{queued}')
+    assert (response.status_code, response.get_json()['status']) == (200, 'canceled')
+    assert web.get_scheduler().position(queued) is None
+
+    started = time.time()
+    for job_id in running:
+        response = client.delete(f'/api/job/{job_id}')
+        assert (response.status_code, response.get_json()['status']) == (202, 'canceling')
+    for job_id in running:
+        assert wait_job(client, job_id)['status'] == 'canceled'
+    # Imports interrompus, sans attendre leur fin
+    assert time.time() - started < 20
+
+def test_cancel_finished_or_unknown_job(client):
+    job_id = start_job(client)
+    assert wait_job(client, job_id)['status'] == 'completed'
+    response = client.delete(f'/api/job/{job_id}')
+    assert (response.status_code, response.get_json()['status']) == (409, 'completed')
+    assert client.delete('/api/job/inconnu').status_code == 404
@@ -0,0 +1,82 @@
+"""Points de reprise: première étape incomplète dans chaque état du job"""
+
+from job_checkpoint import JobCheckpoint
+
+
+def converted(job_dir, shards=2):
+    """Job converti et archivé en shards archives présentes sur disque"""
+    checkpoint = JobCheckpoint(job_dir)
+    checkpoint.mark('uploaded', file='export.json')
+    checkpoint.mark('converted', stats={'messages': 10})
+    archives = []
+    for index in range(shards):
+        path = job_dir / f'import-{index}.zip'
+        path.write_bytes(b'zip')
+        archives.append({'index': index, 'path': str(path), 'posts': 5, 'bytes': 3})
+    checkpoint.archive(archives)
+    return checkpoint
+
+def test_new_job_resumes_at_upload(tmp_path):
+    assert JobCheckpoint(tmp_path).resume_stage() == 'uploaded'
+
+def test_uploaded_job_resumes_at_conversion(tmp_path):
+    checkpoint = JobCheckpoint(tmp_path)
+    checkpoint.mark('uploaded', file='export.json')
+    assert checkpoint.resume_stage() == 'converted'
+
+def test_script_mode_archives_converted_jsonl(tmp_path):
+    checkpoint = JobCheckpoint(tmp_path)
+    checkpoint.mark('uploaded', file='export.json')
+    checkpoint.mark('converted', output='import.jsonl')
+    assert checkpoint.resume_stage() == 'converted'
+    (tmp_path / 'import.jsonl').write_text('{}\n')
+    assert checkpoint.resume_stage() == 'archived'
+
+def test_missing_archive_redoes_conversion(tmp_path):
+    checkpoint = converted(tmp_path)
+    (tmp_path / 'import-1.zip').unlink()
+    assert checkpoint.archives() is None
+    assert checkpoint.resume_stage() == 'converted'
+
+def test_shards_submitted_then_imported(tmp_path):
+    checkpoint = converted(tmp_path)
+    assert checkpoint.resume_stage() == 'submitted'
+    checkpoint.submit(0, 'job0')
+    assert checkpoint.resume_stage() == 'submitted'
+    checkpoint.submit(1, 'job1')
+    assert checkpoint.resume_stage() == 'imported'
+    checkpoint.done(0)
+    checkpoint.done(1)
+    assert checkpoint.resume_stage() is None
+
+def test_state_survives_restart(tmp_path):
+    checkpoint = converted(tmp_path)
+    checkpoint.submit(0, 'job0')
+    checkpoint.done(0)
+    reloaded = JobCheckpoint(tmp_path)
+    assert reloaded.imported(0)
+    assert reloaded.submitted(0) == 'job0'
+    assert reloaded.resume_stage() == 'submitted'
+
+def test_canceled_import_resubmits_shard(tmp_path):
+    checkpoint = converted(tmp_path)
+    checkpoint.submit(0, 'job0')
+    checkpoint.done(0)
+    checkpoint.submit(1, 'job1')
+    # Annulation pendant l'import du shard 1: le job mmctl annulé est oublié
+    checkpoint.submit(1, None)
+    assert checkpoint.resume_stage() == 'submitted'
+    assert JobCheckpoint(tmp_path).submitted(1) is None
+
+def test_cancel_during_conversion_then_retry(tmp_path):
+    checkpoint = converted(tmp_path)
+    checkpoint.submit(0, 'job0')
+    # Annulation: sorties partielles supprimées (remove_partial_artifacts)
+    checkpoint.clear('converted', 'archived')
+    assert checkpoint.resume_stage() == 'converted'
+
+    # Reprise: conversion refaite, les shards précédents ne comptent plus
+    checkpoint.clear('converted', 'archived', 'submitted', 'imported')
+    checkpoint = converted(tmp_path)
+    assert checkpoint.submitted(0) is None
+    assert checkpoint.resume_stage() == 'submitted'
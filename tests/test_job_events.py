@@ -0,0 +1,54 @@
+"""Flux SSE d'un job: état, lignes de log numérotées, reprise par Last-Event-ID"""
+
+import io
+import json
+
+from conftest import element_export, wait_job
+
+
+def run_job(client):
+    """Job terminé (un salon), retourne son ID"""
+    response = client.post('/api/upload', content_type='multipart/form-data', data={
+        'file': (io.BytesIO(element_export()), 'export.json'), 'team': 'équipe'})
+    job_id = response.get_json()['job_id']
+    assert wait_job(client, job_id)['status'] == 'completed'
+    return job_id
+
+def read_events(response):
+    """Événements SSE d'une réponse: liste de (type, id, données)"""
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        fields = {}
+        for line in block.splitlines():
+            if line and not line.startswith(':'):
+                name, _, value = line.partition(': ')
+                fields[name] = value
+        if 'event' in fields:
+            events.append((fields['event'], fields.get('id'), json.loads(fields['data'])))
+    return events
+
+def test_stream_sends_state_logs_and_end(client):
+    job_id = run_job(client)
+    response = client.get(f'/api/job/{job_id}/events')
+    assert response.mimetype == 'text/event-stream'
+    events = read_events(response)
+    assert events[0][0] == 'job' and events[0][2]['status'] == 'completed'
+    assert events[-1] == ('end', None, {'status': 'completed'})
+    lines = [int(event_id) for kind, event_id, data in events if kind == 'log']
+    assert lines == list(range(1, len(lines) + 1))
+
+def test_last_event_id_resumes_after_cursor(client):
+    job_id = run_job(client)
+    logs = [event for event in read_events(client.get(f'/api/job/{job_id}/events')) if event[0] == 'log']
+    cursor = int(logs[2][1])
+    resumed = read_events(client.get(f'/api/job/{job_id}/events', headers={'Last-Event-ID': str(cursor)}))
+    assert [event for event in resumed if event[0] == 'log'] == logs[3:]
+    # Le paramètre since est équivalent (premier flux, sans en-tête)
+    since = read_events(client.get(f'/api/job/{job_id}/events?since={cursor}'))
+    assert [event for event in since if event[0] == 'log'] == logs[3:]
+
+def test_unknown_job_and_invalid_cursor(client):
+    assert client.get('/api/job/inconnu/events').status_code == 404
+    job_id = run_job(client)
+    response = client.get(f'/api/job/{job_id}/events', headers={'Last-Event-ID': 'abc'})
+    assert response.status_code == 400
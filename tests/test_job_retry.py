@@ -0,0 +1,54 @@
+"""Reprise d'un job en erreur ou annulé (checkpoint.json)"""
+
+import io
+import shutil
+import time
+from pathlib import Path
+
+from conftest import element_export, wait_job
+
+
+def failed_job(client, monkeypatch):
+    """Job dont l'import mmctl échoue, retourne son ID (imports réussis ensuite)"""
+    monkeypatch.setenv('MMCTL_STUB_FAIL', '1')
+    response = client.post('/api/upload', content_type='multipart/form-data', data={
+        'file': (io.BytesIO(element_export()), 'export.json'), 'team': 'équipe'})
+    job_id = response.get_json()['job_id']
+    assert wait_job(client, job_id)['status'] == 'error'
+    monkeypatch.setenv('MMCTL_STUB_FAIL', '0')
+    return job_id
+
+def test_retry_resumes_failed_job(client, monkeypatch):
+    job_id = failed_job(client, monkeypatch)
+    response = client.post(f'/api/job/{job_id}/retry', json={})
+    assert response.status_code == 200
+    # Conversion et archive déjà faites: seul l'import mmctl est refait
+    assert response.get_json()['resume_stage'] == 'submitted'
+    job = wait_job(client, job_id)
+    assert job['status'] == 'completed'
+    assert job['attempts'] == 2
+
+    response = client.post(f'/api/job/{job_id}/retry', json={})
+    assert (response.status_code, response.get_json()['status']) == (409, 'completed')
+
+def test_retry_resumes_canceled_job(client, monkeypatch):
+    monkeypatch.setenv('MMCTL_STUB_SECONDS', '30')
+    response = client.post('/api/upload', content_type='multipart/form-data', data={
+        'file': (io.BytesIO(element_export()), 'export.json'), 'team': 'équipe'})
+    job_id = response.get_json()['job_id']
+    deadline = time.time() + 30
+    while client.get(f'/api/job/{job_id}').get_json().get('stage') != 'mmctl':
+        assert time.time() < deadline
+        time.sleep(0.05)
+    client.delete(f'/api/job/{job_id}')
+    assert wait_job(client, job_id)['status'] == 'canceled'
+
+    monkeypatch.setenv('MMCTL_STUB_SECONDS', '0.2')
+    assert client.post(f'/api/job/{job_id}/retry', json={}).status_code == 200
+    assert wait_job(client, job_id)['status'] == 'completed'
+
+def test_retry_without_job_files(client, web, monkeypatch):
+    job_id = failed_job(client, monkeypatch)
+    shutil.rmtree(Path(web.get_job_store().get(job_id)['file_path']).parent)
+    assert client.post(f'/api/job/{job_id}/retry', json={}).status_code == 410
+    assert client.post('/api/job/inconnu/retry', json={}).status_code == 404
@@ -0,0 +1,63 @@
+"""Stockage des jobs: mise à jour, curseur des logs et créneaux d'étape"""
+
+import pytest
+
+from job_store import MemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    """Les deux stockages, avec un tampon de 3 lignes de log"""
+    if request.param == 'memory':
+        return MemoryJobStore(max_logs=3)
+    return SQLiteJobStore(tmp_path / 'jobs.db', max_logs=3)
+
+def test_update_returns_previous_status(store):
+    store.create('job', {'status': 'queued', 'team': 'équipe', 'progress': 0})
+    assert store.update('job', status='running', stage='convert', stats={'messages': 3}) == 'queued'
+    assert store.update('job', progress=50) == 'running'
+    job = store.get('job')
+    assert (job['status'], job['progress'], job['stage'], job['stats']) == ('running', 50, 'convert', {'messages': 3})
+    assert store.status('job') == 'running'
+    assert store.update('inconnu', status='error') is None
+
+def test_log_cursor(store):
+    store.create('job', {'status': 'running'})
+    for index in range(1, 6):
+        store.add_log('job', 'info', f'ligne {index}')
+    job = store.get('job')
+    # Tampon de 3 lignes: les deux premières n'y sont plus
+    assert [log['line'] for log in job['logs']] == [3, 4, 5]
+    assert job['log_lines'] == 5
+    assert [log['message'] for log in store.get('job', since=4)['logs']] == ['ligne 5']
+    assert store.get('job', since=5)['logs'] == []
+
+def test_list_and_delete(store):
+    store.create('a', {'status': 'completed', 'team': 'x'})
+    store.create('b', {'status': 'error', 'team': 'y'})
+    store.add_log('b', 'error', 'échec')
+    assert [job['id'] for job in store.list(team='y')] == ['b']
+    assert [job['id'] for job in store.list(status='completed')] == ['a']
+    store.delete('b')
+    assert store.get('b') is None
+    assert store.status('b') is None
+
+def test_stage_slots(store):
+    assert store.acquire_slot('mmctl', 1, 'hôte:1') == 0
+    assert store.acquire_slot('mmctl', 1, 'hôte:2') is None
+    assert store.acquire_slot('convert', 2, 'hôte:2') == 0
+    # Créneau d'un processus arrêté: repris
+    assert store.acquire_slot('mmctl', 1, 'hôte:2', alive=lambda owner: owner != 'hôte:1') == 0
+    store.release_slot('mmctl', 0, 'hôte:1')
+    assert store.acquire_slot('mmctl', 1, 'hôte:3') is None
+    store.release_slot('mmctl', 0, 'hôte:2')
+    assert store.acquire_slot('mmctl', 1, 'hôte:3') == 0
+
+def test_sqlite_store_shared_between_instances(tmp_path):
+    first = SQLiteJobStore(tmp_path / 'jobs.db')
+    second = SQLiteJobStore(tmp_path / 'jobs.db')
+    first.create('job', {'status': 'queued'})
+    second.update('job', status='canceling')
+    assert first.status('job') == 'canceling'
+    assert first.acquire_slot('mmctl', 1, 'a') == 0
+    assert second.acquire_slot('mmctl', 1, 'b') is None
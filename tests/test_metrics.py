@@ -0,0 +1,60 @@
+"""Métriques Prometheus: cumul entre workers par le stockage des jobs, endpoint /metrics"""
+
+import io
+
+from conftest import element_export, wait_job
+from job_store import SQLiteJobStore
+from metrics import MetricsRegistry
+
+
+def registry(store):
+    """Métriques d'un worker: un compteur étiqueté et un histogramme"""
+    metrics = MetricsRegistry(store=lambda: store)
+    return (metrics, metrics.counter('jobs_total', 'Jobs', ['status']),
+            metrics.histogram('duration_seconds', 'Durées', ['stage'], buckets=(1, 10)))
+
+def test_counters_are_summed_across_workers(tmp_path):
+    # Deux workers gunicorn: deux connexions à la même base
+    first, first_jobs, first_duration = registry(SQLiteJobStore(tmp_path / 'jobs.db'))
+    second, second_jobs, second_duration = registry(SQLiteJobStore(tmp_path / 'jobs.db'))
+    first_jobs.inc(status='completed')
+    second_jobs.inc(2, status='completed')
+    second_jobs.inc(status='error')
+    first_duration.observe(0.5, stage='convert')
+    second_duration.observe(5, stage='convert')
+    text = first.render()
+    assert text == second.render()
+    assert 'jobs_total{status="completed"} 3\n' in text
+    assert 'jobs_total{status="error"} 1\n' in text
+    assert 'duration_seconds_bucket{stage="convert",le="1"} 1\n' in text
+    assert 'duration_seconds_bucket{stage="convert",le="10"} 2\n' in text
+    assert 'duration_seconds_bucket{stage="convert",le="+Inf"} 2\n' in text
+    assert 'duration_seconds_sum{stage="convert"} 5.5\n' in text
+    assert 'duration_seconds_count{stage="convert"} 2\n' in text
+
+def test_shared_and_local_histograms_render_alike(tmp_path):
+    _, _, shared_duration = registry(SQLiteJobStore(tmp_path / 'jobs.db'))
+    local_duration = MetricsRegistry().histogram('duration_seconds', 'Durées', ['stage'], buckets=(1, 10))
+    for value, stage in ((0.5, 'convert'), (30, 'mmctl'), (3, 'convert')):
+        shared_duration.observe(value, stage=stage)
+        local_duration.observe(value, stage=stage)
+    assert shared_duration.render() == local_duration.render()
+
+def test_metrics_endpoint_counts_jobs(client):
+    def value(text, series):
+        line = next((line for line in text.splitlines() if line.startswith(series + ' ')), None)
+        return float(line.split()[-1]) if line else 0
+
+    before = client.get('/metrics').get_data(as_text=True)
+    data = element_export()
+    response = client.post('/api/upload', content_type='multipart/form-data', data={
+        'file': (io.BytesIO(data), 'export.json'), 'team': 'équipe'})
+    wait_job(client, response.get_json()['job_id'])
+    response = client.get('/metrics')
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    after = response.get_data(as_text=True)
+    assert value(after, 'element_import_jobs_total{status="completed"}') == \
+        value(before, 'element_import_jobs_total{status="completed"}') + 1
+    assert value(after, 'element_import_uploaded_bytes_total') == \
+        value(before, 'element_import_uploaded_bytes_total') + len(data)
+    assert 'element_import_stage_waiting{stage="convert",worker="' in after
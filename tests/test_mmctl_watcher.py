@@ -0,0 +1,61 @@
+"""Suivi des imports mmctl avec le mmctl simulé (mmctl_stub.py)"""
+
+import subprocess
+import threading
+
+import pytest
+
+from mmctl_watcher import ImportStalled, MmctlWatcher, parse_job_id
+
+
+def submit(tmp_path):
+    """Créer un import mmctl simulé, retourne son ID"""
+    archive = tmp_path / 'import.zip'
+    archive.write_bytes(b'zip')
+    result = subprocess.run(['mmctl', '--local', 'import', 'process', '--bypass-upload', str(archive)],
+                            capture_output=True, text=True, check=True)
+    return parse_job_id(result.stdout)
+
+def test_wait_returns_final_job(mmctl, tmp_path):
+    job_id = submit(tmp_path)
+    updates = []
+    watcher = MmctlWatcher(min_interval=0.1, max_interval=0.2)
+    job = watcher.wait(job_id, timeout=10, on_update=lambda job: updates.append(job['status']))
+    assert job['status'] == 'success'
+    assert updates[-1] == 'success'
+    assert watcher.watched() == []
+
+def test_short_waiter_does_not_stop_long_waiter(mmctl, tmp_path):
+    job_id = submit(tmp_path)
+    watcher = MmctlWatcher(min_interval=0.1, max_interval=0.2)
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault('job', watcher.wait(job_id, timeout=10)))
+    thread.start()
+    assert watcher.wait(job_id, timeout=0.1) is None
+    thread.join()
+    assert result['job']['status'] == 'success'
+    assert watcher.watched() == []
+
+def test_unknown_job_does_not_block_others(mmctl, tmp_path):
+    job_id = submit(tmp_path)
+    watcher = MmctlWatcher(min_interval=0.1, max_interval=0.2)
+    ghost = threading.Thread(target=watcher.wait, args=('inconnu',), kwargs={'timeout': 2})
+    ghost.start()
+    assert watcher.wait(job_id, timeout=10)['status'] == 'success'
+    ghost.join()
+
+def test_cancel_token_interrupts_wait(mmctl, tmp_path):
+    job_id = submit(tmp_path)
+    watcher = MmctlWatcher(min_interval=0.1, max_interval=0.2)
+    cancel = threading.Event()
+    cancel.set()
+    assert watcher.wait(job_id, timeout=10, cancel=cancel) is None
+
+def test_stalled_import_raises(mmctl, tmp_path, monkeypatch):
+    monkeypatch.setenv('MMCTL_STUB_HANG', '1')
+    job_id = submit(tmp_path)
+    watcher = MmctlWatcher(min_interval=0.1, max_interval=0.2)
+    with pytest.raises(ImportStalled) as error:
+        watcher.wait(job_id, timeout=10, stall_timeout=0.5)
+    assert isinstance(error.value, subprocess.TimeoutExpired)
+    assert error.value.job['status'] == 'in_progress'
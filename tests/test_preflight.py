@@ -0,0 +1,63 @@
+"""Analyse préalable: exports mal formés, refus des exports illisibles"""
+
+import io
+import json
+
+from conftest import element_export, wait_job
+from element_stream import scan_export
+from preflight import analyze_paths, estimate, throughput
+
+
+def malformed_export(tmp_path):
+    """Export lisible contenant des événements mal formés"""
+    events = [
+        'pas un événement',
+        42,
+        {'type': 'm.room.message', 'event_id': '$a', 'sender': '@alice:example.org', 'origin_server_ts': 1,
+         'content': 'texte brut'},
+        {'type': 'm.room.message', 'event_id': '$b', 'sender': 7, 'origin_server_ts': [2],
+         'content': {'msgtype': 'm.text', 'body': 123, 'm.relates_to': 'x'}},
+        {'type': 'm.room.message', 'event_id': '$c', 'sender': '@bob:example.org', 'origin_server_ts': 3,
+         'content': {'msgtype': 'm.text', 'body': 'ok'}}
+    ]
+    path = tmp_path / 'export.json'
+    path.write_text(json.dumps({'room_name': 'Général', 'messages': events}))
+    return path
+
+def test_malformed_events_are_skipped_or_coerced(tmp_path):
+    path = malformed_export(tmp_path)
+    analysis = analyze_paths([path])
+    assert (analysis['events'], analysis['messages'], analysis['senders']) == (3, 2, 2)
+    scan = scan_export(path)
+    assert sorted(scan['users']) == ['7', '@bob:example.org']
+
+def test_estimate_splits_into_shards():
+    analysis = {'bytes': 10_000_000, 'events': 120_000, 'messages': 100_000, 'rooms': []}
+    plan = estimate(analysis, throughput([]), shard_posts=30_000)
+    assert plan['plan']['shard_posts'] == 30_000
+    assert plan['plan']['shards'] == 4
+
+def test_upload_returns_preflight(client):
+    response = client.post('/api/upload', content_type='multipart/form-data', data={
+        'file': (io.BytesIO(element_export(messages=5)), 'export.json'), 'team': 'équipe'})
+    preflight = response.get_json()['preflight']
+    assert (preflight['analysis']['events'], preflight['analysis']['messages']) == (5, 5)
+    assert preflight['plan']['shards'] == 1
+    wait_job(client, response.get_json()['job_id'])
+
+def test_unreadable_upload_is_rejected_and_removed(client, web):
+    before = set(web.UPLOAD_FOLDER.iterdir())
+    response = client.post('/api/upload', content_type='multipart/form-data', data={
+        'file': (io.BytesIO(b'{"messages": [{"type": '), 'export.json'), 'team': 'équipe'})
+    assert response.status_code == 400
+    assert 'illisible' in response.get_json()['error']
+    assert set(web.UPLOAD_FOLDER.iterdir()) == before
+
+def test_unreadable_chunked_upload_is_rejected_at_finalize(client, web):
+    data = b'PK\x03\x04 archive tronquee'
+    upload_id = client.post('/api/uploads', json={'filename': 'salons.zip', 'size': len(data)}).get_json()['upload_id']
+    client.patch(f'/api/uploads/{upload_id}', data=data, headers={'Upload-Offset': '0'})
+    response = client.post(f'/api/uploads/{upload_id}/finalize', json={'team': 'équipe'})
+    assert response.status_code == 400
+    assert not (web.UPLOAD_FOLDER / upload_id).exists()
+    assert client.head(f'/api/uploads/{upload_id}').status_code == 404
@@ -0,0 +1,168 @@
+"""Uploads: envoi en une requête, par morceaux (reprise, offsets, finalisation)"""
+
+import hashlib
+import io
+import json
+import warnings
+import zipfile
+from pathlib import Path
+
+from conftest import element_export, wait_job
+
+
+def create_upload(client, data, filename='export.json'):
+    """Créer un upload par morceaux, retourne son ID"""
+    response = client.post('/api/uploads', json={'filename': filename, 'size': len(data)})
+    assert response.status_code == 201
+    return response.get_json()['upload_id']
+
+def patch(client, upload_id, chunk, offset):
+    """Envoyer un morceau à offset"""
+    return client.patch(f'/api/uploads/{upload_id}', data=chunk, headers={'Upload-Offset': str(offset)})
+
+def test_single_request_upload_runs_job(client):
+    response = client.post('/api/upload', content_type='multipart/form-data', data={
+        'file': (io.BytesIO(element_export()), 'export.json'), 'team': 'équipe'})
+    assert response.status_code == 200
+    job = wait_job(client, response.get_json()['job_id'])
+    assert job['status'] == 'completed'
+    assert job['stats']['messages'] == 3
+
+def test_api_upload_is_not_incremental_by_default(web, client):
+    for fields, incremental in (({}, False), ({'incremental': 'true'}, True)):
+        response = client.post('/api/upload', content_type='multipart/form-data', data={
+            'file': (io.BytesIO(element_export()), 'export.json'), 'team': 'équipe', **fields})
+        job_id = response.get_json()['job_id']
+        assert web.get_job_store().get(job_id)['incremental'] is incremental
+        wait_job(client, job_id)
+
+def test_upload_requires_team(client):
+    response = client.post('/api/upload', content_type='multipart/form-data', data={
+        'file': (io.BytesIO(element_export()), 'export.json')})
+    assert response.status_code == 400
+
+def test_chunked_upload_resumes_and_finalizes(client):
+    data = element_export(messages=50)
+    upload_id = create_upload(client, data)
+    assert patch(client, upload_id, data[:1000], 0).headers['Upload-Offset'] == '1000'
+
+    # Offset erroné: refusé, l'offset courant est renvoyé pour reprendre
+    response = patch(client, upload_id, data[1000:], 500)
+    assert response.status_code == 409
+    assert response.headers['Upload-Offset'] == '1000'
+    assert client.head(f'/api/uploads/{upload_id}').headers['Upload-Offset'] == '1000'
+
+    assert client.post(f'/api/uploads/{upload_id}/finalize', json={'team': 't'}).status_code == 409
+    assert patch(client, upload_id, data[1000:], 1000).status_code == 200
+
+    response = client.post(f'/api/uploads/{upload_id}/finalize', json={
+        'team': 't', 'sha256': hashlib.sha256(data).hexdigest()})
+    body = response.get_json()
+    assert body['success'] and body['sha256'] == hashlib.sha256(data).hexdigest()
+    assert wait_job(client, upload_id)['stats']['messages'] == 50
+    assert client.get(f'/api/uploads/{upload_id}').status_code == 404
+
+def test_chunked_upload_rejects_bad_checksum(client):
+    data = element_export()
+    upload_id = create_upload(client, data)
+    patch(client, upload_id, data, 0)
+    response = client.post(f'/api/uploads/{upload_id}/finalize', json={'team': 't', 'sha256': '0' * 64})
+    assert response.status_code == 422
+
+def test_chunked_upload_rejects_data_past_announced_size(client):
+    data = element_export()
+    upload_id = create_upload(client, data)
+    assert patch(client, upload_id, data + b'  ', 0).status_code == 413
+
+def test_upload_state_reloaded_from_disk(client, web):
+    data = element_export(messages=20)
+    upload_id = create_upload(client, data)
+    patch(client, upload_id, data[:700], 0)
+    # Redémarrage (ou autre worker gunicorn): état relu depuis upload.json et le fichier partiel
+    with web.uploads_lock:
+        web.uploads.pop(upload_id)
+    assert client.head(f'/api/uploads/{upload_id}').headers['Upload-Offset'] == '700'
+    patch(client, upload_id, data[700:], 700)
+    response = client.post(f'/api/uploads/{upload_id}/finalize', json={'team': 't'})
+    assert response.get_json()['sha256'] == hashlib.sha256(data).hexdigest()
+
+def test_filename_cannot_overwrite_job_state(client, web):
+    data = element_export()
+    for filename in ('upload.json', 'checkpoint.json'):
+        upload_id = create_upload(client, data, filename)
+        patch(client, upload_id, data, 0)
+        assert client.post(f'/api/uploads/{upload_id}/finalize', json={'team': 't'}).get_json()['success']
+        assert wait_job(client, upload_id)['status'] == 'completed'
+        assert (web.UPLOAD_FOLDER / upload_id / 'input' / filename).read_bytes() == data
+
+def test_chunks_written_by_another_worker(client, web):
+    data = element_export(messages=40)
+    upload_id = create_upload(client, data)
+    patch(client, upload_id, data[:500], 0)
+    # Morceau suivant écrit par un autre worker gunicorn: seul le fichier change
+    with open(web.UPLOAD_FOLDER / upload_id / 'input' / 'export.json', 'ab') as f:
+        f.write(data[500:1500])
+    assert patch(client, upload_id, data[1500:], 1500).status_code == 200
+    upload = web.uploads[upload_id]
+    # Pas de relecture depuis le début: le hash de ce worker s'est arrêté à son dernier morceau
+    assert upload['hashed'] == 500
+    response = client.post(f'/api/uploads/{upload_id}/finalize', json={'team': 't'})
+    assert response.get_json()['sha256'] == hashlib.sha256(data).hexdigest()
+
+def test_archive_upload_deduplicates_attachments(client):
+    def room(name, media):
+        event = {'type': 'm.room.message', 'event_id': f'$img-{name}', 'sender': '@alice:example.org',
+                 'origin_server_ts': 1700000000000, 'content': {'msgtype': 'm.image', 'body': media,
+                                                                'url': f'mxc://example.org/{media}'}}
+        return json.dumps({'room_name': name, 'messages': [event]})
+
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as archive:
+        archive.writestr('export/salon1.json', room('Salon 1', 'photo.jpg'))
+        archive.writestr('export/salon2.json', room('Salon 2', 'copie.jpg'))
+        archive.writestr('export/media/photo.jpg', b'image')
+        archive.writestr('export/media/copie.jpg', b'image')
+    response = client.post('/api/upload', content_type='multipart/form-data', data={
+        'file': (io.BytesIO(data.getvalue()), 'export.zip'), 'team': 'équipe'})
+    job = wait_job(client, response.get_json()['job_id'])
+    assert job['status'] == 'completed'
+    assert (job['stats']['media_files'], job['stats']['media_duplicates']) == (1, 1)
+
+def test_workspace_reservation_follows_the_job(client, web):
+    janitor = web.get_workspace_janitor()
+    # Uploads abandonnés des autres tests: réservés jusqu'à expiration
+    reserved = janitor.reserved()
+    response = client.post('/api/upload', content_type='multipart/form-data', data={
+        'file': (io.BytesIO(element_export()), 'export.json')})
+    assert response.status_code == 400
+    assert janitor.reserved() == reserved
+
+    data = element_export()
+    upload_id = create_upload(client, data)
+    patch(client, upload_id, data, 0)
+    assert janitor.reserved() == reserved + len(data) * web.app.config['WORKSPACE_EXPANSION']
+    assert client.post(f'/api/uploads/{upload_id}/finalize', json={'team': 'équipe'}).status_code == 200
+    assert wait_job(client, upload_id)['status'] == 'completed'
+    assert janitor.reserved() == reserved
+
+def test_multiple_files_report_each_room(client):
+    response = client.post('/api/upload', content_type='multipart/form-data', data={
+        'file': [(io.BytesIO(element_export(2, 'Salon 1')), 'salon1.json'),
+                 (io.BytesIO(element_export(3, 'Salon 2')), 'salon2.json')], 'team': 'équipe'})
+    assert response.status_code == 200
+    job_id = response.get_json()['job_id']
+    job = wait_job(client, job_id)
+    assert job['status'] == 'completed'
+    assert (job['rooms_done'], job['rooms_total']) == (2, 2)
+    messages = [log['message'] for log in client.get(f'/api/job/{job_id}/logs?limit=500').get_json()['logs']]
+    assert any('Salon « Salon 1 » converti' in message and '2 messages' in message for message in messages)
+    assert any('Salon « Salon 2 » converti' in message and '3 messages' in message for message in messages)
+
+def test_page_accepts_several_files(client, web):
+    page = client.get('/').get_data(as_text=True)
+    assert 'multiple onchange="handleFileSelect(event)"' in page
+    # Expressions régulières de la page: échappées dans le modèle (pas de séquence invalide)
+    assert r'/\.(json|zip)$/i' in page
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        compile(Path(web.__file__).read_text(encoding='utf-8'), web.__file__, 'exec')
@@ -0,0 +1,75 @@
+"""Nettoyage de l'espace de travail: TTL par état, quota et réservations"""
+
+import os
+import time
+import uuid
+
+import pytest
+
+from workspace_janitor import QuotaExceeded, WorkspaceJanitor
+
+
+@pytest.fixture
+def workspaces(tmp_path):
+    """Créer des dossiers de jobs (état, taille, âge en secondes); retourne le janitor et les états"""
+    states = {}
+    forgotten = []
+
+    def create(state, size=100, age=0):
+        job_id = str(uuid.uuid4())
+        path = tmp_path / job_id
+        path.mkdir()
+        (path / 'import.zip').write_bytes(b'x' * size)
+        mtime = time.time() - age
+        os.utime(path / 'import.zip', (mtime, mtime))
+        os.utime(path, (mtime, mtime))
+        states[job_id] = state
+        return job_id
+
+    def janitor(**options):
+        return WorkspaceJanitor(tmp_path, states.get, forget=forgotten.append, **options)
+
+    return create, janitor, states, forgotten
+
+def test_expired_workspaces_are_removed_by_state(workspaces, tmp_path):
+    create, janitor, _, forgotten = workspaces
+    old_done = create('completed', age=120)
+    recent_done = create('completed', age=10)
+    old_running = create('running', age=120)
+    old_error = create('error', age=120)
+    janitor(ttls={'completed': 60, 'error': 3600}).sweep()
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([recent_done, old_running, old_error])
+    assert forgotten == [old_done]
+
+def test_quota_evicts_oldest_finished_jobs_first(workspaces, tmp_path):
+    create, janitor, _, _ = workspaces
+    oldest = create('completed', size=400, age=30)
+    running = create('running', size=400, age=40)
+    newest = create('error', size=400, age=10)
+    janitor = janitor(quota_bytes=1500, expansion=1)
+    janitor.reserve(500)
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([running, newest])
+    # Seul le dossier du job en cours resterait: refus explicite
+    with pytest.raises(QuotaExceeded):
+        janitor.reserve(1200)
+    assert running in [path.name for path in tmp_path.iterdir()]
+
+def test_held_reservation_lasts_until_release_or_final_state(workspaces):
+    create, janitor, states, _ = workspaces
+    job_id = create('upload')
+    janitor = janitor(expansion=2)
+    janitor.reserve(100, key=job_id, ttl=0.01)
+    assert janitor.hold(job_id)
+    time.sleep(0.02)
+    states[job_id] = 'running'
+    assert janitor.reserved() == 200
+    states[job_id] = 'completed'
+    assert janitor.reserved() == 0
+    assert not janitor.hold(job_id)
+
+def test_unheld_reservation_expires(workspaces):
+    _, janitor, _, _ = workspaces
+    janitor = janitor()
+    janitor.reserve(100, ttl=0.01)
+    time.sleep(0.02)
+    assert janitor.reserved() == 0
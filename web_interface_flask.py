@@ -7,30 +7,197 @@ Port: 5000 (configurable)
 
 import os
 import json
+import hashlib
+import shutil
 import subprocess
 import uuid
 from datetime import datetime
 from pathlib import Path
-from flask import Flask, render_template_string, request, jsonify, send_file
+from flask import Flask, Response, render_template_string, request, jsonify, send_file
 from werkzeug.utils import secure_filename
 import threading
 import time
+import socket
+import signal
+import itertools
+import zipfile
+import io
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from artifact_cache import ArtifactCache, cache_key
+from converter_pool import ConversionStalled, ConverterPool
+from element_stream import convert_rooms
+from import_archive import build_archive, file_digest
+from import_index import ImportIndex
+from import_pipeline import ShardPipeline
+from job_scheduler import CANCEL_POLL_INTERVAL, CancelToken, JobCanceled, JobScheduler, QueueFull, PRIORITIES, SharedSlots
+from job_checkpoint import JobCheckpoint
+from job_profiler import build_bundle, profile_call
+from job_store import open_job_store
+from preflight import EVENT_BYTES, HISTORY_JOBS, analyze_paths, convert_timeout, estimate, import_timeout, throughput
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry
+from mmctl_watcher import ImportStalled, MmctlWatcher, SUCCESS_STATUSES, cancel_import_job, parse_job_id
+from workspace_janitor import QuotaExceeded, WorkspaceJanitor
 
 app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max
-app.config['UPLOAD_FOLDER'] = '/tmp/mattermost_web_imports'
+app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max par requête
+app.config['MAX_UPLOAD_SIZE'] = 5 * 1024 * 1024 * 1024  # 5GB max en upload par morceaux
+app.config['UPLOAD_CHUNK_SIZE'] = 8 * 1024 * 1024  # Taille des morceaux envoyés par le navigateur
+app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER', '/tmp/mattermost_web_imports')
 app.config['SECRET_KEY'] = os.urandom(24)
 
 # Dossier de travail
 UPLOAD_FOLDER = Path(app.config['UPLOAD_FOLDER'])
 UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
 
+# Sous-dossier des fichiers envoyés: leur nom ne peut pas écraser l'état du job
+# (upload.json, checkpoint.json, job.log, import.zip...)
+INPUT_DIR = 'input'
+# Pièces jointes extraites d'une archive uploadée (<id>/media/)
+MEDIA_DIR = 'media'
+
 # Script de conversion
-CONVERTER_SCRIPT = '/opt/mattermost/scripts/element_to_mattermost.py'
+CONVERTER_SCRIPT = os.environ.get('CONVERTER_SCRIPT', '/opt/mattermost/scripts/element_to_mattermost.py')
 IMPORT_SCRIPT = '/opt/mattermost/scripts/element-import.sh'
 
-# Stockage des jobs en mémoire (à remplacer par Redis en production)
-jobs = {}
+# Convertisseur en flux (mémoire bornée quelle que soit la taille de l'export)
+STREAM_CONVERTER_SCRIPT = str(Path(__file__).resolve().with_name('element_stream.py'))
+
+# 'stream': element_stream.py, 'script': CONVERTER_SCRIPT (ex. pour les médias --data-dir)
+app.config['CONVERSION_MODE'] = os.environ.get('CONVERSION_MODE', 'stream')
+
+# Compression de l'archive d'import: 'deflated' ou 'stored' (plus rapide à ingérer pour mmctl)
+app.config['ARCHIVE_COMPRESSION'] = os.environ.get('ARCHIVE_COMPRESSION', 'deflated')
+app.config['ARCHIVE_COMPRESSLEVEL'] = int(os.environ['ARCHIVE_COMPRESSLEVEL']) if os.environ.get('ARCHIVE_COMPRESSLEVEL') else None
+
+# Workers de conversion persistants (le convertisseur est chargé une fois par worker)
+app.config['CONVERTER_WORKERS'] = int(os.environ.get('CONVERTER_WORKERS', os.cpu_count() or 2))
+converter_pool = None
+converter_pool_lock = threading.Lock()
+
+# Ordonnanceur: jobs simultanés, limites par étape (conversion CPU / mmctl en base), file max
+app.config['SCHEDULER_WORKERS'] = int(os.environ.get('SCHEDULER_WORKERS', 2))
+app.config['CONVERT_CONCURRENCY'] = int(os.environ.get('CONVERT_CONCURRENCY', app.config['CONVERTER_WORKERS']))
+app.config['MMCTL_CONCURRENCY'] = int(os.environ.get('MMCTL_CONCURRENCY', 1))
+app.config['SCHEDULER_MAX_QUEUE'] = int(os.environ.get('SCHEDULER_MAX_QUEUE', 50))
+scheduler = None
+scheduler_lock = threading.Lock()
+
+# Découpage de la sortie en shards importés au fil de la conversion (0: pas de limite)
+app.config['SHARD_MAX_POSTS'] = int(os.environ.get('SHARD_MAX_POSTS', 50000))
+app.config['SHARD_MAX_BYTES'] = int(os.environ.get('SHARD_MAX_BYTES', 0))
+
+# Délais maximaux calculés selon la taille (événements, posts) et le débit des jobs passés,
+# jamais sous ces minimums; une étape sans progression est interrompue avant (secondes)
+app.config['CONVERT_TIMEOUT'] = int(os.environ.get('CONVERT_TIMEOUT', 300))
+app.config['CONVERT_STALL_TIMEOUT'] = int(os.environ.get('CONVERT_STALL_TIMEOUT', 120))
+
+# Suivi des jobs d'import mmctl: délai minimal, délai sans activité du job Mattermost,
+# délai de soumission (`mmctl import process`) et intervalle maximal entre deux requêtes
+app.config['MMCTL_IMPORT_TIMEOUT'] = int(os.environ.get('MMCTL_IMPORT_TIMEOUT', 600))
+app.config['MMCTL_STALL_TIMEOUT'] = int(os.environ.get('MMCTL_STALL_TIMEOUT', 600))
+app.config['MMCTL_SUBMIT_TIMEOUT'] = int(os.environ.get('MMCTL_SUBMIT_TIMEOUT', 120))
+app.config['MMCTL_POLL_MAX_INTERVAL'] = float(os.environ.get('MMCTL_POLL_MAX_INTERVAL', 30))
+mmctl_watcher = None
+mmctl_watcher_lock = threading.Lock()
+
+# Stockage des jobs: base SQLite (WAL) partagée entre workers gunicorn, ou 'memory'
+app.config['JOB_STORE'] = os.environ.get('JOB_STORE', str(UPLOAD_FOLDER / 'jobs.db'))
+# Lignes de log gardées par job dans le stockage; l'historique complet est dans <job>/job.log
+app.config['JOB_LOG_BUFFER'] = int(os.environ.get('JOB_LOG_BUFFER', 500))
+job_store = None
+job_store_lock = threading.Lock()
+
+# Index des imports réussis (salons, watermark, utilisateurs) pour l'import incrémental
+app.config['IMPORT_INDEX'] = os.environ.get('IMPORT_INDEX', str(UPLOAD_FOLDER / 'import_index.db'))
+import_index = None
+import_index_lock = threading.Lock()
+
+# Cache des conversions (clé: empreinte de l'upload, équipe, convertisseur, options), 0: désactivé
+app.config['ARTIFACT_CACHE'] = os.environ.get('ARTIFACT_CACHE', str(UPLOAD_FOLDER / 'cache'))
+app.config['ARTIFACT_CACHE_MAX_BYTES'] = int(os.environ.get('ARTIFACT_CACHE_MAX_BYTES', 5 * 1024 ** 3))
+artifact_cache = None
+artifact_cache_lock = threading.Lock()
+
+# Nettoyage de UPLOAD_FOLDER: quota (octets, 0: seul l'espace libre du disque compte) et
+# durée de conservation (secondes) des dossiers selon l'état du job
+app.config['WORKSPACE_QUOTA'] = int(os.environ.get('WORKSPACE_QUOTA', 0))
+app.config['WORKSPACE_TTL_COMPLETED'] = int(os.environ.get('WORKSPACE_TTL_COMPLETED', 3600))
+app.config['WORKSPACE_TTL_ERROR'] = int(os.environ.get('WORKSPACE_TTL_ERROR', 86400))
+app.config['WORKSPACE_TTL_CANCELED'] = int(os.environ.get('WORKSPACE_TTL_CANCELED', 3600))
+app.config['WORKSPACE_TTL_UPLOAD'] = int(os.environ.get('WORKSPACE_TTL_UPLOAD', 86400))
+app.config['WORKSPACE_TTL_ORPHAN'] = int(os.environ.get('WORKSPACE_TTL_ORPHAN', 3600))
+# Espace réservé par upload: export + JSONL + archive
+app.config['WORKSPACE_EXPANSION'] = float(os.environ.get('WORKSPACE_EXPANSION', 3))
+app.config['WORKSPACE_SWEEP_INTERVAL'] = int(os.environ.get('WORKSPACE_SWEEP_INTERVAL', 60))
+workspace_janitor = None
+workspace_janitor_lock = threading.Lock()
+
+# Mots de passe des jobs en cours, gardés en mémoire et jamais écrits dans le stockage
+job_secrets = {}
+
+# Annulation des jobs de ce processus (DELETE /api/job/<id>), vérifiée par chaque étape bloquante
+job_cancels = {}
+
+# Étape reprise par POST /api/job/<id>/retry, selon le premier checkpoint manquant (voir job_checkpoint.py)
+RESUME_STAGES = {
+    'uploaded': 'upload',
+    'converted': 'conversion',
+    'archived': 'création de l\'archive',
+    'submitted': 'import mmctl',
+    'imported': 'suivi de l\'import mmctl'
+}
+
+# Réveil des flux d'événements (SSE) à chaque changement d'un job de ce processus
+job_changed = threading.Condition()
+
+# Flux d'événements: relecture du stockage (jobs des autres workers) et commentaire keep-alive
+JOB_EVENTS_POLL = 1.0
+JOB_EVENTS_KEEPALIVE = 15
+
+# Uploads par morceaux en cours (reprise façon tus), indexés par upload_id
+uploads = {}
+uploads_lock = threading.Lock()
+
+# Taille des blocs lus depuis le flux de la requête
+UPLOAD_READ_SIZE = 64 * 1024
+
+# Erreurs de l'analyse préalable d'un export illisible ou mal formé (archive corrompue, JSON invalide...)
+EXPORT_ERRORS = (ValueError, zipfile.BadZipFile, AttributeError, TypeError, KeyError)
+
+# Lignes anciennes du journal renvoyées par page (/api/job/<id>/logs)
+LOG_PAGE_SIZE = 200
+LOG_PAGE_MAX = 1000
+
+# Début d'une entrée du journal <job>/job.log (les lignes suivantes d'un message sont indentées)
+LOG_ENTRY_PATTERN = re.compile(r'^(\d{4}-\d\d-\d\dT[\d:.]+) \[([A-Z]+)\] ?(.*)$')
+
+# Métriques Prometheus (/metrics): compteurs et histogrammes cumulés dans le stockage des jobs
+# (tous les workers gunicorn), jauges lues dans ce stockage sauf l'attente propre à chaque worker
+metrics = MetricsRegistry(store=lambda: get_job_store())
+STAGE_DURATION = metrics.histogram('element_import_stage_duration_seconds',
+                                   'Durée des étapes des jobs (convert, zip, mmctl par shard)', ['stage'])
+UPLOADED_BYTES = metrics.counter('element_import_uploaded_bytes_total', 'Octets d\'export reçus')
+CONVERTED_EVENTS = metrics.counter('element_import_converted_events_total',
+                                   'Événements Element convertis (messages en mode script)')
+JOB_OUTCOMES = metrics.counter('element_import_jobs_total', 'Jobs terminés par statut', ['status'])
+TIMEOUTS = metrics.counter('element_import_timeouts_total', 'Délais dépassés par étape', ['stage'])
+STALLS = metrics.counter('element_import_stalls_total', 'Étapes interrompues faute de progression', ['stage'])
+metrics.gauge('element_import_queue_depth', 'Jobs en file d\'attente',
+              lambda: get_job_store().status_counts().get('queued', 0))
+metrics.gauge('element_import_jobs_running', 'Jobs en cours d\'exécution',
+              lambda: sum(get_job_store().status_counts().get(status, 0) for status in ('running', 'canceling')))
+metrics.gauge('element_import_stage_active', 'Jobs occupant un créneau de l\'étape',
+              lambda: {name: get_job_store().slot_counts().get(name, 0) for name in get_scheduler().stats()['stages']},
+              ['stage'])
+metrics.gauge('element_import_stage_waiting', 'Jobs en attente d\'un créneau de l\'étape (worker qui répond)',
+              lambda: {(name, job_owner()): stage['waiting'] for name, stage in get_scheduler().stats()['stages'].items()},
+              ['stage', 'worker'])
+metrics.gauge('element_import_stage_limit', 'Créneaux de l\'étape',
+              lambda: {name: stage['limit'] for name, stage in get_scheduler().stats()['stages'].items()},
+              ['stage'])
 
 # Template HTML
 HTML_TEMPLATE = '''
@@ -124,6 +291,13 @@ HTML_TEMPLATE = '''
             color: #333;
         }
         
+        .checkbox-label {
+            display: flex;
+            align-items: center;
+            gap: 8px;
+            font-weight: 600;
+        }
+        
         input[type="text"],
         input[type="password"],
         select {
@@ -199,6 +373,17 @@ HTML_TEMPLATE = '''
             transform: none;
         }
         
+        .btn-danger {
+            background: #dc3545;
+            color: white;
+            margin-left: 10px;
+        }
+        
+        .btn-danger:disabled {
+            opacity: 0.5;
+            cursor: not-allowed;
+        }
+        
         .progress-container {
             display: none;
             margin-top: 30px;
@@ -265,13 +450,40 @@ HTML_TEMPLATE = '''
             border-radius: 8px;
             font-family: 'Courier New', monospace;
             font-size: 0.9em;
-            max-height: 400px;
+        }
+        
+        .log-viewport {
+            height: 360px;
             overflow-y: auto;
+            position: relative;
         }
         
+        .log-spacer {
+            position: relative;
+        }
+        
+        /* Hauteur fixe: seules les lignes visibles sont rendues (voir LogView) */
         .log-line {
-            margin-bottom: 5px;
-            line-height: 1.5;
+            position: absolute;
+            left: 0;
+            right: 0;
+            height: 22px;
+            line-height: 22px;
+            white-space: pre;
+            overflow: hidden;
+            text-overflow: ellipsis;
+        }
+        
+        .log-older {
+            display: none;
+            margin-bottom: 10px;
+            background: none;
+            border: 1px solid #555;
+            border-radius: 4px;
+            color: #d4d4d4;
+            cursor: pointer;
+            font: inherit;
+            padding: 4px 10px;
         }
         
         .log-timestamp {
@@ -382,6 +594,24 @@ HTML_TEMPLATE = '''
                                placeholder="ChangeMe123!">
                         <div class="help-text">Si vide, utilisera "ChangeMe123!"</div>
                     </div>
+                    
+                    <div class="form-group">
+                        <label for="priority">Priorité</label>
+                        <select id="priority" name="priority">
+                            <option value="normal" selected>Normale</option>
+                            <option value="high">Haute</option>
+                            <option value="low">Basse (gros imports, hors heures ouvrées)</option>
+                        </select>
+                        <div class="help-text">Ordre de passage dans la file d'attente des imports</div>
+                    </div>
+                    
+                    <div class="form-group">
+                        <label class="checkbox-label" for="incremental">
+                            <input type="checkbox" id="incremental" name="incremental" checked>
+                            Import incrémental
+                        </label>
+                        <div class="help-text">Salons déjà importés dans cette équipe: seuls les nouveaux messages sont importés</div>
+                    </div>
                 </form>
             </div>
             
@@ -395,12 +625,13 @@ HTML_TEMPLATE = '''
                 <div class="file-upload" id="fileUploadZone">
                     <div class="file-upload-icon">📁</div>
                     <p><strong>Glissez-déposez votre fichier JSON ici</strong></p>
+                    <p>(ou plusieurs fichiers JSON, ou une archive ZIP d'exports: un fichier JSON par salon)</p>
                     <p>ou</p>
                     <button type="button" class="btn btn-primary" onclick="document.getElementById('fileInput').click()">
                         Parcourir les fichiers
                     </button>
-                    <input type="file" id="fileInput" accept=".json" onchange="handleFileSelect(event)">
-                    <div class="help-text" style="margin-top: 15px;">Taille max: 500 MB</div>
+                    <input type="file" id="fileInput" accept=".json,.zip" multiple onchange="handleFileSelect(event)">
+                    <div class="help-text" style="margin-top: 15px;">Taille max: 5 GB, upload repris automatiquement</div>
                 </div>
                 
                 <div class="file-info" id="fileInfo">
@@ -421,6 +652,14 @@ HTML_TEMPLATE = '''
                         onclick="startImport()" disabled>
                     🚀 Démarrer l'import
                 </button>
+                <button type="button" class="btn btn-danger" id="cancelImportBtn"
+                        onclick="cancelImport()" style="display:none;">
+                    ⏹ Annuler l'import
+                </button>
+                <button type="button" class="btn btn-primary" id="retryImportBtn"
+                        onclick="retryImport()" style="display:none; margin-left:10px;">
+                    🔁 Reprendre l'import
+                </button>
                 
                 <!-- Progression -->
                 <div class="progress-container" id="progressContainer">
@@ -455,14 +694,19 @@ HTML_TEMPLATE = '''
                     </div>
                     
                     <!-- Logs -->
-                    <div class="log-container" id="logContainer"></div>
+                    <div class="log-container" id="logContainer">
+                        <button class="log-older" id="logOlder" onclick="logView.loadOlder()">↑ Lignes précédentes</button>
+                        <div class="log-viewport" id="logViewport">
+                            <div class="log-spacer" id="logSpacer"></div>
+                        </div>
+                    </div>
                 </div>
             </div>
         </div>
     </div>
     
     <script>
-        let selectedFile = null;
+        let selectedFiles = [];
         let currentJobId = null;
         
         // Gestion du drag & drop
@@ -492,30 +736,30 @@ HTML_TEMPLATE = '''
         uploadZone.addEventListener('drop', handleDrop, false);
         
         function handleDrop(e) {
-            const dt = e.dataTransfer;
-            const files = dt.files;
-            if (files.length > 0) {
-                handleFile(files[0]);
-            }
+            handleFiles(e.dataTransfer.files);
         }
         
         function handleFileSelect(e) {
-            const files = e.target.files;
-            if (files.length > 0) {
-                handleFile(files[0]);
-            }
+            handleFiles(e.target.files);
         }
         
-        function handleFile(file) {
-            if (!file.name.endsWith('.json')) {
-                alert('Veuillez sélectionner un fichier JSON');
+        // Un export JSON ou une archive ZIP, ou plusieurs exports JSON (un par salon)
+        function handleFiles(fileList) {
+            const files = Array.from(fileList);
+            if (files.length === 0) return;
+            const pattern = files.length > 1 ? /\\.json$/i : /\\.(json|zip)$/i;
+            if (!files.every(file => pattern.test(file.name))) {
+                alert(files.length > 1
+                    ? 'Plusieurs salons: sélectionnez uniquement des fichiers JSON (ou une seule archive ZIP)'
+                    : 'Veuillez sélectionner un fichier JSON ou une archive ZIP');
                 return;
             }
             
-            selectedFile = file;
+            selectedFiles = files;
             document.getElementById('fileInfo').style.display = 'block';
-            document.getElementById('fileName').textContent = file.name;
-            document.getElementById('fileSize').textContent = formatBytes(file.size);
+            document.getElementById('fileName').textContent = files.length > 1
+                ? `${files.length} salons: ${files.map(file => file.name).join(', ')}` : files[0].name;
+            document.getElementById('fileSize').textContent = formatBytes(files.reduce((total, file) => total + file.size, 0));
             document.getElementById('startImportBtn').disabled = false;
         }
         
@@ -532,11 +776,11 @@ HTML_TEMPLATE = '''
             const password = document.getElementById('password').value.trim();
             
             if (!teamName) {
-                alert('Veuillez saisir le nom de l\'équipe');
+                alert('Veuillez saisir le nom de l\\'équipe');
                 return;
             }
             
-            if (!selectedFile) {
+            if (selectedFiles.length === 0) {
                 alert('Veuillez sélectionner un fichier');
                 return;
             }
@@ -551,25 +795,49 @@ HTML_TEMPLATE = '''
             
             updateStatus('info', '📤 Upload du fichier...');
             
-            // Upload du fichier
-            const formData = new FormData();
-            formData.append('file', selectedFile);
-            formData.append('team', teamName);
-            formData.append('password', password);
+            const fields = {
+                team: teamName,
+                password: password,
+                priority: document.getElementById('priority').value,
+                incremental: document.getElementById('incremental').checked
+            };
             
             try {
-                const response = await fetch('/api/upload', {
-                    method: 'POST',
-                    body: formData
-                });
-                
-                const result = await response.json();
+                let result;
+                if (selectedFiles.length > 1) {
+                    // Plusieurs salons: envoyés en une requête, convertis en parallèle
+                    result = await uploadFilesForm(selectedFiles, fields);
+                    if (result.success && result.preflight) showPreflight(result.preflight);
+                } else {
+                    const uploadId = await uploadFileChunked(selectedFiles[0]);
+                    
+                    // Analyse préalable: contenu de l'export, durée estimée et plan de découpage
+                    updateStatus('info', '🔍 Analyse de l\\'export...');
+                    const preflight = await fetch(`/api/uploads/${uploadId}/preflight`, {method: 'POST'})
+                        .then(response => response.json());
+                    if (!preflight.success) {
+                        updateStatus('error', '❌ Erreur: ' + preflight.error);
+                        document.getElementById('spinner').style.display = 'none';
+                        return;
+                    }
+                    showPreflight(preflight);
+                    
+                    const response = await fetch(`/api/uploads/${uploadId}/finalize`, {
+                        method: 'POST',
+                        headers: {'Content-Type': 'application/json'},
+                        body: JSON.stringify(fields)
+                    });
+                    result = await response.json();
+                    if (result.success) localStorage.removeItem(uploadKey(selectedFiles[0]));
+                }
                 
                 if (result.success) {
                     currentJobId = result.job_id;
                     addLog('info', `Job créé: ${currentJobId}`);
+                    document.getElementById('cancelImportBtn').style.display = 'inline-block';
+                    document.getElementById('retryImportBtn').style.display = 'none';
                     updateStatus('info', '⚙️ Import en cours...');
-                    pollJobStatus(currentJobId);
+                    watchJob(currentJobId);
                 } else {
                     updateStatus('error', '❌ Erreur: ' + result.error);
                     document.getElementById('spinner').style.display = 'none';
@@ -580,29 +848,249 @@ HTML_TEMPLATE = '''
             }
         }
         
-        function pollJobStatus(jobId) {
+        // Annulation: le job est retiré de la file, ou ses processus sont arrêtés
+        async function cancelImport() {
+            if (!currentJobId || !confirm('Annuler l\\'import en cours ?')) return;
+            const button = document.getElementById('cancelImportBtn');
+            button.disabled = true;
+            try {
+                const response = await fetch(`/api/job/${currentJobId}`, {method: 'DELETE'});
+                const result = await response.json();
+                if (result.success) {
+                    updateStatus('warning', '⏹ Annulation en cours...');
+                } else {
+                    addLog('warning', result.error);
+                }
+            } catch (error) {
+                addLog('error', 'Annulation impossible: ' + error.message);
+                button.disabled = false;
+            }
+        }
+        
+        // Reprise d'un job en erreur ou annulé, à partir de sa première étape incomplète
+        async function retryImport() {
+            if (!currentJobId) return;
+            const button = document.getElementById('retryImportBtn');
+            button.disabled = true;
+            try {
+                const response = await fetch(`/api/job/${currentJobId}/retry`, {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({password: document.getElementById('password').value.trim()})
+                });
+                const result = await response.json();
+                if (!result.success) {
+                    addLog('error', 'Reprise impossible: ' + result.error);
+                    button.disabled = false;
+                    return;
+                }
+                button.style.display = 'none';
+                button.disabled = false;
+                const cancelButton = document.getElementById('cancelImportBtn');
+                cancelButton.disabled = false;
+                cancelButton.style.display = 'inline-block';
+                document.getElementById('spinner').style.display = 'block';
+                updateStatus('info', '🔁 Reprise de l\\'import...');
+                // Seules les lignes de log postérieures à la reprise sont demandées
+                const since = [...logView.lines, ...logView.pending].reduce((max, log) => Math.max(max, log.line || 0), 0);
+                watchJob(currentJobId, since);
+            } catch (error) {
+                addLog('error', 'Reprise impossible: ' + error.message);
+                button.disabled = false;
+            }
+        }
+        
+        // Clé de reprise: un même fichier re-sélectionné reprend son upload
+        function uploadKey(file) {
+            return `upload:${file.name}:${file.size}:${file.lastModified}`;
+        }
+        
+        function sleep(ms) {
+            return new Promise(resolve => setTimeout(resolve, ms));
+        }
+        
+        // Offset courant côté serveur, ou null si l'upload n'existe plus
+        async function fetchUploadOffset(uploadId) {
+            const response = await fetch(`/api/uploads/${uploadId}`, {method: 'HEAD'});
+            if (!response.ok) return null;
+            return parseInt(response.headers.get('Upload-Offset'), 10);
+        }
+        
+        async function uploadFileChunked(file) {
+            const key = uploadKey(file);
+            let uploadId = localStorage.getItem(key);
+            let offset = uploadId ? await fetchUploadOffset(uploadId) : null;
+            let chunkSize = 8 * 1024 * 1024;
+            
+            if (offset === null) {
+                const response = await fetch('/api/uploads', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({filename: file.name, size: file.size})
+                });
+                const result = await response.json();
+                if (!result.success) throw new Error(result.error);
+                uploadId = result.upload_id;
+                chunkSize = result.chunk_size || chunkSize;
+                offset = 0;
+                localStorage.setItem(key, uploadId);
+            } else if (offset > 0) {
+                addLog('info', `Reprise de l'upload à ${formatBytes(offset)}`);
+            }
+            
+            let retries = 0;
+            while (offset < file.size) {
+                try {
+                    const response = await fetch(`/api/uploads/${uploadId}`, {
+                        method: 'PATCH',
+                        headers: {
+                            'Content-Type': 'application/offset+octet-stream',
+                            'Upload-Offset': String(offset)
+                        },
+                        body: file.slice(offset, offset + chunkSize)
+                    });
+                    if (response.status >= 500) throw new Error('HTTP ' + response.status);
+                    if (!response.ok && response.status !== 409) {
+                        const result = await response.json();
+                        throw Object.assign(new Error(result.error), {fatal: true});
+                    }
+                    // 409: l'offset serveur fait foi, on repart de là
+                    offset = parseInt(response.headers.get('Upload-Offset'), 10);
+                    retries = 0;
+                    const percent = Math.floor(offset * 100 / Math.max(file.size, 1));
+                    updateStatus('info', `📤 Upload du fichier... ${percent}% (${formatBytes(offset)})`);
+                } catch (error) {
+                    if (error.fatal || ++retries > 10) throw error;
+                    const delay = Math.min(1000 * Math.pow(2, retries - 1), 30000);
+                    addLog('warning', `Connexion interrompue, nouvelle tentative dans ${delay / 1000}s`);
+                    await sleep(delay);
+                    const serverOffset = await fetchUploadOffset(uploadId).catch(() => null);
+                    if (serverOffset !== null) offset = serverOffset;
+                }
+            }
+            
+            return uploadId;
+        }
+        
+        // Plusieurs fichiers en une requête (/api/upload), avec la progression de l'envoi
+        function uploadFilesForm(files, fields) {
+            const form = new FormData();
+            files.forEach(file => form.append('file', file));
+            Object.entries(fields).forEach(([name, value]) => form.append(name, String(value)));
+            return new Promise((resolve, reject) => {
+                const xhr = new XMLHttpRequest();
+                xhr.open('POST', '/api/upload');
+                xhr.upload.onprogress = event => {
+                    if (!event.lengthComputable) return;
+                    const percent = Math.floor(event.loaded * 100 / Math.max(event.total, 1));
+                    updateStatus('info', `📤 Upload de ${files.length} fichiers... ${percent}% (${formatBytes(event.loaded)})`);
+                };
+                xhr.onload = () => {
+                    try {
+                        resolve(JSON.parse(xhr.responseText));
+                    } catch (error) {
+                        reject(new Error('HTTP ' + xhr.status));
+                    }
+                };
+                xhr.onerror = () => reject(new Error('connexion interrompue'));
+                xhr.send(form);
+            });
+        }
+        
+        // Suivi en direct (SSE), avec repli sur le polling si le flux est indisponible
+        function watchJob(jobId, since = 0) {
+            if (!window.EventSource) {
+                pollJobStatus(jobId, since);
+                return;
+            }
+            
+            let cursor = since;
+            let finished = false;
+            const source = new EventSource(`/api/job/${jobId}/events?since=${since}`);
+            logView.jobId = jobId;
+            
+            source.addEventListener('log', event => {
+                const log = JSON.parse(event.data);
+                logView.push(log);
+                cursor = log.line;
+            });
+            source.addEventListener('job', event => {
+                const job = JSON.parse(event.data);
+                // Lignes sorties du tampon du serveur: rechargement à la demande depuis le journal complet
+                if (job.logs_truncated) {
+                    logView.showOlder(true);
+                }
+                showJobState(job);
+            });
+            source.addEventListener('end', () => {
+                finished = true;
+                source.close();
+            });
+            source.onerror = () => {
+                // Reconnexion automatique (Last-Event-ID) tant que le flux a déjà fonctionné
+                if (!finished && source.readyState === EventSource.CLOSED) {
+                    pollJobStatus(jobId, cursor);
+                }
+            };
+        }
+        
+        // Affichage de l'état d'un job (flux SSE ou polling); true si le job est terminé
+        function showJobState(job) {
+            updateProgress(job.progress);
+            if (['completed', 'error', 'canceled'].includes(job.status)) {
+                document.getElementById('cancelImportBtn').style.display = 'none';
+            }
+            if (['error', 'canceled'].includes(job.status)) {
+                document.getElementById('retryImportBtn').style.display = 'inline-block';
+            }
+            
+            if (job.status === 'queued') {
+                const start = job.estimated_start
+                    ? new Date(job.estimated_start).toLocaleTimeString() : '?';
+                const eta = job.estimated_duration != null ? `, durée estimée ${formatDuration(job.estimated_duration)}` : '';
+                updateStatus('info', `⏳ En file d'attente: position ${job.queue_position}, démarrage estimé vers ${start}${eta}`);
+            } else if (job.status === 'running' && job.stage === 'convert' && job.conversion) {
+                const rate = job.conversion.events_per_second;
+                updateStatus('info', `⚙️ Conversion (${job.conversion.stage === 'scan' ? 'lecture' : 'écriture'}): ${job.conversion.events.toLocaleString()} événements` +
+                    (rate ? `, ${rate.toLocaleString()}/s` : '') +
+                    (job.rooms_total ? `, salons convertis: ${job.rooms_done || 0}/${job.rooms_total}` : ''));
+            } else if (job.status === 'running') {
+                updateStatus('info', '⚙️ Import en cours...');
+            } else if (job.status === 'completed') {
+                document.getElementById('spinner').style.display = 'none';
+                updateStatus('success', '✅ Import terminé avec succès!');
+                showStats(job.stats);
+                return true;
+            } else if (job.status === 'error') {
+                document.getElementById('spinner').style.display = 'none';
+                updateStatus('error', '❌ Erreur lors de l\\'import');
+                return true;
+            } else if (job.status === 'canceling') {
+                updateStatus('warning', '⏹ Annulation en cours...');
+            } else if (job.status === 'canceled') {
+                document.getElementById('spinner').style.display = 'none';
+                updateStatus('warning', '⏹ Import annulé');
+                return true;
+            }
+            return false;
+        }
+        
+        function pollJobStatus(jobId, cursor) {
+            // Curseur: seules les nouvelles lignes de log sont renvoyées
             const interval = setInterval(async () => {
                 try {
-                    const response = await fetch(`/api/job/${jobId}`);
+                    const response = await fetch(`/api/job/${jobId}?since=${cursor}`);
                     const job = await response.json();
                     
-                    updateProgress(job.progress);
-                    
-                    if (job.logs && job.logs.length > 0) {
-                        job.logs.forEach(log => {
-                            addLog(log.level, log.message);
-                        });
+                    logView.jobId = jobId;
+                    if (job.logs_truncated) {
+                        logView.showOlder(true);
                     }
+                    (job.logs || []).forEach(log => logView.push(log));
+                    cursor = job.cursor;
                     
-                    if (job.status === 'completed') {
-                        clearInterval(interval);
-                        document.getElementById('spinner').style.display = 'none';
-                        updateStatus('success', '✅ Import terminé avec succès!');
-                        showStats(job.stats);
-                    } else if (job.status === 'error') {
+                    if (showJobState(job)) {
                         clearInterval(interval);
-                        document.getElementById('spinner').style.display = 'none';
-                        updateStatus('error', '❌ Erreur lors de l\'import');
                     }
                 } catch (error) {
                     console.error('Erreur polling:', error);
@@ -622,14 +1110,157 @@ HTML_TEMPLATE = '''
             statusEl.textContent = message;
         }
         
+        // Ligne produite par la page (sans numéro de ligne côté serveur)
         function addLog(level, message) {
-            const container = document.getElementById('logContainer');
-            const timestamp = new Date().toLocaleTimeString();
-            const logLine = document.createElement('div');
-            logLine.className = 'log-line log-' + level;
-            logLine.innerHTML = `<span class="log-timestamp">[${timestamp}]</span> ${message}`;
-            container.appendChild(logLine);
-            container.scrollTop = container.scrollHeight;
+            logView.push({level: level, message: message});
+        }
+        
+        // Journal virtualisé: tampon borné, une mise à jour du DOM par frame,
+        // seules les lignes visibles sont rendues; les plus anciennes sont rechargées à la demande
+        const logView = {
+            ROW_HEIGHT: 22,
+            OVERSCAN: 10,
+            MAX_LINES: 2000,
+            MAX_LINES_BROWSING: 10000,
+            lines: [],
+            pending: [],
+            rows: [],
+            frame: null,
+            stick: true,
+            jobId: null,
+            loading: false,
+            
+            init() {
+                this.viewport = document.getElementById('logViewport');
+                this.spacer = document.getElementById('logSpacer');
+                this.viewport.addEventListener('scroll', () => {
+                    const v = this.viewport;
+                    this.stick = v.scrollTop + v.clientHeight >= v.scrollHeight - this.ROW_HEIGHT;
+                    this.schedule();
+                });
+            },
+            
+            push(log) {
+                this.pending.push(log);
+                // Onglet en arrière-plan (pas de frame): le tampon d'attente reste borné
+                if (this.pending.length > this.MAX_LINES) {
+                    this.pending.splice(0, this.pending.length - this.MAX_LINES);
+                    this.showOlder(true);
+                }
+                this.schedule();
+            },
+            
+            schedule() {
+                if (this.frame === null) {
+                    this.frame = requestAnimationFrame(() => this.flush());
+                }
+            },
+            
+            flush() {
+                this.frame = null;
+                for (const log of this.pending) this.lines.push(log);
+                this.pending = [];
+                // Pendant la lecture de l'historique, le tampon peut grandir jusqu'à MAX_LINES_BROWSING
+                const limit = this.stick ? this.MAX_LINES : this.MAX_LINES_BROWSING;
+                if (this.lines.length > limit) {
+                    const removed = this.lines.length - limit;
+                    this.lines.splice(0, removed);
+                    if (!this.stick) this.viewport.scrollTop -= removed * this.ROW_HEIGHT;
+                    this.showOlder(true);
+                }
+                this.render();
+            },
+            
+            render() {
+                const v = this.viewport;
+                this.spacer.style.height = (this.lines.length * this.ROW_HEIGHT) + 'px';
+                if (this.stick) v.scrollTop = v.scrollHeight;
+                const first = Math.max(0, Math.floor(v.scrollTop / this.ROW_HEIGHT) - this.OVERSCAN);
+                const last = Math.min(this.lines.length,
+                    Math.ceil((v.scrollTop + v.clientHeight) / this.ROW_HEIGHT) + this.OVERSCAN);
+                
+                while (this.rows.length < last - first) {
+                    const row = document.createElement('div');
+                    row.appendChild(document.createElement('span')).className = 'log-timestamp';
+                    row.appendChild(document.createTextNode(''));
+                    this.spacer.appendChild(row);
+                    this.rows.push(row);
+                }
+                this.rows.forEach((row, i) => {
+                    const log = this.lines[first + i];
+                    if (first + i >= last || !log) {
+                        row.style.display = 'none';
+                        return;
+                    }
+                    const time = log.timestamp ? new Date(log.timestamp) : (log.received = log.received || new Date());
+                    const message = String(log.message);
+                    row.style.display = '';
+                    row.style.top = ((first + i) * this.ROW_HEIGHT) + 'px';
+                    row.className = 'log-line log-' + log.level;
+                    row.title = message;
+                    row.firstChild.textContent = `[${time.toLocaleTimeString()}]`;
+                    row.lastChild.nodeValue = ' ' + message.split('\\n').join(' ⏎ ');
+                });
+            },
+            
+            showOlder(visible) {
+                document.getElementById('logOlder').style.display = visible && this.jobId ? 'inline-block' : 'none';
+                this.hasOlder = visible;
+            },
+            
+            async loadOlder() {
+                if (this.loading || !this.jobId) return;
+                const first = this.lines.find(log => log.line);
+                const before = first ? first.line : '';
+                this.loading = true;
+                try {
+                    const response = await fetch(`/api/job/${this.jobId}/logs?before=${before}`);
+                    const result = await response.json();
+                    const older = (result.logs || []).filter(log => !first || log.line < first.line);
+                    this.lines.unshift(...older);
+                    this.stick = false;
+                    this.viewport.scrollTop += older.length * this.ROW_HEIGHT;
+                    this.showOlder(result.has_more);
+                    this.render();
+                } catch (error) {
+                    console.error('Erreur chargement du journal:', error);
+                } finally {
+                    this.loading = false;
+                }
+            }
+        };
+        logView.init();
+        
+        function formatDuration(seconds) {
+            if (seconds < 60) return '< 1 min';
+            const minutes = Math.round(seconds / 60);
+            return minutes < 60 ? `${minutes} min` : `${Math.floor(minutes / 60)} h ${minutes % 60} min`;
+        }
+        
+        // Analyse préalable: totaux dans la grille, durée estimée et plan de découpage dans le journal
+        function showPreflight(preflight) {
+            const analysis = preflight.analysis;
+            const plan = preflight.plan;
+            showStats({users: analysis.senders, messages: analysis.messages,
+                       threads: analysis.thread_roots, files: analysis.attachments});
+            addLog('info', `Analyse: ${analysis.events.toLocaleString()} événements, ${analysis.messages.toLocaleString()} messages, ` +
+                `${analysis.senders} expéditeurs, ${analysis.thread_roots} threads (${analysis.thread_replies} réponses), ` +
+                `${analysis.attachments} pièces jointes, ${analysis.rooms.length} salon(s), ${formatBytes(analysis.bytes)}`);
+            addLog('info', `Durée estimée: ${formatDuration(preflight.eta_seconds)} ` +
+                `(${preflight.rates.measured ? 'débit des imports précédents' : 'débit par défaut'})`);
+            addLog('info', plan.shard_posts
+                ? `Découpage: ${plan.shards} shard(s) de ${plan.shard_posts.toLocaleString()} posts au plus (SHARD_MAX_POSTS)`
+                : `Découpage: ${plan.shards} shard(s)`);
+            if (plan.suggested_shard_posts) {
+                addLog('info', `Configuration suggérée: SHARD_MAX_POSTS=${plan.suggested_shard_posts} (environ 10 min d\\'import par shard)`);
+            }
+            if (plan.rooms.length > 1) {
+                plan.rooms.slice(0, 3).forEach(room => addLog('info',
+                    `  ${room.name}: ${room.messages.toLocaleString()} messages, ~${formatDuration(room.eta_seconds)}`));
+            }
+            if (plan.off_hours) {
+                addLog('warning', '⚠️ Import long: à planifier hors des heures de travail (priorité basse recommandée)');
+            }
         }
         
         function showStats(stats) {
@@ -650,14 +1281,28 @@ def index():
     """Page principale"""
     return render_template_string(HTML_TEMPLATE)
 
+@app.before_request
+def start_workspace_janitor():
+    """Démarrer le nettoyage du dossier de travail avec le premier appel"""
+    get_workspace_janitor()
+
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     """Upload et démarrage de l'import"""
+    # Réservation au nom du job: gardée jusqu'à la fin de sa conversion ou son état final
+    job_id = str(uuid.uuid4())
+    job_started = False
     try:
+        try:
+            get_workspace_janitor().reserve(request.content_length or 0, key=job_id)
+        except QuotaExceeded as e:
+            return jsonify({'success': False, 'error': str(e)}), 507
+        
         if 'file' not in request.files:
             return jsonify({'success': False, 'error': 'Aucun fichier'}), 400
         
-        file = request.files['file']
+        files = request.files.getlist('file')
+        file = files[0]
         team = request.form.get('team', '').strip()
         password = request.form.get('password', '').strip() or 'ChangeMe123!'
         
@@ -667,170 +1312,1374 @@ def upload_file():
         if file.filename == '':
             return jsonify({'success': False, 'error': 'Nom de fichier vide'}), 400
         
-        # Créer un job ID
-        job_id = str(uuid.uuid4())
         job_dir = UPLOAD_FOLDER / job_id
         job_dir.mkdir(parents=True, exist_ok=True)
         
-        # Sauvegarder le fichier
-        filename = secure_filename(file.filename)
-        file_path = job_dir / filename
-        file.save(str(file_path))
-        
-        # Créer le job
-        jobs[job_id] = {
-            'status': 'pending',
-            'progress': 0,
-            'logs': [],
-            'stats': {},
-            'file_path': str(file_path),
-            'team': team,
-            'password': password,
-            'created_at': datetime.now().isoformat()
-        }
-        
-        # Lancer l'import en arrière-plan
-        thread = threading.Thread(target=run_import, args=(job_id,))
-        thread.daemon = True
-        thread.start()
-        
-        return jsonify({'success': True, 'job_id': job_id})
+        # Sauvegarder le fichier (plusieurs fichiers: un export par salon dans rooms/)
+        if len(files) > 1:
+            file_path = job_dir / 'rooms'
+            file_path.mkdir()
+            digests = [
+                save_upload_file(room_file, file_path / f'{index:04d}-{secure_filename(room_file.filename)}')
+                for index, room_file in enumerate(files, 1)
+            ]
+            sha256 = hashlib.sha256(' '.join(digests).encode()).hexdigest()
+        else:
+            file_path = input_path(job_id, secure_filename(file.filename))
+            file_path.parent.mkdir()
+            sha256 = save_upload_file(file, file_path)
+        
+        try:
+            preflight = job_preflight(file_path)
+        except ValueError as e:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            return jsonify({'success': False, 'error': str(e)}), 400
+        try:
+            create_job(job_id, file_path, team, password, priority=request.form.get('priority'),
+                       sha256=sha256, incremental=form_flag(request.form.get('incremental'), default=False),
+                       profile=profile_requested(request.form), preflight=preflight)
+        except QueueFull as e:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            return jsonify({'success': False, 'error': str(e)}), 503
+        job_started = True
+        get_workspace_janitor().hold(job_id)
+        
+        return jsonify({'success': True, 'job_id': job_id, 'preflight': preflight})
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
+    finally:
+        # Upload abandonné: plus rien à réserver
+        if not job_started:
+            get_workspace_janitor().release(job_id)
+
+@app.route('/api/uploads', methods=['POST'])
+def create_upload():
+    """Créer un upload par morceaux (reprise possible façon tus)"""
+    data = request.get_json(silent=True) or request.form
+    filename = secure_filename(str(data.get('filename', '')))
+    
+    try:
+        size = int(data.get('size', request.headers.get('Upload-Length', '')))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Taille du fichier invalide'}), 400
+    
+    if not filename:
+        return jsonify({'success': False, 'error': 'Nom de fichier vide'}), 400
+    
+    if size < 0:
+        return jsonify({'success': False, 'error': 'Taille du fichier invalide'}), 400
+    
+    if size > app.config['MAX_UPLOAD_SIZE']:
+        return jsonify({'success': False, 'error': 'Fichier trop volumineux'}), 413
+    
+    # Réservation gardée par le job à la finalisation, libérée à la suppression de l'upload abandonné
+    # ou à expiration
+    upload_id = str(uuid.uuid4())
+    try:
+        get_workspace_janitor().reserve(size, key=upload_id, ttl=app.config['WORKSPACE_TTL_UPLOAD'])
+    except QuotaExceeded as e:
+        return jsonify({'success': False, 'error': str(e)}), 507
+    
+    job_dir = UPLOAD_FOLDER / upload_id
+    input_path(upload_id, filename).parent.mkdir(parents=True)
+    input_path(upload_id, filename).touch()
+    
+    meta = {
+        'filename': filename,
+        'size': size,
+        'created_at': datetime.now().isoformat()
+    }
+    with open(job_dir / 'upload.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    
+    with uploads_lock:
+        uploads[upload_id] = {
+            **meta,
+            'offset': 0,
+            'sha256': hashlib.sha256(),
+            'hashed': 0,
+            'lock': threading.Lock()
+        }
+    
+    response = jsonify({
+        'success': True,
+        'upload_id': upload_id,
+        'offset': 0,
+        'chunk_size': app.config['UPLOAD_CHUNK_SIZE']
+    })
+    response.status_code = 201
+    response.headers['Location'] = f'/api/uploads/{upload_id}'
+    response.headers['Upload-Offset'] = '0'
+    return response
+
+@app.route('/api/uploads/<upload_id>')
+def get_upload(upload_id):
+    """Récupérer l'offset courant d'un upload (GET ou HEAD)"""
+    upload = load_upload(upload_id)
+    if not upload:
+        return jsonify({'success': False, 'error': 'Upload non trouvé'}), 404
+    return upload_response(upload_id, upload)
+
+@app.route('/api/uploads/<upload_id>', methods=['PATCH'])
+def upload_chunk(upload_id):
+    """Écrire un morceau à l'offset indiqué par l'en-tête Upload-Offset"""
+    upload = load_upload(upload_id)
+    if not upload:
+        return jsonify({'success': False, 'error': 'Upload non trouvé'}), 404
+    
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'En-tête Upload-Offset manquant'}), 400
+    
+    # Un seul écrivain par upload: un second PATCH concurrent est refusé
+    if not upload['lock'].acquire(blocking=False):
+        return upload_response(upload_id, upload, 409, 'Upload déjà en cours d\'écriture')
+    
+    received = upload['offset']
+    try:
+        if offset != upload['offset']:
+            return upload_response(upload_id, upload, 409, 'Offset incorrect')
+        
+        file_path = input_path(upload_id, upload['filename'])
+        with open(file_path, 'ab') as f:
+            while True:
+                try:
+                    chunk = request.stream.read(UPLOAD_READ_SIZE)
+                except Exception:
+                    # Connexion coupée: on garde ce qui a été reçu, le client reprendra à l'offset
+                    break
+                if not chunk:
+                    break
+                if upload['offset'] + len(chunk) > upload['size']:
+                    return upload_response(upload_id, upload, 413, 'Données au-delà de la taille annoncée')
+                f.write(chunk)
+                # Hash tenu à jour tant que ce worker a vu toutes les données précédentes
+                if upload['hashed'] == upload['offset']:
+                    upload['sha256'].update(chunk)
+                    upload['hashed'] += len(chunk)
+                upload['offset'] += len(chunk)
+        
+        return upload_response(upload_id, upload)
+    finally:
+        upload['lock'].release()
+        # Une écriture par requête dans le stockage partagé
+        if upload['offset'] > received:
+            UPLOADED_BYTES.inc(upload['offset'] - received)
+
+@app.route('/api/uploads/<upload_id>/preflight', methods=['POST'])
+def preflight_upload(upload_id):
+    """Analyse préalable d'un upload complet: contenu, durée estimée et plan de découpage"""
+    upload = load_upload(upload_id)
+    if not upload:
+        return jsonify({'success': False, 'error': 'Upload non trouvé'}), 404
+    
+    with upload['lock']:
+        if upload['offset'] != upload['size']:
+            return upload_response(upload_id, upload, 409, 'Upload incomplet')
+        try:
+            preflight = export_preflight(input_path(upload_id, upload['filename']))
+        except EXPORT_ERRORS as e:
+            return jsonify({'success': False, 'error': f'Export illisible: {e}'}), 422
+    
+    return jsonify({'success': True, **preflight})
+
+@app.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    """Terminer un upload par morceaux et démarrer l'import"""
+    data = request.get_json(silent=True) or request.form
+    team = str(data.get('team', '')).strip()
+    password = str(data.get('password', '')).strip() or 'ChangeMe123!'
+    
+    if not team:
+        return jsonify({'success': False, 'error': 'Nom d\'équipe manquant'}), 400
+    
+    upload = load_upload(upload_id)
+    if not upload:
+        return jsonify({'success': False, 'error': 'Upload non trouvé'}), 404
+    
+    with upload['lock']:
+        if upload['offset'] != upload['size']:
+            return upload_response(upload_id, upload, 409, 'Upload incomplet')
+        
+        sha256 = upload_digest(upload_id, upload)
+        expected = str(data.get('sha256', '')).strip().lower()
+        if expected and expected != sha256:
+            return jsonify({'success': False, 'error': 'Somme de contrôle SHA-256 différente'}), 422
+        
+        # En cas de file pleine, l'upload reste complet et peut être finalisé plus tard
+        job_dir = UPLOAD_FOLDER / upload_id
+        try:
+            preflight = job_preflight(input_path(upload_id, upload['filename']))
+        except ValueError as e:
+            # Export inutilisable: l'upload est supprimé, il faudra en envoyer un autre
+            with uploads_lock:
+                uploads.pop(upload_id, None)
+            shutil.rmtree(job_dir, ignore_errors=True)
+            get_workspace_janitor().release(upload_id)
+            return jsonify({'success': False, 'error': str(e)}), 400
+        try:
+            create_job(upload_id, input_path(upload_id, upload['filename']), team, password,
+                       priority=data.get('priority'), sha256=sha256,
+                       incremental=form_flag(data.get('incremental'), default=False), profile=profile_requested(data),
+                       preflight=preflight)
+        except QueueFull as e:
+            return jsonify({'success': False, 'error': str(e)}), 503
+        
+        with uploads_lock:
+            uploads.pop(upload_id, None)
+        (job_dir / 'upload.json').unlink()
+    # Réservation de l'upload: gardée pour la conversion du job
+    get_workspace_janitor().hold(upload_id)
+    
+    return jsonify({'success': True, 'job_id': upload_id, 'sha256': sha256, 'preflight': preflight})
+
+def input_size(file_path):
+    """Taille d'un export envoyé (fichier, ou dossier rooms/ de plusieurs salons)"""
+    file_path = Path(file_path)
+    if file_path.is_dir():
+        return sum(path.stat().st_size for path in file_path.iterdir() if path.is_file())
+    return file_path.stat().st_size
+
+def input_path(job_id, filename):
+    """Emplacement d'un fichier envoyé dans le dossier du job"""
+    return UPLOAD_FOLDER / job_id / INPUT_DIR / filename
+
+def job_directory(file_path):
+    """Dossier d'un job d'après son export (input/<fichier>, rooms/ ou, avant input/, <fichier>)"""
+    file_path = Path(file_path)
+    return file_path.parent.parent if file_path.parent.name == INPUT_DIR else file_path.parent
+
+def load_upload(upload_id):
+    """Récupérer l'état d'un upload, rechargé depuis le disque après un redémarrage"""
+    with uploads_lock:
+        upload = uploads.get(upload_id)
+    if upload and not upload['lock'].locked():
+        # Avec plusieurs workers gunicorn, un autre processus a pu écrire ou finaliser l'upload:
+        # offset relu sur le disque, le hash de ce worker reste valable jusqu'à upload['hashed']
+        try:
+            if not (UPLOAD_FOLDER / upload_id / 'upload.json').is_file():
+                raise FileNotFoundError(upload_id)
+            upload['offset'] = input_path(upload_id, upload['filename']).stat().st_size
+        except OSError:
+            with uploads_lock:
+                if uploads.get(upload_id) is upload:
+                    del uploads[upload_id]
+            upload = None
+    if upload:
+        return upload
+    
+    try:
+        uuid.UUID(upload_id)
+    except ValueError:
+        return None
+    
+    meta_path = UPLOAD_FOLDER / upload_id / 'upload.json'
+    if not meta_path.is_file():
+        return None
+    
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    
+    # Le hash n'est pas sérialisable: il sera calculé sur la partie déjà reçue à la finalisation
+    try:
+        offset = input_path(upload_id, meta['filename']).stat().st_size
+    except OSError:
+        return None
+    
+    with uploads_lock:
+        return uploads.setdefault(upload_id, {
+            **meta,
+            'offset': offset,
+            'sha256': hashlib.sha256(),
+            'hashed': 0,
+            'lock': threading.Lock()
+        })
+
+def upload_digest(upload_id, upload):
+    """SHA-256 d'un upload complet: le hash de ce worker complété par les octets qu'il n'a pas vus.
+
+    Chaque octet est lu au plus une fois par worker, même quand les morceaux sont
+    écrits tour à tour par plusieurs workers gunicorn (verrou de l'upload détenu).
+    """
+    if upload['hashed'] < upload['offset']:
+        with open(input_path(upload_id, upload['filename']), 'rb') as f:
+            f.seek(upload['hashed'])
+            remaining = upload['offset'] - upload['hashed']
+            while remaining > 0:
+                chunk = f.read(min(UPLOAD_READ_SIZE, remaining))
+                if not chunk:
+                    break
+                upload['sha256'].update(chunk)
+                upload['hashed'] += len(chunk)
+                remaining -= len(chunk)
+    return upload['sha256'].hexdigest()
+
+def upload_response(upload_id, upload, status=200, error=None):
+    """Réponse JSON + en-têtes tus décrivant l'état d'un upload"""
+    body = {
+        'success': error is None,
+        'upload_id': upload_id,
+        'offset': upload['offset'],
+        'size': upload['size'],
+        'complete': upload['offset'] == upload['size']
+    }
+    if error:
+        body['error'] = error
+    response = jsonify(body)
+    response.status_code = status
+    response.headers['Upload-Offset'] = str(upload['offset'])
+    response.headers['Upload-Length'] = str(upload['size'])
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def save_upload_file(storage, path):
+    """Enregistrer un fichier reçu, retourne son empreinte SHA-256 (calculée pendant l'écriture)"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'wb') as f:
+        while True:
+            chunk = storage.stream.read(UPLOAD_READ_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+            size += len(chunk)
+    UPLOADED_BYTES.inc(size)
+    return digest.hexdigest()
+
+def form_flag(value, default=False):
+    """Option booléenne d'un formulaire ou d'un corps JSON (absente: default)"""
+    if value is None:
+        return default
+    return str(value).strip().lower() not in ('', '0', 'false', 'off', 'no')
+
+def profile_requested(data):
+    """Profilage de la conversion demandé (champ profile ou en-tête X-Import-Profile)"""
+    return form_flag(data.get('profile'), default=False) \
+        or form_flag(request.headers.get('X-Import-Profile'), default=False)
+
+def export_preflight(file_path):
+    """Analyse préalable d'un export (gardée dans preflight.json), estimation selon les jobs passés"""
+    preflight_path = job_directory(file_path) / 'preflight.json'
+    try:
+        with open(preflight_path, encoding='utf-8') as f:
+            analysis = json.load(f)
+    except (OSError, ValueError):
+        analysis = analyze_paths(sorted(file_path.glob('*.json')) if file_path.is_dir() else [file_path])
+        with open(preflight_path, 'w', encoding='utf-8') as f:
+            json.dump(analysis, f)
+    
+    # Découpage appliqué par la conversion en flux (un seul bloc en mode script)
+    stream = app.config['CONVERSION_MODE'] == 'stream'
+    return {'analysis': analysis, **estimate(analysis, measured_rates(),
+                                             (stream and app.config['SHARD_MAX_POSTS']) or None,
+                                             (stream and app.config['SHARD_MAX_BYTES']) or None)}
+
+def measured_rates():
+    """Débits de conversion et d'import mesurés sur les derniers jobs terminés"""
+    return throughput(get_job_store().list(status='completed', limit=HISTORY_JOBS))
+
+def job_preflight(file_path):
+    """Analyse préalable jointe au job: totaux, durée estimée et plan (ValueError si l'export est illisible)"""
+    try:
+        preflight = export_preflight(file_path)
+    except EXPORT_ERRORS as e:
+        raise ValueError(f'Export illisible: {e}') from e
+    return {**preflight, 'analysis': {k: v for k, v in preflight['analysis'].items() if k != 'rooms'}}
+
+def create_job(job_id, file_path, team, password, priority=None, **extra):
+    """Créer le job et le placer dans la file d'attente (QueueFull si elle est pleine)"""
+    priority = priority if priority in PRIORITIES else 'normal'
+    get_job_store().create(job_id, {
+        'status': 'queued',
+        'stage': 'queued',
+        'progress': 0,
+        'stats': {},
+        'file_path': str(file_path),
+        'team': team,
+        'priority': priority,
+        'owner': job_owner(),
+        'created_at': datetime.now().isoformat(),
+        **extra
+    })
+    # Premier checkpoint: le mot de passe n'est gardé qu'en empreinte, pour vérifier celui d'une reprise
+    JobCheckpoint(job_directory(file_path)).mark(
+        'uploaded',
+        file=Path(file_path).name,
+        sha256=extra.get('sha256'),
+        password_sha256=hashlib.sha256(password.encode()).hexdigest()
+    )
+    try:
+        queue_job(job_id, password, priority)
+    except QueueFull:
+        get_job_store().delete(job_id)
+        raise
+
+def queue_job(job_id, password, priority):
+    """Placer un job (nouveau ou repris) dans la file d'attente (QueueFull si elle est pleine)"""
+    job_secrets[job_id] = password
+    # Annulation demandée par un autre worker gunicorn: statut 'canceling' dans le stockage
+    job_cancels[job_id] = CancelToken(check=lambda: get_job_store().status(job_id) == 'canceling')
+    
+    try:
+        position = get_scheduler().submit(job_id, lambda: run_import(job_id), PRIORITIES[priority])
+    except QueueFull:
+        job_secrets.pop(job_id, None)
+        job_cancels.pop(job_id, None)
+        raise
+    add_job_log(job_id, 'info', f'Job en file d\'attente (position {position})')
 
 @app.route('/api/job/<job_id>')
 def get_job_status(job_id):
-    """Récupérer le statut d'un job"""
-    job = jobs.get(job_id)
+    """Récupérer le statut d'un job et ses logs après le curseur since"""
+    try:
+        since = max(int(request.args.get('since', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'Paramètre since invalide'}), 400
+    
+    job = get_job_store().get(job_id, since=since)
     if not job:
         return jsonify({'error': 'Job non trouvé'}), 404
-    return jsonify(job)
+    
+    response = dict(job)
+    response['cursor'] = job['logs'][-1]['line'] if job['logs'] else since
+    response['logs_truncated'] = logs_truncated(job, since)
+    response.update(queue_info(job_id, job))
+    return jsonify(response)
+
+@app.route('/api/job/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Annuler un job: retiré de la file d'attente, ou conversion et import interrompus"""
+    job = get_job_store().get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Job non trouvé'}), 404
+    if job['status'] in ('completed', 'error', 'canceled'):
+        return jsonify({'success': False, 'error': 'Job déjà terminé', 'status': job['status']}), 409
+    
+    # En file d'attente dans ce processus: le job n'a encore rien produit
+    if job['status'] == 'queued' and get_scheduler().cancel(job_id):
+        job_secrets.pop(job_id, None)
+        job_cancels.pop(job_id, None)
+        add_job_log(job_id, 'warning', '⏹ Job annulé avant son démarrage')
+        update_job(job_id, status='canceled', stage='canceled')
+        return jsonify({'success': True, 'status': 'canceled'})
+    
+    # En cours: chaque étape s'interrompt à sa prochaine vérification (processus tués, créneaux libérés)
+    cancel = job_cancels.get(job_id)
+    if job['status'] != 'canceling':
+        add_job_log(job_id, 'warning', 'Annulation demandée...')
+    if cancel:
+        cancel.cancel()
+    else:
+        # Job d'un autre worker gunicorn: il lit ce statut dans le stockage
+        update_job(job_id, status='canceling')
+    return jsonify({'success': True, 'status': 'canceling'}), 202
+
+@app.route('/api/job/<job_id>/retry', methods=['POST'])
+def retry_job(job_id):
+    """Reprendre un job en erreur ou annulé à la première étape incomplète (checkpoint.json)"""
+    job = get_job_store().get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Job non trouvé'}), 404
+    if job['status'] not in ('error', 'canceled'):
+        return jsonify({'success': False, 'error': 'Seul un job en erreur ou annulé peut être repris',
+                        'status': job['status']}), 409
+    file_path = Path(job['file_path'])
+    if not file_path.exists():
+        return jsonify({'success': False, 'error': 'Fichiers du job supprimés: nouvel upload nécessaire'}), 410
+    
+    checkpoint = JobCheckpoint(job_directory(file_path))
+    stage = checkpoint.resume_stage()
+    data = request.get_json(silent=True) or request.form
+    password = data.get('password') or 'ChangeMe123!'
+    # Conversion à refaire: le mot de passe doit être celui du job d'origine
+    uploaded = checkpoint.get('uploaded') or {}
+    if stage in ('uploaded', 'converted') and uploaded.get('password_sha256') \
+            and hashlib.sha256(password.encode()).hexdigest() != uploaded['password_sha256']:
+        return jsonify({'success': False, 'error': 'Mot de passe différent de celui du job d\'origine'}), 400
+    
+    # Conversion ou archive à refaire: leur espace est réservé comme pour un nouvel upload
+    if stage in ('uploaded', 'converted'):
+        try:
+            get_workspace_janitor().reserve(input_size(file_path), key=job_id)
+        except QuotaExceeded as e:
+            return jsonify({'success': False, 'error': str(e)}), 507
+        get_workspace_janitor().hold(job_id)
+    
+    add_job_log(job_id, 'info', f'Reprise demandée à l\'étape « {RESUME_STAGES.get(stage, "fin")} »')
+    update_job(job_id, status='queued', stage='queued', progress=0, owner=job_owner(),
+               retried_at=datetime.now().isoformat(), attempts=job.get('attempts', 1) + 1)
+    try:
+        queue_job(job_id, password, job.get('priority', 'normal'))
+    except QueueFull as e:
+        # Retour à l'état précédent: pas une nouvelle issue du job (JOB_OUTCOMES)
+        get_job_store().update(job_id, status=job['status'], stage=job.get('stage'), owner=job.get('owner'))
+        get_workspace_janitor().release(job_id)
+        notify_job_change()
+        return jsonify({'success': False, 'error': str(e)}), 503
+    return jsonify({'success': True, 'job_id': job_id, 'resume_stage': stage})
+
+@app.route('/api/job/<job_id>/events')
+def job_events(job_id):
+    """Flux SSE d'un job: état (job), lignes de log (log, id = numéro de ligne) et fin (end)"""
+    try:
+        since = max(int(request.headers.get('Last-Event-ID') or request.args.get('since', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'Curseur invalide'}), 400
+    if not get_job_store().get(job_id, since=since):
+        return jsonify({'error': 'Job non trouvé'}), 404
+    
+    response = Response(stream_job_events(job_id, since), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-store'
+    # Nginx: pas de mise en tampon de la réponse
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def logs_truncated(job, since):
+    """Des lignes postérieures à since sont-elles sorties du tampon ? (seulement dans /api/job/<id>/log)"""
+    first_line = job['logs'][0]['line'] if job['logs'] else job['log_lines'] + 1
+    return first_line > since + 1
+
+def stream_job_events(job_id, since):
+    """Générateur des événements SSE d'un job, jusqu'à son état final.
+
+    L'événement job précède les lignes de log; logs_truncated y est vrai quand des
+    lignes après le curseur sont sorties du tampon (premier événement ou lecteur trop lent).
+    """
+    cursor = since
+    last_state = None
+    last_sent = time.time()
+    yield 'retry: 3000\n\n'
+    while True:
+        job = get_job_store().get(job_id, since=cursor)
+        if not job:
+            return
+        
+        truncated = logs_truncated(job, cursor)
+        state = {
+            'status': job['status'],
+            'progress': job['progress'],
+            'stage': job.get('stage'),
+            'stats': job.get('stats', {}),
+            'conversion': job.get('conversion'),
+            **queue_info(job_id, job)
+        }
+        sent = False
+        if state != last_state or truncated:
+            yield f'event: job\ndata: {json.dumps({**state, "logs_truncated": truncated})}\n\n'
+            last_state = state
+            sent = True
+        
+        for log in job['logs']:
+            yield f'id: {log["line"]}\nevent: log\ndata: {json.dumps(log)}\n\n'
+            cursor = log['line']
+            sent = True
+        
+        if sent:
+            last_sent = time.time()
+        elif time.time() - last_sent >= JOB_EVENTS_KEEPALIVE:
+            yield ': keep-alive\n\n'
+            last_sent = time.time()
+        
+        if job['status'] in ('completed', 'error', 'canceled'):
+            yield f'event: end\ndata: {json.dumps({"status": job["status"]})}\n\n'
+            return
+        
+        with job_changed:
+            job_changed.wait(JOB_EVENTS_POLL)
+
+def queue_info(job_id, job):
+    """Position, démarrage et durée estimés d'un job en file d'attente"""
+    # La position n'est connue que du processus qui détient la file du job
+    if job['status'] != 'queued' or job.get('owner') != job_owner():
+        return {}
+    position = get_scheduler().position(job_id)
+    wait = get_scheduler().estimated_wait(job_id)
+    if position is None or wait is None:
+        return {}
+    return {
+        'queue_position': position,
+        'estimated_start': datetime.fromtimestamp(time.time() + wait).isoformat(),
+        'estimated_wait': round(wait),
+        'estimated_duration': (job.get('preflight') or {}).get('eta_seconds')
+    }
+
+@app.route('/api/job/<job_id>/log')
+def get_job_log(job_id):
+    """Télécharger le journal complet d'un job"""
+    if not get_job_store().get(job_id):
+        return jsonify({'error': 'Job non trouvé'}), 404
+    
+    log_path = job_log_path(job_id)
+    if not log_path.is_file():
+        return jsonify({'error': 'Journal non disponible'}), 404
+    return send_file(log_path, mimetype='text/plain', as_attachment=True,
+                     download_name=f'import-{job_id}.log')
+
+@app.route('/api/job/<job_id>/logs')
+def get_job_log_lines(job_id):
+    """Lignes du journal antérieures à la ligne before (les plus récentes si absent), par page"""
+    if not get_job_store().status(job_id):
+        return jsonify({'error': 'Job non trouvé'}), 404
+    try:
+        before = int(request.args['before']) if request.args.get('before') else None
+        limit = min(max(int(request.args.get('limit', LOG_PAGE_SIZE)), 1), LOG_PAGE_MAX)
+    except ValueError:
+        return jsonify({'error': 'Paramètres before/limit invalides'}), 400
+    
+    logs = read_log_lines(job_log_path(job_id), before, limit)
+    return jsonify({'logs': logs, 'has_more': bool(logs) and logs[0]['line'] > 1})
+
+@app.route('/api/job/<job_id>/profile')
+def get_job_profile(job_id):
+    """Télécharger les artefacts de profilage d'un job (archive ZIP)"""
+    job = get_job_store().get(job_id)
+    if not job:
+        return jsonify({'error': 'Job non trouvé'}), 404
+    if not job.get('profile'):
+        return jsonify({'error': 'Profilage non demandé pour ce job'}), 404
+    if job['status'] in ('queued', 'running'):
+        return jsonify({'error': 'Profil disponible à la fin du job'}), 409
+    
+    profile_dir = job_directory(job['file_path']) / 'profile'
+    if not profile_dir.is_dir():
+        return jsonify({'error': 'Artefacts de profilage supprimés'}), 410
+    
+    bundle = build_bundle(profile_dir, io.BytesIO())
+    bundle.seek(0)
+    return send_file(bundle, mimetype='application/zip', as_attachment=True,
+                     download_name=f'profile-{job_id}.zip')
+
+@app.route('/api/jobs')
+def list_jobs():
+    """Lister les jobs (filtres optionnels: team, status, limit)"""
+    try:
+        limit = min(int(request.args.get('limit', 100)), 1000)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Paramètre limit invalide'}), 400
+    
+    jobs = get_job_store().list(
+        team=request.args.get('team') or None,
+        status=request.args.get('status') or None,
+        limit=limit
+    )
+    return jsonify({'success': True, 'jobs': jobs})
+
+@app.route('/api/scheduler')
+def get_scheduler_status():
+    """Occupation de l'ordonnanceur (file d'attente et créneaux par étape)"""
+    return jsonify(get_scheduler().stats())
+
+@app.route('/api/workspace')
+def get_workspace_status():
+    """Occupation du dossier de travail et dossiers supprimés par le nettoyage"""
+    return jsonify(get_workspace_janitor().stats())
+
+@app.route('/metrics')
+def get_metrics():
+    """Métriques au format Prometheus"""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/api/cache')
+def get_cache_status():
+    """Occupation du cache des conversions"""
+    cache = get_artifact_cache()
+    if cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **cache.stats()})
 
 def run_import(job_id):
-    """Exécuter l'import Element → Mattermost"""
-    job = jobs[job_id]
+    """Exécuter l'import Element → Mattermost, à partir de la première étape incomplète (checkpoint.json)"""
+    job = get_job_store().get(job_id)
+    # Profilage: profils de conversion et durée de chaque étape dans <job>/profile/
+    profile_dir = job_directory(job['file_path']) / 'profile' if job.get('profile') else None
+    started = time.time()
+    timings = {'queued': started - datetime.fromisoformat(job.get('retried_at') or job['created_at']).timestamp()}
+    cancel = job_cancels.get(job_id) or CancelToken()
+    checkpoint = JobCheckpoint(job_directory(job['file_path']))
     
     try:
-        job['status'] = 'running'
-        job['progress'] = 10
-        add_job_log(job_id, 'info', 'Démarrage de la conversion...')
+        cancel.raise_if_set()
+        update_job(job_id, status='running', stage='convert', progress=10)
         
         file_path = job['file_path']
         team = job['team']
-        password = job['password']
-        job_dir = Path(file_path).parent
-        
-        # Étape 1: Conversion Python
-        output_file = job_dir / 'import.jsonl'
-        cmd = [
-            'python3',
-            CONVERTER_SCRIPT,
-            file_path,
-            '--team', team,
-            '--password', password,
-            '--output', str(output_file)
-        ]
-        
-        add_job_log(job_id, 'info', f'Commande: {" ".join(cmd)}')
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=300
-        )
-        
-        if result.returncode != 0:
-            raise Exception(f'Conversion échouée: {result.stderr}')
-        
-        # Parser la sortie pour extraire les stats
-        output = result.stdout
-        stats = parse_conversion_output(output)
-        job['stats'] = stats
-        
-        job['progress'] = 40
-        add_job_log(job_id, 'success', f'✓ Conversion réussie: {stats.get("messages", 0)} messages')
-        
-        # Étape 2: Création du ZIP
-        add_job_log(job_id, 'info', 'Création de l\'archive ZIP...')
-        
+        password = job_secrets[job_id]
+        job_dir = job_directory(file_path)
+        
+        # Reprise: archives déjà produites, ou JSONL déjà converti (mode script)
+        converted = checkpoint.get('converted')
+        archives = checkpoint.archives() if converted else None
+        jsonl_converted = bool(converted and not archives and converted.get('output')
+                               and (job_dir / converted['output']).is_file())
+        if archives or jsonl_converted:
+            rooms = None
+            add_job_log(job_id, 'info', 'Reprise du job: conversion déjà effectuée')
+        else:
+            # Conversion refaite: les shards produits et importés seront différents
+            checkpoint.clear('converted', 'archived', 'submitted', 'imported')
+            add_job_log(job_id, 'info', 'Démarrage de la conversion...')
+            rooms = room_inputs(Path(file_path))
+        media_dir = job_dir / MEDIA_DIR
+        
+        # Étape 1: Conversion Python (worker persistant du pool)
+        # En mode flux, le JSONL est écrit directement dans des archives ZIP (shards)
+        stream_mode = app.config['CONVERSION_MODE'] == 'stream'
         zip_file = job_dir / 'import.zip'
-        subprocess.run(
-            ['zip', '-j', str(zip_file), str(output_file)],
-            check=True,
-            capture_output=True
-        )
-        
-        job['progress'] = 60
-        add_job_log(job_id, 'success', '✓ Archive créée')
-        
-        # Étape 3: Import mmctl
-        add_job_log(job_id, 'info', 'Import dans Mattermost...')
-        
-        result = subprocess.run(
-            ['mmctl', '--local', 'import', 'process', '--bypass-upload', str(zip_file)],
-            capture_output=True,
-            text=True,
-            timeout=600,
-            env={**os.environ, 'MMCTL_LOCAL': 'true'}
+        output_file = zip_file if stream_mode else job_dir / 'import.jsonl'
+        task = {
+            'job_id': job_id,
+            'input': file_path,
+            'team': team,
+            'password': password,
+            'output': str(output_file)
+        }
+        # Pièces jointes de l'archive uploadée: dédupliquées dans l'archive d'import
+        if rooms and media_dir.is_dir():
+            task['data_dir'] = str(media_dir)
+            add_job_log(job_id, 'info', f'Pièces jointes: {sum(1 for _ in media_dir.iterdir())} fichier(s)')
+        if stream_mode:
+            task['compression'] = app.config['ARCHIVE_COMPRESSION']
+            task['compresslevel'] = app.config['ARCHIVE_COMPRESSLEVEL']
+            task['shard_posts'] = app.config['SHARD_MAX_POSTS']
+            task['shard_bytes'] = app.config['SHARD_MAX_BYTES']
+        if profile_dir:
+            task['profile'] = str(profile_dir / 'convert')
+            add_job_log(job_id, 'info', 'Profilage de la conversion activé (cProfile, tracemalloc)')
+        
+        # Import incrémental: salons déjà importés dans l'équipe, à partir de leur watermark
+        if job.get('incremental') and stream_mode:
+            task['delta'] = get_import_index().snapshot(team)
+            if task['delta']['rooms']:
+                add_job_log(job_id, 'info', f'Import incrémental: {len(task["delta"]["rooms"])} salon(s) déjà importé(s) dans l\'équipe')
+        elif job.get('incremental'):
+            add_job_log(job_id, 'warning', 'Import incrémental indisponible en mode script: import complet')
+        
+        # Même fichier, même équipe, mêmes options: les archives déjà converties sont réutilisées
+        # (sauf profilage: la conversion doit avoir lieu)
+        cache = get_artifact_cache()
+        artifact_key = None
+        if cache and job.get('sha256') and not profile_dir and not archives and not jsonl_converted:
+            options = {k: v for k, v in task.items()
+                       if k not in ('job_id', 'input', 'output', 'team', 'password', 'data_dir')}
+            options['password'] = hashlib.sha256(password.encode()).hexdigest()
+            artifact_key = cache_key(job['sha256'], team, converter_version(), options)
+        
+        # Délais maximaux selon la taille de l'export et le débit des jobs passés
+        rates = measured_rates()
+        events = (job.get('preflight') or {}).get('analysis', {}).get('events')
+        
+        # Étapes 2 et 3 en pipeline: chaque shard est importé pendant la conversion des suivants
+        progress = job_progress()
+        pipeline = ShardPipeline(
+            lambda shard: import_shard(job_id, shard, progress, cancel, checkpoint, rates),
+            on_change=lambda shards: update_job(job_id, shards=shards)
         )
-        
-        if result.returncode != 0:
-            raise Exception(f'Import échoué: {result.stderr}')
-        
-        job['progress'] = 100
-        job['status'] = 'completed'
+        index = None
+        
+        try:
+            entry = cache.get(artifact_key) if artifact_key else None
+            restored = entry and cache.restore(artifact_key, entry, job_dir)
+            if archives:
+                add_job_log(job_id, 'info', f'Reprise: {len(archives)} archive(s) déjà créée(s)')
+                result = {'success': True, 'stats': converted['stats']}
+                for shard in archives:
+                    add_shard(job_id, pipeline, shard)
+            elif jsonl_converted:
+                result = {'success': True, 'stats': converted['stats']}
+            elif restored:
+                add_job_log(job_id, 'success', '✓ Fichier déjà converti pour cette équipe: archives reprises du cache')
+                result = {'success': True, 'stats': entry['stats']}
+                for item, path in zip(entry['files'], restored):
+                    add_shard(job_id, pipeline, {**{k: v for k, v in item.items() if k != 'name'},
+                                                 'path': str(path)})
+            else:
+                result = convert_job(job_id, task, rooms, stream_mode, pipeline, progress, cancel, rates, events)
+            
+            if not result['success']:
+                raise Exception(f'Conversion échouée: {" ".join(result["errors"])}')
+            
+            index = result['stats'].get('index')
+            stats = {k: v for k, v in result['stats'].items() if k not in ('shards', 'index')}
+            update_job(job_id, stats=stats, stage='mmctl', progress=progress(conversion=1))
+            if not (archives or jsonl_converted):
+                checkpoint.mark('converted', stats={k: v for k, v in result['stats'].items() if k != 'shards'},
+                                output=None if stream_mode else output_file.name)
+            if not (restored or archives or jsonl_converted):
+                timings['convert'] = result['duration']
+                STAGE_DURATION.observe(result['duration'], stage='convert')
+                CONVERTED_EVENTS.inc(stats.get('events') or stats.get('messages', 0))
+                worker = f'worker {result["worker_pid"]}' if result.get('worker_pid') else f'{len(rooms)} salons'
+                add_job_log(job_id, 'info', f'Conversion effectuée en {result["duration"]:.1f}s ({worker})')
+                add_job_log(job_id, 'success', f'✓ Conversion réussie: {stats.get("messages", 0)} messages')
+            if stats.get('skipped'):
+                add_job_log(job_id, 'info', f'{stats["skipped"]} messages déjà importés ignorés')
+            
+            # Mode script: le convertisseur externe produit un JSONL, archivé en un seul shard
+            if not stream_mode and not restored and not archives:
+                cancel.raise_if_set()
+                add_job_log(job_id, 'info', 'Création de l\'archive ZIP...')
+                zip_started = time.time()
+                build_archive(
+                    zip_file,
+                    [output_file],
+                    app.config['ARCHIVE_COMPRESSION'],
+                    app.config['ARCHIVE_COMPRESSLEVEL']
+                )
+                timings['zip'] = time.time() - zip_started
+                STAGE_DURATION.observe(timings['zip'], stage='zip')
+                output_file.unlink()
+            # Sans découpage, l'archive unique est le seul shard
+            if not pipeline.shards():
+                add_shard(job_id, pipeline, {
+                    'index': 1,
+                    'path': str(zip_file),
+                    'posts': stats.get('messages', 0),
+                    'bytes': zip_file.stat().st_size
+                })
+            if not archives:
+                checkpoint.archive(pipeline.shards())
+            # Archives écrites: l'espace qu'elles occupent est désormais visible sur le disque
+            get_workspace_janitor().release(job_id)
+            if artifact_key and not restored:
+                cache.put(
+                    artifact_key,
+                    [{k: shard[k] for k in ('index', 'path', 'posts', 'bytes')} for shard in pipeline.shards()],
+                    {k: v for k, v in result['stats'].items() if k != 'shards'}
+                )
+            
+            progress(total=sum(shard['posts'] for shard in pipeline.shards()))
+        except Exception as e:
+            pipeline.abort(e)
+        try:
+            pipeline.close()
+        finally:
+            timings['mmctl'] = [shard.get('import_seconds') for shard in pipeline.shards()]
+        
+        # L'index n'avance qu'après un import réussi: un échec sera rejoué en entier
+        if index:
+            get_import_index().record(team, index)
+        
+        # Log avant le statut final: les flux SSE s'arrêtent dès l'état final
         add_job_log(job_id, 'success', '✅ Import terminé avec succès!')
-        
-    except subprocess.TimeoutExpired:
-        job['status'] = 'error'
-        add_job_log(job_id, 'error', '❌ Timeout dépassé')
+        update_job(job_id, progress=100, status='completed', stage='done', timings=timings)
+        
+    except JobCanceled:
+        remove_partial_artifacts(Path(job['file_path']))
+        add_job_log(job_id, 'warning', '⏹ Import annulé: processus arrêtés, fichiers intermédiaires supprimés')
+        update_job(job_id, status='canceled', stage='canceled')
+    except subprocess.TimeoutExpired as e:
+        stage = 'mmctl' if e.cmd and e.cmd[0] == 'mmctl' else 'convert'
+        if isinstance(e, (ConversionStalled, ImportStalled)):
+            STALLS.inc(stage=stage)
+            add_job_log(job_id, 'error', f'❌ {e}')
+        else:
+            TIMEOUTS.inc(stage=stage)
+            add_job_log(job_id, 'error', f'❌ Timeout dépassé ({e.timeout:.0f}s)')
+        log_resume_stage(job_id, checkpoint)
+        update_job(job_id, status='error')
     except Exception as e:
-        job['status'] = 'error'
         add_job_log(job_id, 'error', f'❌ Erreur: {str(e)}')
+        log_resume_stage(job_id, checkpoint)
+        update_job(job_id, status='error')
+    finally:
+        job_secrets.pop(job_id, None)
+        job_cancels.pop(job_id, None)
+        if profile_dir:
+            write_stage_timings(profile_dir, timings, started)
 
-def add_job_log(job_id, level, message):
-    """Ajouter un log à un job"""
-    if job_id in jobs:
-        jobs[job_id]['logs'].append({
-            'level': level,
-            'message': message,
-            'timestamp': datetime.now().isoformat()
-        })
+def log_resume_stage(job_id, checkpoint):
+    """Indiquer l'étape à laquelle un job en échec reprendra (POST /api/job/<id>/retry)"""
+    stage = checkpoint.resume_stage()
+    if stage:
+        add_job_log(job_id, 'info', f'Reprise possible à l\'étape « {RESUME_STAGES[stage]} » (bouton Reprendre)')
 
-def parse_conversion_output(output):
-    """Parser la sortie du script de conversion pour extraire les stats"""
-    stats = {
-        'users': 0,
-        'messages': 0,
-        'threads': 0,
-        'files': 0
-    }
+def remove_partial_artifacts(file_path):
+    """Supprimer les sorties d'un job annulé (JSONL, archives, salons extraits), l'upload est gardé"""
+    job_dir = job_directory(file_path)
+    JobCheckpoint(job_dir).clear('converted', 'archived')
+    for path in [job_dir / 'import.jsonl', *job_dir.glob('import*.zip')]:
+        if path != file_path and path.is_file():
+            path.unlink()
+    if file_path.suffix.lower() == '.zip':
+        shutil.rmtree(job_dir / 'rooms', ignore_errors=True)
+        shutil.rmtree(job_dir / MEDIA_DIR, ignore_errors=True)
+
+def write_stage_timings(profile_dir, timings, started):
+    """Durée (secondes) de chaque étape d'un job profilé: attente, conversion, archive, imports"""
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    timings = {**timings, 'total': time.time() - started}
+    with open(profile_dir / 'stages.json', 'w', encoding='utf-8') as f:
+        json.dump(timings, f, indent=2)
+
+def convert_job(job_id, task, rooms, stream_mode, pipeline, progress, cancel, rates, events):
+    """Conversion d'un job sur le pool (créneau 'convert'), retourne le résultat du convertisseur"""
+    if rooms is None:
+        add_job_log(job_id, 'info', f'Conversion de {Path(task["input"]).name} via le pool de workers')
+    elif stream_mode:
+        add_job_log(job_id, 'info', f'Conversion de {len(rooms)} salons en parallèle')
+        update_job(job_id, rooms_done=0, rooms_total=len(rooms))
+    else:
+        raise Exception('Import de plusieurs salons: nécessite CONVERSION_MODE=stream')
     
-    for line in output.split('\n'):
-        if 'utilisateurs' in line.lower():
-            try:
-                stats['users'] = int(line.split()[0])
-            except:
-                pass
-        elif 'messages' in line.lower():
-            try:
-                stats['messages'] = int(line.split()[0])
-            except:
-                pass
-        elif 'threads' in line.lower():
-            try:
-                stats['threads'] = int(line.split()[0])
-            except:
-                pass
-        elif 'fichiers' in line.lower():
+    with get_scheduler().stage('convert', on_wait=lambda: add_job_log(
+            job_id, 'info', 'En attente d\'un créneau de conversion...'), cancel=cancel):
+        on_progress = conversion_progress(job_id, progress, pipeline)
+        if rooms is None:
+            timeout = conversion_timeout(events, Path(task['input']), rates)
+            add_job_log(job_id, 'info', f'Délai maximal de conversion: {timeout}s')
+            return get_converter_pool().run(task, timeout=timeout, on_progress=on_progress, cancel=cancel,
+                                            stall_timeout=app.config['CONVERT_STALL_TIMEOUT'])
+        return convert_rooms_parallel(rooms, task, on_progress, cancel, rates)
+
+def conversion_timeout(events, path, rates):
+    """Délai maximal d'une conversion: événements de l'analyse préalable, sinon estimés sur la taille"""
+    if not events:
+        events = path.stat().st_size / EVENT_BYTES if path.is_file() else 0
+    return convert_timeout(events, rates, app.config['CONVERT_TIMEOUT'])
+
+def converter_version():
+    """Version du convertisseur utilisé: empreinte du script (change à chaque mise à jour)"""
+    script = STREAM_CONVERTER_SCRIPT if app.config['CONVERSION_MODE'] == 'stream' else CONVERTER_SCRIPT
+    return f'{app.config["CONVERSION_MODE"]}:{file_digest(script)}'
+
+def room_inputs(file_path):
+    """Exports de salons d'un job: dossier rooms/ ou archive .zip (extraite, pièces jointes dans media/),
+    None pour un seul salon"""
+    rooms_dir = job_directory(file_path) / 'rooms'
+    if file_path.suffix.lower() == '.zip':
+        extract_rooms(file_path, rooms_dir, job_directory(file_path) / MEDIA_DIR)
+    elif file_path != rooms_dir:
+        return None
+    rooms = sorted(rooms_dir.glob('*.json'))
+    if not rooms:
+        raise Exception('Aucun export de salon (.json) trouvé')
+    return rooms
+
+def extract_rooms(archive_path, rooms_dir, media_dir):
+    """Extraire les exports .json d'une archive et ses autres fichiers (pièces jointes, par nom)
+    dans media_dir (noms aplatis, taille totale bornée)"""
+    with zipfile.ZipFile(archive_path) as archive:
+        members = [info for info in archive.infolist()
+                   if not info.is_dir() and not Path(info.filename).name.startswith('.')]
+        if sum(info.file_size for info in members) > app.config['MAX_UPLOAD_SIZE']:
+            raise Exception('Archive trop volumineuse une fois décompressée')
+        rooms = [info for info in members if info.filename.lower().endswith('.json')]
+        rooms_dir.mkdir(exist_ok=True)
+        targets = [rooms_dir / f'{index:04d}-{secure_filename(Path(info.filename).name)}'
+                   for index, info in enumerate(rooms, 1)]
+        # Pièces jointes retrouvées par leur nom (identifiant du média, filename ou body):
+        # le premier fichier d'un même nom est gardé
+        media = {}
+        for info in members:
+            if not info.filename.lower().endswith('.json'):
+                media.setdefault(Path(info.filename).name, info)
+        if media:
+            media_dir.mkdir(exist_ok=True)
+        for info, target in [*zip(rooms, targets), *((info, media_dir / name) for name, info in media.items())]:
+            with archive.open(info) as src, open(target, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+
+def convert_rooms_parallel(rooms, task, on_progress, cancel, rates):
+    """Conversion multi-salons: passes réparties sur les workers du pool, fusion dans ce processus"""
+    pool = get_converter_pool()
+    started = time.time()
+    profile = task.get('profile')
+    calls_done = itertools.count(1)
+    rooms_done = itertools.count(1)
+    with ThreadPoolExecutor(max_workers=pool.workers) as executor:
+        def run_call(call):
+            # Profilage: un profil par passe et par salon, numérotés dans l'ordre de lancement
+            call_profile = f'{profile}-{call[0]}-{next(calls_done):03d}' if profile else None
+            # Délai de chaque passe selon la taille du salon traité
+            timeout = conversion_timeout(None, Path(call[1].get('path') or ''), rates)
+            result = pool.call(call[0], call[1], timeout=timeout, profile=call_profile, cancel=cancel)
+            # Salon converti: signalé dès la fin de sa passe, sans attendre les autres
+            if call[0] == 'convert_room':
+                on_progress({'stage': 'room', 'room': str(call[1]['scan']['room_name']),
+                             'messages': result.get('messages', 0), 'rooms_done': next(rooms_done),
+                             'rooms_total': len(rooms)})
+            return result
+        
+        def run_calls(calls):
+            return list(executor.map(run_call, calls))
+        
+        def merge_progress(event):
+            # La fusion s'exécute dans ce processus: interrompue à la progression suivante
+            cancel.raise_if_set()
+            on_progress(event)
+        
+        # Fusion dans ce processus: profilée sans tracemalloc (partagé avec les autres jobs)
+        merge = lambda: convert_rooms(
+            rooms,
+            task['output'],
+            task['team'],
+            task['password'],
+            compression=task['compression'],
+            compresslevel=task['compresslevel'],
+            progress=merge_progress,
+            shard_posts=task['shard_posts'],
+            shard_bytes=task['shard_bytes'],
+            run_calls=run_calls,
+            delta=task.get('delta'),
+            data_dir=task.get('data_dir')
+        )
+        stats = profile_call(merge, f'{profile}-merge', memory=False) if profile else merge()
+    return {'success': True, 'stats': stats, 'errors': [], 'duration': time.time() - started}
+
+def add_shard(job_id, pipeline, shard):
+    """Placer un shard converti dans la file d'import du job"""
+    add_job_log(job_id, 'success', f'✓ Shard {shard["index"]} prêt ({shard["posts"]} posts, {Path(shard["path"]).stat().st_size / 1048576:.1f} MB, {app.config["ARCHIVE_COMPRESSION"]})')
+    pipeline.add(shard)
+
+def import_shard(job_id, shard, progress, cancel, checkpoint, rates):
+    """Importer un shard avec mmctl et attendre la fin du job Mattermost (reprise: shard déjà importé
+    ignoré, job mmctl déjà soumis suivi à nouveau)"""
+    if checkpoint.imported(shard['index']):
+        update_job(job_id, progress=progress(done=shard['posts'], current=0))
+        add_job_log(job_id, 'info', f'Shard {shard["index"]} déjà importé: ignoré')
+        return {'resumed': True}
+    
+    # Créneaux limités: les imports se disputent la base Mattermost
+    with get_scheduler().stage('mmctl', on_wait=lambda: add_job_log(
+            job_id, 'info', 'En attente d\'un créneau d\'import mmctl...'), cancel=cancel):
+        cancel.raise_if_set()
+        started = time.time()
+        mmctl_job_id = checkpoint.submitted(shard['index'])
+        if mmctl_job_id:
+            add_job_log(job_id, 'info', f'Reprise du suivi du shard {shard["index"]}: job d\'import Mattermost {mmctl_job_id}')
+        else:
+            add_job_log(job_id, 'info', f'Import du shard {shard["index"]} dans Mattermost...')
+            result = run_process(
+                ['mmctl', '--local', 'import', 'process', '--bypass-upload', shard['path']],
+                timeout=app.config['MMCTL_SUBMIT_TIMEOUT'],
+                cancel=cancel,
+                env={**os.environ, 'MMCTL_LOCAL': 'true'}
+            )
+            
+            if result.returncode != 0:
+                raise Exception(f'Import échoué: {result.stderr}')
+            
+            mmctl_job_id = parse_job_id(result.stdout)
+            if not mmctl_job_id:
+                raise Exception(f'Job ID mmctl introuvable dans la sortie: {result.stdout.strip()}')
+            checkpoint.submit(shard['index'], mmctl_job_id)
+            add_job_log(job_id, 'info', f'Job d\'import Mattermost: {mmctl_job_id}')
+        
+        # Le créneau mmctl reste occupé jusqu'à la fin réelle de l'import côté serveur
+        timeout = import_timeout(shard['posts'], rates, app.config['MMCTL_IMPORT_TIMEOUT'])
+        try:
+            mmctl_job = get_mmctl_watcher().wait(
+                mmctl_job_id,
+                timeout=timeout,
+                on_update=mmctl_progress(job_id, shard, progress),
+                cancel=cancel,
+                stall_timeout=app.config['MMCTL_STALL_TIMEOUT'] or None
+            )
+        except ImportStalled:
+            # Job bloqué côté serveur: arrêté, puis soumis à nouveau à la reprise
+            checkpoint.submit(shard['index'], None)
             try:
-                stats['files'] = int(line.split()[0])
-            except:
-                pass
+                cancel_import_job(mmctl_job_id)
+            except Exception as e:
+                add_job_log(job_id, 'warning', f'Annulation du job d\'import Mattermost {mmctl_job_id} impossible: {e}')
+            raise
+    
+    if mmctl_job is None and cancel.is_set():
+        checkpoint.submit(shard['index'], None)
+        try:
+            cancel_import_job(mmctl_job_id)
+            add_job_log(job_id, 'warning', f'Job d\'import Mattermost {mmctl_job_id} annulé')
+        except Exception as e:
+            add_job_log(job_id, 'warning', f'Annulation du job d\'import Mattermost {mmctl_job_id} impossible: {e}')
+        raise JobCanceled('Import annulé')
+    if mmctl_job is None:
+        TIMEOUTS.inc(stage='mmctl')
+        raise Exception(f'Import toujours en cours après {timeout}s (job {mmctl_job_id})')
+    import_seconds = time.time() - started
+    STAGE_DURATION.observe(import_seconds, stage='mmctl')
+    if mmctl_job.get('status') not in SUCCESS_STATUSES:
+        # Job mmctl terminé en échec: le shard sera soumis à nouveau à la reprise
+        checkpoint.submit(shard['index'], None)
+        error = (mmctl_job.get('data') or {}).get('error', '')
+        raise Exception(f'Import {mmctl_job.get("status")} côté Mattermost {error}'.strip())
     
-    return stats
+    checkpoint.done(shard['index'])
+    update_job(job_id, progress=progress(done=shard['posts'], current=0))
+    add_job_log(job_id, 'success', f'✓ Shard {shard["index"]} importé')
+    return {'mmctl_job_id': mmctl_job_id, 'import_seconds': round(import_seconds, 3)}
+
+def run_process(args, timeout, cancel, **kwargs):
+    """subprocess.run dans son propre groupe de processus, tué en entier au timeout ou à l'annulation"""
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                               start_new_session=True, **kwargs)
+    deadline = time.time() + timeout
+    while True:
+        try:
+            stdout, stderr = process.communicate(timeout=min(CANCEL_POLL_INTERVAL, max(0, deadline - time.time())))
+            return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+        except subprocess.TimeoutExpired:
+            if not cancel.is_set() and time.time() < deadline:
+                continue
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.communicate()
+        cancel.raise_if_set()
+        raise subprocess.TimeoutExpired(args, timeout)
+
+def job_progress():
+    """Progression d'un job: conversion (10 → 40%) et import des shards (jusqu'à 99%).
+
+    Retourne update(**fields) qui enregistre conversion (0-1), converted / total
+    (posts), current (posts du shard en cours déjà importés) ou done (posts d'un
+    shard importé), puis renvoie le pourcentage global.
+    """
+    state = {'conversion': 0.0, 'converted': 0, 'total': None, 'imported': 0, 'current': 0}
+    lock = threading.Lock()
+    
+    def update(done=None, **fields):
+        with lock:
+            state.update(fields)
+            if done is not None:
+                state['imported'] += done
+            # Total des posts inconnu avant la fin de la conversion: extrapolé
+            total = state['total']
+            if not total and state['converted'] and state['conversion']:
+                total = state['converted'] / state['conversion']
+            imported = (state['imported'] + state['current']) / total if total else 0
+            return int(10 + 30 * state['conversion'] + 59 * min(imported, 1))
+    
+    return update
+
+def mmctl_progress(job_id, shard, progress):
+    """Callback du suivi mmctl: statut du job Mattermost et progression de l'import du shard"""
+    last_status = {}
+    
+    def on_update(mmctl_job):
+        status = mmctl_job.get('status')
+        fields = {'mmctl_status': status}
+        if isinstance(mmctl_job.get('progress'), int) and mmctl_job['progress'] >= 0:
+            fields['progress'] = progress(current=shard['posts'] * min(mmctl_job['progress'], 100) / 100)
+        update_job(job_id, **fields)
+        if last_status.get('status') != status:
+            last_status['status'] = status
+            add_job_log(job_id, 'info', f'Import Mattermost (shard {shard["index"]}): {status}')
+    
+    return on_update
+
+def conversion_progress(job_id, progress, pipeline):
+    """Callback de progression du convertisseur: avancement réel et shards prêts à importer"""
+    stage_started = {}
+    
+    def on_progress(event):
+        stage = event['stage']
+        if stage == 'shard':
+            add_shard(job_id, pipeline, event['shard'])
+            progress(converted=sum(shard['posts'] for shard in pipeline.shards()))
+            return
+        if stage == 'room':
+            add_job_log(job_id, 'success', f'✓ Salon « {event["room"]} » converti ({event["rooms_done"]}/{event["rooms_total"]}, {event["messages"]} messages)')
+            update_job(job_id, rooms_done=event['rooms_done'])
+            return
+        
+        now = time.time()
+        started = stage_started.setdefault(stage, now)
+        
+        # Deux passes sur l'export: lecture (première moitié) puis conversion
+        if stage == 'scan':
+            fraction = 0.5 * event['bytes_read'] / max(event['bytes_total'], 1)
+        elif stage == 'convert':
+            fraction = 0.5 + 0.5 * event['events'] / max(event['events_total'] or 1, 1)
+        else:
+            fraction = 1
+        
+        conversion = {k: v for k, v in event.items() if k != 'stats'}
+        conversion['events_per_second'] = round(event['events'] / (now - started)) if now > started else None
+        update_job(job_id, progress=progress(conversion=fraction), conversion=conversion)
+    
+    return on_progress
+
+def add_job_log(job_id, level, message):
+    """Ajouter un log à un job (tampon du stockage + journal complet sur disque)"""
+    get_job_store().add_log(job_id, level, message)
+    try:
+        with open(job_log_path(job_id), 'a', encoding='utf-8') as f:
+            message = str(message).replace('\n', '\n    ')
+            f.write(f'{datetime.now().isoformat()} [{level.upper()}] {message}\n')
+    except OSError:
+        pass
+    notify_job_change()
+
+def update_job(job_id, **fields):
+    """Modifier un job et réveiller ses flux d'événements (issue comptée au passage à un statut final)"""
+    previous = get_job_store().update(job_id, **fields)
+    status = fields.get('status')
+    if status in ('completed', 'error', 'canceled') and previous not in (None, status):
+        JOB_OUTCOMES.inc(status=status)
+    if status in ('completed', 'error', 'canceled'):
+        # Espace réservé pour la conversion du job: plus nécessaire
+        get_workspace_janitor().release(job_id)
+    notify_job_change()
+
+def notify_job_change():
+    """Réveiller les flux SSE de ce processus"""
+    with job_changed:
+        job_changed.notify_all()
+
+def read_log_lines(log_path, before=None, limit=LOG_PAGE_SIZE):
+    """Dernières entrées (au plus limit) du journal d'un job avant la ligne before"""
+    entries = deque(maxlen=limit)
+    line = 0
+    entry = None
+    try:
+        with open(log_path, encoding='utf-8', errors='replace') as f:
+            for text in f:
+                match = LOG_ENTRY_PATTERN.match(text)
+                if match is None:
+                    if entry is not None:
+                        continuation = text.rstrip('\n')
+                        entry['message'] += '\n' + (continuation[4:] if continuation.startswith('    ') else continuation)
+                    continue
+                line += 1
+                if before is not None and line >= before:
+                    break
+                entry = {'line': line, 'level': match.group(2).lower(), 'message': match.group(3),
+                         'timestamp': match.group(1)}
+                entries.append(entry)
+    except OSError:
+        return []
+    return list(entries)
+
+def job_log_path(job_id):
+    """Journal complet d'un job, dans son dossier de travail"""
+    return UPLOAD_FOLDER / job_id / 'job.log'
+
+def get_job_store():
+    """Stockage des jobs, ouvert au premier accès"""
+    global job_store
+    with job_store_lock:
+        if job_store is None:
+            job_store = open_job_store(app.config['JOB_STORE'], app.config['JOB_LOG_BUFFER'])
+            recover_jobs(job_store)
+        return job_store
+
+def get_artifact_cache():
+    """Cache des conversions, None s'il est désactivé (ARTIFACT_CACHE_MAX_BYTES=0)"""
+    global artifact_cache
+    with artifact_cache_lock:
+        if artifact_cache is None and app.config['ARTIFACT_CACHE_MAX_BYTES'] > 0:
+            artifact_cache = ArtifactCache(app.config['ARTIFACT_CACHE'], app.config['ARTIFACT_CACHE_MAX_BYTES'])
+        return artifact_cache
+
+def get_workspace_janitor():
+    """Nettoyage du dossier de travail, démarré au premier appel"""
+    global workspace_janitor
+    with workspace_janitor_lock:
+        if workspace_janitor is None:
+            cache = get_artifact_cache()
+            workspace_janitor = WorkspaceJanitor(
+                UPLOAD_FOLDER,
+                workspace_state,
+                quota_bytes=app.config['WORKSPACE_QUOTA'],
+                ttls={
+                    'completed': app.config['WORKSPACE_TTL_COMPLETED'],
+                    'error': app.config['WORKSPACE_TTL_ERROR'],
+                    'canceled': app.config['WORKSPACE_TTL_CANCELED'],
+                    'upload': app.config['WORKSPACE_TTL_UPLOAD'],
+                    None: app.config['WORKSPACE_TTL_ORPHAN']
+                },
+                expansion=app.config['WORKSPACE_EXPANSION'],
+                interval=app.config['WORKSPACE_SWEEP_INTERVAL'],
+                reclaim=cache.shrink if cache else None,
+                # Dossier d'un job terminé supprimé: son entrée dans la base des jobs aussi
+                forget=get_job_store().delete
+            )
+            workspace_janitor.start()
+        return workspace_janitor
+
+def workspace_state(job_id):
+    """État d'un dossier de travail: statut du job, 'upload' (upload par morceaux en cours) ou None"""
+    if (UPLOAD_FOLDER / job_id / 'upload.json').is_file():
+        return 'upload'
+    return get_job_store().status(job_id)
+
+def get_import_index():
+    """Index des imports réussis, ouvert au premier accès"""
+    global import_index
+    with import_index_lock:
+        if import_index is None:
+            import_index = ImportIndex(app.config['IMPORT_INDEX'])
+        return import_index
+
+def recover_jobs(store):
+    """Marquer en erreur les jobs dont le processus propriétaire n'existe plus"""
+    for status in ('queued', 'running', 'canceling'):
+        for job in store.list(status=status, limit=10000):
+            if owner_alive(str(job.get('owner', ''))):
+                continue
+            store.update(job['id'], status='error')
+            store.add_log(job['id'], 'error', '❌ Interrompu par un redémarrage du service')
+            store.add_log(job['id'], 'info', 'Le job peut être repris là où il s\'est arrêté (bouton Reprendre)')
+
+def process_alive(pid):
+    """Le processus pid existe-t-il encore sur cet hôte ?"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def owner_alive(owner):
+    """Le processus propriétaire (hôte:pid) peut-il encore exister ? (vrai s'il est sur un autre hôte)"""
+    host, _, pid = owner.rpartition(':')
+    return host != socket.gethostname() or not pid.isdigit() or process_alive(int(pid))
+
+def job_owner():
+    """Processus propriétaire des jobs qu'il exécute (hôte:pid, calculé après le fork gunicorn)"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def get_scheduler():
+    """Ordonnanceur partagé, démarré au premier job"""
+    global scheduler
+    with scheduler_lock:
+        if scheduler is None:
+            scheduler = JobScheduler(
+                workers=app.config['SCHEDULER_WORKERS'],
+                stage_limits={
+                    'convert': app.config['CONVERT_CONCURRENCY'],
+                    'mmctl': app.config['MMCTL_CONCURRENCY']
+                },
+                max_queue=app.config['SCHEDULER_MAX_QUEUE'],
+                # Limites par étape communes à tous les workers gunicorn qui partagent la base des jobs
+                shared_slots=SharedSlots(get_job_store(), job_owner(), owner_alive)
+            )
+        return scheduler
+
+def get_mmctl_watcher():
+    """Suivi mmctl partagé par tous les jobs de ce processus"""
+    global mmctl_watcher
+    with mmctl_watcher_lock:
+        if mmctl_watcher is None:
+            mmctl_watcher = MmctlWatcher(max_interval=app.config['MMCTL_POLL_MAX_INTERVAL'])
+        return mmctl_watcher
+
+def get_converter_pool():
+    """Pool de conversion partagé, démarré au premier job"""
+    global converter_pool
+    with converter_pool_lock:
+        if converter_pool is None:
+            if app.config['CONVERSION_MODE'] == 'stream':
+                script = STREAM_CONVERTER_SCRIPT
+            else:
+                script = CONVERTER_SCRIPT
+            converter_pool = ConverterPool(script, workers=app.config['CONVERTER_WORKERS'])
+        return converter_pool
 
 if __name__ == '__main__':
     # Vérifier que l'utilisateur est 'mattermost'
@@ -841,11 +2690,13 @@ if __name__ == '__main__':
         print(f"ATTENTION: Ce script devrait être exécuté en tant que 'mattermost'")
         print(f"Utilisateur actuel: {current_user}")
     
+    port = int(os.environ.get('WEB_PORT', 5000))
+    
     print("=" * 60)
     print("Interface Web - Import Element.io → Mattermost")
     print("=" * 60)
-    print(f"Serveur démarré sur http://0.0.0.0:5000")
-    print("Accessible depuis: http://votre-serveur:5000")
+    print(f"Serveur démarré sur http://0.0.0.0:{port}")
+    print(f"Accessible depuis: http://votre-serveur:{port}")
     print("=" * 60)
     
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Nettoyage du dossier de travail de l'interface web
+Chaque job laisse dans <UPLOAD_FOLDER>/<id>/ l'export envoyé et ses archives
+d'import (environ trois fois la taille de l'export). Un thread supprime les
+dossiers des jobs terminés après un délai propre à leur état, puis les plus
+anciens si un quota est dépassé. Les dossiers des jobs en attente ou en cours
+ne sont jamais supprimés, ceux des jobs terminés le sont avec leur job (forget).
+L'espace promis aux uploads et aux conversions en cours (réservations) est
+déduit de l'espace disponible jusqu'à leur fin, leur expiration ou l'état final
+de leur job.
+"""
+
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+# États des dossiers jamais supprimés (jobs en attente ou en cours)
+ACTIVE_STATES = ('queued', 'running')
+
+# États dont le dossier peut être supprimé avant expiration pour respecter le quota
+EVICTABLE_STATES = ('completed', 'error', 'canceled')
+
+# Durée par défaut d'une réservation d'espace non libérée (secondes)
+RESERVATION_TTL = 3600
+
+
+class QuotaExceeded(Exception):
+    """Espace de travail insuffisant, même après nettoyage"""
+
+
+def workspace_size(path):
+    """Taille d'un dossier et date de sa dernière modification.
+
+    Les fichiers liés ailleurs (liens physiques du cache) ne sont pas comptés: leur
+    suppression ne libère pas d'espace.
+    """
+    size = 0
+    mtime = os.path.getmtime(path)
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            mtime = max(mtime, stat.st_mtime)
+            if stat.st_nlink == 1:
+                size += stat.st_size
+    return size, mtime
+
+def disk_usage(path):
+    """Espace occupé sous path (chaque fichier compté une fois malgré les liens physiques)"""
+    seen = set()
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            if (stat.st_dev, stat.st_ino) not in seen:
+                seen.add((stat.st_dev, stat.st_ino))
+                size += stat.st_size
+    return size
+
+
+class WorkspaceJanitor:
+    """Suppression des dossiers de jobs par ancienneté (TTL par état) et par quota.
+
+    state_of(id) retourne l'état d'un dossier: statut du job, 'upload' (upload par
+    morceaux en cours) ou None (dossier sans job). ttls associe à chaque état la
+    durée (secondes depuis la dernière modification) au-delà de laquelle il est
+    supprimé. forget(id), s'il est fourni, supprime le job d'un dossier terminé supprimé.
+    """
+
+    def __init__(self, root, state_of, quota_bytes=0, ttls=None, expansion=3, interval=60,
+                 reclaim=None, forget=None, reservation_ttl=RESERVATION_TTL):
+        self.root = Path(root)
+        self.state_of = state_of
+        self.quota_bytes = quota_bytes
+        self.ttls = ttls or {}
+        self.expansion = expansion
+        self.interval = interval
+        self.reclaim = reclaim
+        self.forget = forget
+        self.reservation_ttl = reservation_ttl
+        self.removed = 0
+        self.freed_bytes = 0
+        self._reservations = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Démarrer le nettoyage périodique (une seule fois)"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='workspace-janitor')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def workspaces(self):
+        """Dossiers de jobs et d'uploads (nommés par UUID), avec état, taille et âge"""
+        workspaces = []
+        for path in self.root.iterdir():
+            try:
+                uuid.UUID(path.name)
+                if not path.is_dir():
+                    continue
+                size, mtime = workspace_size(path)
+            except (ValueError, OSError):
+                continue
+            workspaces.append({'id': path.name, 'path': path, 'state': self.state_of(path.name),
+                               'bytes': size, 'mtime': mtime})
+        workspaces.sort(key=lambda workspace: workspace['mtime'])
+        return workspaces
+
+    def sweep(self, needed=0):
+        """Supprimer les dossiers expirés puis, au besoin, les plus anciens.
+
+        needed: octets à rendre disponibles en plus (quota et espace libre du disque),
+        au-delà des réservations en cours.
+        Retourne les octets qui manquent encore (0 si l'objectif est atteint).
+        """
+        with self._lock:
+            return self._sweep(needed)
+
+    def reserve(self, size, key=None, ttl=None):
+        """Réserver la place d'un upload de size octets et de ses archives (QuotaExceeded sinon).
+
+        Retourne la clé de la réservation (key, ou une clé générée), à libérer avec release()
+        une fois l'upload terminé ou abandonné; sans cela elle expire après ttl secondes.
+        """
+        needed = size * self.expansion
+        with self._lock:
+            missing = self._sweep(needed)
+            if missing > 0:
+                raise QuotaExceeded(
+                    f'Espace de travail insuffisant: {needed / 1048576:.0f} MB nécessaires '
+                    f'(export et archives), {missing / 1048576:.0f} MB manquants après nettoyage. '
+                    'Réessayez quand les imports en cours seront terminés.'
+                )
+            key = key or str(uuid.uuid4())
+            self._reservations[key] = (needed, time.time() + (ttl or self.reservation_ttl))
+            return key
+
+    def hold(self, key):
+        """Garder une réservation jusqu'à release() ou l'état final (EVICTABLE_STATES) du dossier key.
+
+        Retourne False si la réservation n'existe plus (libérée ou expirée).
+        """
+        with self._lock:
+            if key not in self._reservations:
+                return False
+            self._reservations[key] = (self._reservations[key][0], float('inf'))
+            return True
+
+    def release(self, key):
+        """Libérer une réservation (upload abandonné, conversion terminée, job terminé)"""
+        with self._lock:
+            self._reservations.pop(key, None)
+
+    def reserved(self):
+        """Octets réservés par les uploads et les conversions en cours"""
+        with self._lock:
+            return self._reserved()
+
+    def stats(self):
+        """Occupation de l'espace de travail"""
+        usage = disk_usage(self.root)
+        states = {}
+        for workspace in self.workspaces():
+            states[str(workspace['state'])] = states.get(str(workspace['state']), 0) + 1
+        return {
+            'bytes': usage,
+            'quota_bytes': self.quota_bytes,
+            'free_bytes': shutil.disk_usage(self.root).free,
+            'workspaces': states,
+            'reserved_bytes': self.reserved(),
+            'removed': self.removed,
+            'freed_bytes': self.freed_bytes
+        }
+
+    def _sweep(self, needed):
+        """Nettoyage (verrou détenu par l'appelant)"""
+        now = time.time()
+        remaining = []
+        for workspace in self.workspaces():
+            ttl = self.ttls.get(workspace['state'])
+            if workspace['state'] not in ACTIVE_STATES and ttl is not None \
+                    and now - workspace['mtime'] > ttl:
+                self._remove(workspace)
+            else:
+                remaining.append(workspace)
+
+        missing = self._missing(needed + self._reserved())
+        for workspace in remaining:
+            if missing <= 0:
+                break
+            if workspace['state'] in EVICTABLE_STATES:
+                self._remove(workspace)
+                missing -= workspace['bytes']
+
+        if missing > 0 and self.reclaim:
+            missing -= self.reclaim(missing)
+        return max(missing, 0)
+
+    def _reserved(self):
+        """Total des réservations non expirées (verrou détenu par l'appelant)"""
+        now = time.time()
+        for key, (_, expires_at) in list(self._reservations.items()):
+            # Réservation gardée (hold) d'un job terminé sans release(): libérée
+            if expires_at <= now or (expires_at == float('inf') and self.state_of(key) in EVICTABLE_STATES):
+                del self._reservations[key]
+        return sum(size for size, _ in self._reservations.values())
+
+    def _missing(self, needed):
+        """Octets à libérer pour disposer de needed octets (quota et disque)"""
+        missing = needed - shutil.disk_usage(self.root).free
+        if self.quota_bytes:
+            missing = max(missing, disk_usage(self.root) + needed - self.quota_bytes)
+        return missing
+
+    def _remove(self, workspace):
+        """Supprimer un dossier de job, le job terminé correspondant et la réservation d'un upload abandonné"""
+        shutil.rmtree(workspace['path'], ignore_errors=True)
+        self._reservations.pop(workspace['id'], None)
+        if self.forget and workspace['state'] in EVICTABLE_STATES:
+            try:
+                self.forget(workspace['id'])
+            except Exception as e:
+                print(f'Suppression du job {workspace["id"]}: {e}', file=sys.stderr)
+        self.removed += 1
+        self.freed_bytes += workspace['bytes']
+
+    def _run(self):
+        """Boucle de nettoyage"""
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f'Nettoyage de l\'espace de travail: {e}', file=sys.stderr)
+            time.sleep(self.interval)